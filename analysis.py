@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from data_fetch import fetch_daily_data  # Must be in your project
+from data_fetch import fetch_timeframe  # Must be in your project
+from trading_calendar import is_open
+from intraday_store import parse_timeframe
 from support_resistance import calculate_pivot_points  # Import the support/resistance calculation function
 
 ############################
@@ -24,12 +26,16 @@ def rsi(series, period=14):
 #  ANALYZE SPY & VXX
 ############################
 
-def analyze_current_spy_and_vxx(spy_symbol="SPY", vxx_symbol="VXX", lookback_days=365*2, return_data=False):
+def analyze_current_spy_and_vxx(spy_symbol="SPY", vxx_symbol="VXX", lookback_days=365*2, return_data=False,
+                                timeframe="1d"):
     """
     Analyze SPY and VXX data, classify market trend, and compute support/resistance levels.
+    :param timeframe: Bar size the indicators and pivots are computed on ("1d", "1h", "15min", ...).
     """
+    daily = parse_timeframe(timeframe) is None
+
     # --- Fetch SPY data
-    df_spy = fetch_daily_data(spy_symbol, lookback_days)
+    df_spy = fetch_timeframe(spy_symbol, timeframe, lookback_days)
     if df_spy.empty:
         print(f"No data for {spy_symbol}.")
         return {} if return_data else None
@@ -67,7 +73,7 @@ def analyze_current_spy_and_vxx(spy_symbol="SPY", vxx_symbol="VXX", lookback_day
     levels = calculate_pivot_points(high, low, close)
 
     # --- Fetch VXX
-    df_vxx = fetch_daily_data(vxx_symbol, lookback_days)
+    df_vxx = fetch_timeframe(vxx_symbol, timeframe, lookback_days)
     if df_vxx.empty:
         vxx_comment = f"{vxx_symbol}: No data."
         vxx_close   = 0.0
@@ -79,14 +85,18 @@ def analyze_current_spy_and_vxx(spy_symbol="SPY", vxx_symbol="VXX", lookback_day
     
     # Print
     print("\n=== Current SPY & VXX Outlook ===")
-    print(f"Last Close Date: {df_spy.index[-1].strftime('%Y-%m-%d')}")
+    if daily:
+        print(f"Last Close Date: {df_spy.index[-1].strftime('%Y-%m-%d')}")
+    else:
+        print(f"Last {timeframe} Bar: {df_spy.index[-1].strftime('%Y-%m-%d %H:%M')} UTC")
     print(f"SPY Trend: {market_trend} (50 SMA={sma50:.2f}, 200 SMA={sma200:.2f})")
     print(f"RSI_14={rsi_val:.2f} => {rsi_comment}")
     print(f"Pivot Point: {levels['Pivot Point']}")
     print(f"Resistance 1: {levels['Resistance 1']}, Resistance 2: {levels['Resistance 2']}, Resistance 3: {levels['Resistance 3']}")
     print(f"Support 1: {levels['Support 1']}, Support 2: {levels['Support 2']}, Support 3: {levels['Support 3']}")
     print(vxx_comment)
-    print("Note: VXX is a futures-based ETN. If market is open, these daily bars may be partial.")
+    if daily and is_open():
+        print("Note: VXX is a futures-based ETN. The market is open, so today's daily bar is partial.")
     
     # Return data if requested
     if return_data:
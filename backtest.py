@@ -1,84 +1,158 @@
 # backtest.py
+import numpy as np
 import pandas as pd
+from ml_model import FEATURE_COLS
 
-def simple_backtest(df, model, test_days=180, initial_capital=100000):
+def vectorized_backtest(close, signal, initial_capital=100000, commission=0.0, slippage=0.0,
+                        whole_shares=True, periods_per_year=252):
+    """
+    Array-based long/flat backtest, equivalent to the original per-row loop in simple_backtest.
+
+    A signal of 1 on bar i means "hold long from close i to close i+1"; 0 means flat.
+    Positions are entered at the close of the first bar of a run of 1s and sized once at
+    entry (all available capital); they are exited at the close of the first bar whose
+    signal is 0, or at the final bar. The last bar's signal is ignored.
+
+    :param close: 1-D array of close prices.
+    :param signal: 1-D array of 0/1 predictions, same length as `close`.
+    :param commission: Commission as a fraction of traded notional (e.g. 0.0005 = 5 bps).
+    :param slippage: Fill slippage as a fraction of price (buys fill higher, sells lower).
+    :param whole_shares: Size entries in whole shares like the original loop. Each entry
+                         then depends on the capital left by the previous trade, so sizing
+                         loops over trades (not bars); everything else is array operations.
+                         With False, fractional shares make the whole run vectorized.
+    :param periods_per_year: Bars per year, used to annualize the Sharpe ratio.
+    :return: Dict with per-bar arrays (position, shares, pnl, equity, drawdown) and
+             summary stats (final_capital, total_return, return_pct, sharpe,
+             max_drawdown, turnover, num_trades).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    signal = np.asarray(signal)
+    n = len(close)
+
+    # Long overnight after bar i if signal[i] == 1; the last bar can't open a position
+    long = np.zeros(n, dtype=bool)
+    long[:-1] = signal[:-1] == 1
+    prev_long = np.concatenate(([False], long[:-1]))
+    entries = np.flatnonzero(long & ~prev_long)
+    exits = np.flatnonzero(~long & prev_long)   # bar whose close we sell at
+
+    buy_px = close[entries] * (1 + slippage)
+    sell_px = close[exits] * (1 - slippage)
+
+    # Capital before each trade, and shares bought at each entry
+    if whole_shares:
+        shares = np.empty(len(entries))
+        capital = float(initial_capital)
+        for k in range(len(entries)):
+            shares[k] = capital // (buy_px[k] * (1 + commission))
+            capital += shares[k] * (sell_px[k] * (1 - commission) - buy_px[k] * (1 + commission))
+    else:
+        growth = (sell_px * (1 - commission)) / (buy_px * (1 + commission))
+        capital_before = initial_capital * np.concatenate(([1.0], np.cumprod(growth)[:-1]))
+        shares = capital_before / (buy_px * (1 + commission))
+
+    # Broadcast trade-level values to bars: trade k covers bars entries[k] .. exits[k]
+    trade_id = np.cumsum(long & ~prev_long) - 1
+    in_trade = long | prev_long
+    bar_shares = np.zeros(n)
+    if len(entries):
+        bar_shares[in_trade] = shares[trade_id[in_trade]]
+
+    # Per-bar PnL: price change while held, with fills/costs applied on entry and exit bars
+    pnl = np.zeros(n)
+    held = prev_long  # bar i's PnL comes from holding over (i-1, i]
+    pnl[1:] = np.where(held[1:], bar_shares[1:] * (close[1:] - close[:-1]), 0.0)
+    if len(entries):
+        entry_cost = shares * buy_px * commission + shares * (buy_px - close[entries])
+        exit_cost = shares * sell_px * commission + shares * (close[exits] - sell_px)
+        pnl[entries] -= entry_cost
+        pnl[exits] -= exit_cost
+
+    equity = initial_capital + np.cumsum(pnl)
+    running_max = np.maximum.accumulate(equity)
+    drawdown = equity / running_max - 1.0
+
+    returns = np.diff(equity) / equity[:-1] if n > 1 else np.array([])
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    sharpe = float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0
+
+    traded_notional = float(np.sum(shares * buy_px) + np.sum(shares * sell_px))
+    final_capital = float(equity[-1]) if n else float(initial_capital)
+    total_return = final_capital - initial_capital
+
+    return {
+        "position": long.astype(np.int8),
+        "shares": bar_shares,
+        "pnl": pnl,
+        "equity": equity,
+        "drawdown": drawdown,
+        "final_capital": final_capital,
+        "total_return": total_return,
+        "return_pct": (total_return / initial_capital) * 100.0,
+        "sharpe": sharpe,
+        "max_drawdown": float(drawdown.min()) if n else 0.0,
+        "turnover": traded_notional / float(np.mean(equity)) if n else 0.0,
+        "num_trades": int(len(entries)),
+    }
+
+def simple_backtest(df, model, test_days=180, initial_capital=100000, commission=0.0, slippage=0.0,
+                    threshold=None):
     """
     Use the model's predicted class (0 or 1) to simulate going long on "1"
     and going flat on "0". If the model says 'bullish' for tomorrow, buy at today's close
     and sell at tomorrow's close, etc.
-    
+
     Very naive. Real backtesting requires more detail.
+    The simulation itself runs in vectorized_backtest; `commission` and `slippage`
+    are fractions of traded notional / price (both 0 by default).
+    If `threshold` is given, go long when P(bullish) >= threshold instead of using predict().
+    `model` can be any fitted classifier with predict/predict_proba, e.g. one of the
+    ml_model.MODEL_BACKENDS.
     """
     # Sort index
     df = df.sort_index().copy()
-    
+
     # We'll generate predictions for the test period
-    feature_cols = [
-        "RSI_14", "MACD", "MACD_signal", "SMA_50", "SMA_200", "BB_upper", "BB_lower", "ATR_14",
-        "Open", "High", "Low", "Close", "Volume"
-    ]
     train_cutoff = df.index[-test_days]
-    
+
     df_test = df[df.index >= train_cutoff].copy()
     if df_test.empty:
         print("[WARN] No test data for backtest.")
         return
-    
-    X_test = df_test[feature_cols]
-    df_test["pred"] = model.predict(X_test)
-    
-    # We'll track daily returns
-    capital = initial_capital
-    positions = 0  # how many shares
-    shares_held = 0
-    df_test["StrategyReturns"] = 0.0
-    
-    # For each day in test set:
-    #   If model says '1' => go (or stay) long
-    #   If model says '0' => close any long
-    # We assume we buy/sell at the close, and realize PnL next day.
-    # This is extremely simplified.
-    
-    prev_close = None
-    for i in range(len(df_test) - 1):
-        today_idx = df_test.index[i]
-        next_idx = df_test.index[i+1]
-        pred = df_test.loc[today_idx, "pred"]
-        
-        today_close = df_test.loc[today_idx, "Close"]
-        next_close = df_test.loc[next_idx, "Close"]
-        
-        if pred == 1:
-            # we want to be long overnight
-            # buy at today's close
-            if shares_held == 0:
-                shares_held = int(capital // today_close)
-                capital_left = capital - (shares_held * today_close)
-            # next day we evaluate PnL
-            daily_pnl = shares_held * (next_close - today_close)
-            df_test.at[next_idx, "StrategyReturns"] = daily_pnl
-            # capital changes
-            capital += daily_pnl
-        else:
-            # pred == 0 => exit
-            if shares_held > 0:
-                # we assume we sold at today's close => realize no overnight PnL
-                # reset
-                shares_held = 0
-    
-    # If we end test still holding shares, let's 'sell' them at last close
-    if shares_held > 0:
-        last_idx = df_test.index[-1]
-        last_close = df_test.loc[last_idx, "Close"]
-        daily_pnl = shares_held * (last_close - last_close)  # basically 0 if we do final sale at same price
-        capital += daily_pnl
-        shares_held = 0
-    
-    total_return = capital - initial_capital
-    return_pct = (total_return / initial_capital) * 100.0
-    
+
+    X_test = df_test[FEATURE_COLS]
+    if threshold is None:
+        df_test["pred"] = model.predict(X_test)
+    else:
+        df_test["pred"] = (model.predict_proba(X_test)[:, 1] >= threshold).astype(int)
+
+    return backtest_signals(df_test, df_test["pred"], initial_capital, commission, slippage)
+
+def backtest_signals(df, signal, initial_capital=100000, commission=0.0, slippage=0.0):
+    """
+    Backtest an externally produced 0/1 prediction series (e.g. the 'pred' column from
+    ml_model.walk_forward_predict) against the Close prices in `df`.
+    Only bars present in both `df` and `signal` are simulated.
+    :return: Same summary dict as simple_backtest.
+    """
+    signal = signal.dropna()
+    df_test = df.loc[df.index.intersection(signal.index)].sort_index()
+    if df_test.empty:
+        print("[WARN] No overlapping bars between prices and signal.")
+        return
+    results = vectorized_backtest(
+        df_test["Close"].to_numpy(), signal.loc[df_test.index].to_numpy().astype(int),
+        initial_capital=initial_capital, commission=commission, slippage=slippage
+    )
+
     return {
-        "final_capital": capital,
-        "total_return": total_return,
-        "return_pct": return_pct
+        "final_capital": results["final_capital"],
+        "total_return": results["total_return"],
+        "return_pct": results["return_pct"],
+        "sharpe": results["sharpe"],
+        "max_drawdown": results["max_drawdown"],
+        "turnover": results["turnover"],
+        "num_trades": results["num_trades"],
+        "equity_curve": pd.Series(results["equity"], index=df_test.index),
     }
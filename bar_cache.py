@@ -0,0 +1,172 @@
+# bar_cache.py
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import BAR_CACHE_DIR
+
+def _cache_stem(symbol, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR):
+    """
+    Build the path stem for a symbol/timeframe cache entry, e.g. data_cache/SPY_1day.
+    """
+    return os.path.join(cache_dir, f"{symbol.upper()}_{multiplier}{timespan}")
+
+def _read_meta(stem):
+    if not (os.path.exists(stem + ".parquet") and os.path.exists(stem + ".json")):
+        return {}
+    with open(stem + ".json") as f:
+        return json.load(f)
+
+def _write_meta(stem, covered_from, gaps_checked_through=None):
+    meta = {"covered_from": pd.Timestamp(covered_from).strftime("%Y-%m-%d")}
+    if gaps_checked_through is not None:
+        meta["gaps_checked_through"] = pd.Timestamp(gaps_checked_through).strftime("%Y-%m-%d")
+    with open(stem + ".json.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(stem + ".json.tmp", stem + ".json")
+
+def cached_covered_from(symbol, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR):
+    """
+    Return the date the cached history for `symbol` is complete from, or None if not cached.
+    """
+    meta = _read_meta(_cache_stem(symbol, multiplier, timespan, cache_dir))
+    return pd.Timestamp(meta["covered_from"]) if meta else None
+
+def cached_gaps_checked_through(symbol, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR):
+    """
+    Return the date up to which sessions missing from the cached bars have already been
+    re-fetched (so any gap left there is one the vendor doesn't fill), or None.
+    """
+    checked = _read_meta(_cache_stem(symbol, multiplier, timespan, cache_dir)).get("gaps_checked_through")
+    return pd.Timestamp(checked) if checked else None
+
+def mark_gaps_checked(symbol, through, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR):
+    """
+    Record that missing sessions up to `through` were re-fetched, without rewriting the bars.
+    """
+    stem = _cache_stem(symbol, multiplier, timespan, cache_dir)
+    meta = _read_meta(stem)
+    if meta:
+        _write_meta(stem, meta["covered_from"], through)
+
+def load_bars(symbol, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR):
+    """
+    Load cached bars for `symbol` from disk.
+    :return: Tuple (DataFrame indexed by date, covered_from Timestamp or None).
+             The DataFrame is empty if nothing is cached yet.
+    """
+    stem = _cache_stem(symbol, multiplier, timespan, cache_dir)
+    if not os.path.exists(stem + ".parquet"):
+        return pd.DataFrame(), None
+    try:
+        df = pd.read_parquet(stem + ".parquet")
+        return df, cached_covered_from(symbol, multiplier, timespan, cache_dir)
+    except Exception as e:
+        print(f"[WARN] Could not read bar cache for {symbol}: {e}")
+        return pd.DataFrame(), None
+
+def save_bars(symbol, df, covered_from, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR,
+              gaps_checked_through=None):
+    """
+    Write `df` to the cache for `symbol`, replacing any previous file atomically.
+    `covered_from` is the earliest date the cached history is known to be complete from;
+    `gaps_checked_through` see cached_gaps_checked_through.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = _cache_stem(symbol, multiplier, timespan, cache_dir)
+    df.to_parquet(stem + ".parquet.tmp")
+    os.replace(stem + ".parquet.tmp", stem + ".parquet")
+    _write_meta(stem, covered_from, gaps_checked_through)
+
+def merge_bars(cached, new):
+    """
+    Merge freshly fetched bars into the cached ones. Newer rows win on duplicate dates,
+    so a partial bar from an earlier intraday run is replaced by the final one.
+    """
+    if cached.empty:
+        return new.sort_index()
+    if new.empty:
+        return cached
+    merged = pd.concat([cached, new])
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+def invalidate_bars(symbol=None, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR):
+    """
+    Delete cached bars so the next fetch re-downloads the full window
+    (e.g. after a split or dividend restates adjusted prices).
+    If `symbol` is None, the whole cache directory is cleared.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    if symbol is None:
+        for name in os.listdir(cache_dir):
+            if name.endswith(".parquet") or name.endswith(".json"):
+                os.remove(os.path.join(cache_dir, name))
+        return
+    stem = _cache_stem(symbol, multiplier, timespan, cache_dir)
+    for ext in (".parquet", ".json"):
+        if os.path.exists(stem + ext):
+            os.remove(stem + ext)
+
+def iter_cached_bars(symbol, multiplier=1, timespan="day", batch_size=100_000, cache_dir=BAR_CACHE_DIR):
+    """
+    Yield the cached bars for `symbol` as DataFrame chunks of up to `batch_size` rows,
+    without loading the whole file into memory.
+    """
+    path = _cache_stem(symbol, multiplier, timespan, cache_dir) + ".parquet"
+    if not os.path.exists(path):
+        return
+    pf = pq.ParquetFile(path)
+    for batch in pf.iter_batches(batch_size=batch_size):
+        yield pa.Table.from_batches([batch], schema=pf.schema_arrow).to_pandas()
+
+class BarWriter:
+    """
+    Streaming writer for a symbol/timeframe cache entry. Each `write(df)` appends one
+    Parquet row group, so arbitrarily long histories can be written at constant memory.
+    Chunks must arrive in ascending date order. The cache file is replaced atomically
+    on `close()` (or when used as a context manager that exits without error).
+    """
+    def __init__(self, symbol, covered_from, multiplier=1, timespan="day", cache_dir=BAR_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.stem = _cache_stem(symbol, multiplier, timespan, cache_dir)
+        self.covered_from = covered_from
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if df.empty:
+            return
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.stem + ".parquet.tmp", table.schema)
+        else:
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        # Gaps already re-fetched in the entry being replaced stay checked: its bars
+        # before the rewritten range are carried over, and that range is fetched anew
+        checked = _read_meta(self.stem).get("gaps_checked_through")
+        os.replace(self.stem + ".parquet.tmp", self.stem + ".parquet")
+        _write_meta(self.stem, self.covered_from, checked)
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.remove(self.stem + ".parquet.tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,75 @@
+# benchmarks/bench_backtest.py
+"""
+Compare the vectorized backtest engine with the original per-row loop.
+
+Usage: python benchmarks/bench_backtest.py [--bars 1000000] [--loop-bars 100000]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest import vectorized_backtest
+
+def legacy_loop_backtest(df_test, initial_capital=100000):
+    """
+    The per-row loop simple_backtest used before the vectorized engine (reference only).
+    """
+    capital = initial_capital
+    shares_held = 0
+    df_test["StrategyReturns"] = 0.0
+    for i in range(len(df_test) - 1):
+        today_idx = df_test.index[i]
+        next_idx = df_test.index[i+1]
+        pred = df_test.loc[today_idx, "pred"]
+        today_close = df_test.loc[today_idx, "Close"]
+        next_close = df_test.loc[next_idx, "Close"]
+        if pred == 1:
+            if shares_held == 0:
+                shares_held = int(capital // today_close)
+            daily_pnl = shares_held * (next_close - today_close)
+            df_test.at[next_idx, "StrategyReturns"] = daily_pnl
+            capital += daily_pnl
+        else:
+            if shares_held > 0:
+                shares_held = 0
+    return capital
+
+def synthetic_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    pred = rng.integers(0, 2, n)
+    index = pd.date_range("2000-01-01", periods=n, freq="min")
+    return pd.DataFrame({"Close": close, "pred": pred}, index=index)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bars", type=int, default=1_000_000)
+    parser.add_argument("--loop-bars", type=int, default=100_000,
+                        help="bars to run the legacy loop on (~150s at 1M; speedup is compared per bar)")
+    args = parser.parse_args()
+
+    df = synthetic_bars(args.bars)
+    t0 = time.perf_counter()
+    res = vectorized_backtest(df["Close"].to_numpy(), df["pred"].to_numpy())
+    t_vec = time.perf_counter() - t0
+    print(f"vectorized: {args.bars:,} bars in {t_vec:.3f}s ({args.bars / t_vec:,.0f} bars/s)")
+
+    df_loop = df.iloc[:args.loop_bars].copy()
+    t0 = time.perf_counter()
+    loop_capital = legacy_loop_backtest(df_loop)
+    t_loop = time.perf_counter() - t0
+    print(f"legacy loop: {len(df_loop):,} bars in {t_loop:.3f}s ({len(df_loop) / t_loop:,.0f} bars/s)")
+
+    check = vectorized_backtest(df_loop["Close"].to_numpy(), df_loop["pred"].to_numpy())
+    rel_err = abs(check["final_capital"] - loop_capital) / loop_capital
+    print(f"final capital: loop={loop_capital:.4f} vectorized={check['final_capital']:.4f} (rel err {rel_err:.2e})")
+    print(f"speedup: {(t_loop / len(df_loop)) / (t_vec / args.bars):,.0f}x per bar")
+    print(f"sharpe={res['sharpe']:.3f} max_drawdown={res['max_drawdown']:.3%} "
+          f"turnover={res['turnover']:.1f} trades={res['num_trades']:,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_indicators.py
+"""
+Compare the fused indicator kernel (indicator_kernel.fused_indicators) with the pandas
+indicator functions build_features uses, on long synthetic series: wall time per
+backend and the largest difference from the pandas values.
+
+Usage: python benchmarks/bench_indicators.py [--bars 1000000,10000000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+import feature_engineering as fe
+from indicator_kernel import INDICATOR_COLS, fused_indicators, _numba_kernel
+from synthetic import synthetic_ohlcv
+
+def pandas_indicators(df):
+    """
+    The indicator steps of build_features, as separate pandas rolling/ewm calls.
+    """
+    out = pd.DataFrame(index=df.index)
+    out["RSI_14"] = fe.rsi(df["Close"], 14)
+    out["MACD"], out["MACD_signal"] = fe.macd(df["Close"], fast=12, slow=26, signal=9)
+    out["SMA_50"] = fe.sma(df["Close"], 50)
+    out["SMA_200"] = fe.sma(df["Close"], 200)
+    out["BB_upper"], out["BB_lower"] = fe.bollinger_bands(df["Close"], window=20, num_std=2)
+    out["ATR_14"] = fe.atr(df, window=14)
+    return out[INDICATOR_COLS].to_numpy()
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", default="1000000,10000000", help="comma-separated series lengths")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = ["numpy"] + (["numba"] if _numba_kernel is not None else [])
+    if _numba_kernel is None:
+        print("numba is not installed; timing the NumPy kernel only.")
+    for n in (int(b) for b in args.bars.split(",") if b):
+        df = synthetic_ohlcv(n)
+        close, high, low = (df[c].to_numpy() for c in ("Close", "High", "Low"))
+        t_pandas, expected = best_of(lambda: pandas_indicators(df), args.repeat)
+        print(f"{n:,} bars: pandas {t_pandas:.3f}s")
+        for backend in backends:
+            fused_indicators(close[:1000], high[:1000], low[:1000], backend=backend)  # JIT warm-up
+            out = np.empty((n, len(INDICATOR_COLS)), order="C" if backend == "numba" else "F")
+            t, got = best_of(lambda: fused_indicators(close, high, low, out=out, backend=backend), args.repeat)
+            assert (np.isnan(got) == np.isnan(expected)).all(), "NaN rows differ from pandas"
+            rel = np.nanmax(np.abs(got - expected) / np.maximum(1.0, np.abs(expected)), axis=0)
+            worst = ", ".join(f"{c}={e:.1e}" for c, e in zip(INDICATOR_COLS, rel))
+            print(f"  {backend:<6} {t:.3f}s  speedup {t_pandas / t:5.1f}x  max rel diff: {worst}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_memory.py
+"""
+Memory footprint of the default (float64) vs. compact (float32) data layout for a
+multi-symbol, multi-year daily panel, and the compact layout's effect on the test
+accuracy of every model backend.
+
+For each layout: bars as fetch_many returns them -> build_panel_features -> a
+RandomForest trained on the pooled panel, and a model of every ml_model.MODEL_BACKENDS
+backend trained per symbol with train_model. Reported: in-memory size of the raw panel
+and feature panel, peak traced memory while training on the pooled panel, and per-symbol
+test accuracy per backend. Exits with status 1 if a tree backend's test accuracy on any
+symbol differs by more than --tolerance between the layouts; hist_gradient_boosting
+(which bins the float32 values differently) and logistic are reported but not gated.
+
+Usage: python benchmarks/bench_memory.py [--symbols 100] [--years 10] [--tolerance 0.02]
+                                         [--backends random_forest,logistic]
+"""
+import os
+import sys
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+from data_fetch import compact_bars
+from feature_engineering import stack_panel, build_panel_features
+from ml_model import MODEL_BACKENDS, train_model, train_random_forest
+from synthetic import synthetic_ohlcv
+
+# Backends whose accuracy the compact layout is documented not to change: sklearn's
+# trees cast their input to float32 anyway
+UNCHANGED_BACKENDS = ("random_forest", "extra_trees")
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+def _run(frames, compact, accuracy_symbols, backends):
+    if compact:
+        frames = {s: compact_bars(df) for s, df in frames.items()}
+    raw = stack_panel(frames)
+    features = build_panel_features(raw, compact=compact)
+
+    tracemalloc.start()
+    pooled = features.droplevel("symbol").sort_index(kind="stable")
+    train_random_forest(pooled, test_days=max(1, len(pooled) // 5), n_estimators=20, n_jobs=1)
+    train_peak = tracemalloc.get_traced_memory()[1] / 1024**2
+    tracemalloc.stop()
+
+    accuracy = {}
+    for backend in backends:
+        for symbol in accuracy_symbols:
+            _, metrics = train_model(features.loc[symbol], backend)
+            accuracy[backend, symbol] = metrics["test_accuracy"]
+    return {"raw_mb": _mb(raw), "features_mb": _mb(features), "train_peak_mb": train_peak}, accuracy
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--accuracy-symbols", type=int, default=10,
+                        help="symbols a per-symbol model is trained on for the accuracy check")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="max allowed test-accuracy difference per symbol (default %(default)s)")
+    parser.add_argument("--backends", default=",".join(MODEL_BACKENDS),
+                        help="comma-separated model backends to check (default: all)")
+    args = parser.parse_args()
+
+    bars = args.years * 252
+    frames = {f"S{i:03d}": synthetic_ohlcv(bars, seed=i, freq="B") for i in range(args.symbols)}
+    checked = list(frames)[:args.accuracy_symbols]
+    print(f"{args.symbols} symbols x {bars} daily bars")
+
+    backends = [b for b in args.backends.split(",") if b]
+    full, acc_full = _run(frames, False, checked, backends)
+    compact, acc_compact = _run(frames, True, checked, backends)
+
+    print(f"{'':<16}{'default':>12}{'compact':>12}{'ratio':>8}")
+    for key, label in (("raw_mb", "raw bars"), ("features_mb", "features"), ("train_peak_mb", "train peak")):
+        print(f"{label:<16}{full[key]:>10.1f}MB{compact[key]:>10.1f}MB{compact[key] / full[key]:>8.2f}")
+
+    diffs = pd.Series({key: acc_compact[key] - acc_full[key] for key in acc_full})
+    print("\nTest accuracy, default vs compact:")
+    for backend in backends:
+        full_acc = [acc_full[backend, s] for s in checked]
+        compact_acc = [acc_compact[backend, s] for s in checked]
+        print(f"  {backend:<24} mean {np.mean(full_acc):.4f} vs {np.mean(compact_acc):.4f}, "
+              f"max |diff| {diffs[backend].abs().max():.4f}"
+              f"{'' if backend in UNCHANGED_BACKENDS else '  (not gated)'}")
+    gated = diffs[[b in UNCHANGED_BACKENDS for b, _ in diffs.index]]
+    failed = gated[gated.abs() > args.tolerance]
+    if len(failed):
+        print(f"FAIL: accuracy changed by more than {args.tolerance} for {list(failed.index)}")
+        return 1
+    print(f"OK: tree-backend accuracy unchanged within {args.tolerance}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
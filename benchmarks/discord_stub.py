@@ -0,0 +1,107 @@
+# benchmarks/discord_stub.py
+import json
+import time
+import threading
+import urllib.parse
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class DiscordWebhookStub:
+    """
+    Local stand-in for a Discord webhook endpoint. Accepts multipart posts like the real
+    API, enforces a per-webhook bucket of `limit` posts per `window` seconds (429 with a
+    JSON `retry_after` beyond it, X-RateLimit-* headers on every response) and can fail
+    the first `fail_first` posts with a 502, so post_to_discord can be exercised offline.
+
+    Usage:
+        with DiscordWebhookStub(limit=5, window=0.5) as stub:
+            with DiscordDelivery(stub.url) as delivery:
+                delivery.send_images(images)
+            stub.messages   # [{"content": ..., "files": {name: size}}, ...]
+    """
+    def __init__(self, limit=5, window=2.0, fail_first=0):
+        self.limit = limit
+        self.window = window
+        self.fail_first = fail_first
+        self.messages = []
+        self.requests = 0
+        self.rate_limited = 0
+        self._window_start = 0.0
+        self._used = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload, headers = stub._handle(self.headers.get("Content-Type", ""), body)
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/webhooks/0/stub"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _handle(self, content_type, body):
+        with self._lock:
+            self.requests += 1
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return 502, {"message": "Bad Gateway"}, {}
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start, self._used = now, 0
+            reset_after = self.window - (now - self._window_start)
+            if self._used >= self.limit:
+                self.rate_limited += 1
+                return 429, {"message": "You are being rate limited.", "retry_after": round(reset_after, 3),
+                             "global": False}, {"Retry-After": str(max(1, round(reset_after)))}
+            self._used += 1
+            self.messages.append(self._parse(content_type, body))
+            headers = {"X-RateLimit-Limit": str(self.limit),
+                       "X-RateLimit-Remaining": str(self.limit - self._used),
+                       "X-RateLimit-Reset-After": f"{reset_after:.3f}"}
+            return 204, None, headers
+
+    @staticmethod
+    def _parse(content_type, body):
+        """
+        Message text and attachment sizes of a multipart or form-encoded post.
+        """
+        out = {"content": None, "files": {}}
+        if not content_type.startswith("multipart/"):
+            out["content"] = urllib.parse.parse_qs(body.decode()).get("content", [None])[0]
+            return out
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        for part in message.get_payload():
+            filename = part.get_filename()
+            if filename:
+                out["files"][filename] = len(part.get_payload(decode=True))
+            elif part.get_param("name", header="content-disposition") == "content":
+                out["content"] = part.get_payload(decode=True).decode()
+        return out
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
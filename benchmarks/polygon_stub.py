@@ -0,0 +1,81 @@
+# benchmarks/polygon_stub.py
+import json
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class PolygonStub:
+    """
+    Local stand-in for the Polygon aggs and marketstatus endpoints.
+    Serves registered bars for any date range, paginated with `limit` and `next_url`
+    like the real API, so data_fetch can be exercised without network access.
+
+    Usage:
+        with PolygonStub() as stub:
+            stub.add_bars("SPY", df)        # df shaped like synthetic_ohlcv output
+            client = PolygonClient(base_url=stub.url, requests_per_minute=0)
+    """
+    def __init__(self, market="open"):
+        self.market = market
+        self.results = {}   # symbol -> list of Polygon-style result dicts
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                url = urllib.parse.urlparse(self.path)
+                query = urllib.parse.parse_qs(url.query)
+                if url.path.startswith("/v1/marketstatus/now"):
+                    return self._send({"market": stub.market})
+                parts = url.path.split("/")
+                if len(parts) < 5 or parts[2] != "aggs":
+                    return self._send({"status": "NOT_FOUND"}, 404)
+                results = stub.results.get(parts[4], [])
+                cursor = int(query.get("cursor", ["0"])[0])
+                limit = int(query.get("limit", ["50000"])[0])
+                body = {"status": "OK", "results": results[cursor:cursor + limit]}
+                body["resultsCount"] = len(body["results"])
+                if cursor + limit < len(results):
+                    next_query = urllib.parse.urlencode({"cursor": cursor + limit, "limit": limit})
+                    body["next_url"] = f"{stub.url}{url.path}?{next_query}"
+                self._send(body)
+
+            def _send(self, body, status=200):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def add_bars(self, symbol, df):
+        """
+        Register bars for `symbol` (a DataFrame with Open/High/Low/Close/Volume/Timestamp).
+        """
+        self.results[symbol] = [
+            {"o": o, "h": h, "l": l, "c": c, "v": v, "vw": (h + l + c) / 3, "t": int(t), "n": 1}
+            for o, h, l, c, v, t in zip(df["Open"], df["High"], df["Low"], df["Close"],
+                                        df["Volume"], df["Timestamp"])
+        ]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
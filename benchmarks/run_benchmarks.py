@@ -0,0 +1,300 @@
+# benchmarks/run_benchmarks.py
+"""
+Reproducible benchmark suite for the pipeline's hot paths.
+
+Each benchmark runs on synthetic OHLCV series of increasing size; network code is
+exercised against a local Polygon stub. Wall time (best of --repeat) and peak Python
+memory (tracemalloc, separate run) are appended to benchmarks/history.jsonl and
+compared with benchmarks/baseline.json; anything slower or larger than the baseline
+by more than --tolerance is flagged and the script exits with status 1.
+
+Usage:
+    python benchmarks/run_benchmarks.py                      # all benchmarks, default sizes
+    python benchmarks/run_benchmarks.py --sizes 1000,100000 --only build_features,rsi
+    python benchmarks/run_benchmarks.py --save-baseline      # record the current numbers as baseline
+"""
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("BAR_CACHE_DIR", tempfile.mkdtemp(prefix="bench_cache_"))
+
+import feature_engineering as fe
+from ml_model import train_random_forest, train_model
+from backtest import simple_backtest
+from support_resistance import calculate_pivot_points, rolling_pivots
+from synthetic import synthetic_ohlcv
+from polygon_stub import PolygonStub
+from discord_stub import DiscordWebhookStub
+
+HISTORY_PATH = os.path.join(BENCH_DIR, "history.jsonl")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_SIZES = [1_000, 100_000, 10_000_000]
+
+class _AlternatingModel:
+    """
+    Stand-in model for timing the backtest on its own (long every other bar).
+    """
+    def predict(self, X):
+        return np.arange(len(X)) % 2
+
+def _on_close(fn):
+    def setup(n):
+        close = synthetic_ohlcv(n)["Close"]
+        return (lambda: fn(close)), None
+    return setup
+
+def _on_bars(fn):
+    def setup(n):
+        df = synthetic_ohlcv(n)
+        return (lambda: fn(df)), None
+    return setup
+
+def _on_features(fn):
+    def setup(n):
+        df = fe.build_features(synthetic_ohlcv(n))
+        return (lambda: fn(df)), None
+    return setup
+
+def _pivot_points_per_bar(df):
+    return [calculate_pivot_points(h, l, c)
+            for h, l, c in zip(df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy())]
+
+def _all_pivots(df):
+    high, low, close = (df[c].to_numpy() for c in ("High", "Low", "Close"))
+    return [rolling_pivots(high, low, close, df.index, period, "classic") for period in ("bar", "W", "M")]
+
+def _fused(backend):
+    from indicator_kernel import fused_indicators
+
+    def run(df):
+        return fused_indicators(df["Close"].to_numpy(), df["High"].to_numpy(), df["Low"].to_numpy(),
+                                backend=backend)
+    return run
+
+def _bench_fetch(n):
+    import http_client
+    from data_fetch import fetch_daily_data
+    stub = PolygonStub().start()
+    stub.add_bars("BENCH", synthetic_ohlcv(n, freq="D"))
+    http_client.set_client(http_client.PolygonClient(base_url=stub.url, requests_per_minute=0))
+    return (lambda: fetch_daily_data("BENCH", use_cache=False)), stub.stop
+
+def _sample_report(symbol="SPY"):
+    from post_to_discord import generate_report
+    return generate_report({"trend": "BULLISH", "rsi": "55.00", "rsi_comment": "RSI in neutral range",
+                            "support": "1, 2, 3", "resistance": "4, 5, 6"},
+                           {"momentum": "BULLISH", "rsi": "55.00", "rsi_comment": "RSI in neutral range",
+                            "atr": "N/A", "trade_setup": "Lorem ipsum dolor sit amet. " * 20}).replace("SPY", symbol)
+
+def _bench_report(n):
+    from post_to_discord import create_report_image
+    report = _sample_report()
+    path = os.path.join(tempfile.mkdtemp(), "report.png")
+    return (lambda: create_report_image(report, output_file=path)), None
+
+def _bench_render_batch(n):
+    from post_to_discord import render_reports
+    reports = {f"S{i}": _sample_report(f"S{i}") for i in range(n)}
+    return (lambda: render_reports(reports)), None
+
+def _bench_delivery(n):
+    from post_to_discord import DiscordDelivery, render_report
+    stub = DiscordWebhookStub(limit=1_000_000).start()
+    images = {f"S{i}": render_report(_sample_report(f"S{i}")) for i in range(n)}
+
+    def deliver():
+        with DiscordDelivery(stub.url) as delivery:
+            delivery.send_images(images)
+    return deliver, stub.stop
+
+def _bench_predict(n):
+    from prediction_service import PredictionService
+    from ml_model import FEATURE_COLS
+    df = fe.build_features(synthetic_ohlcv(max(n, 2_000) + 250, freq="D"))
+    model, _ = train_random_forest(df.iloc[:2_000])
+    service = PredictionService(model)
+    X = df[FEATURE_COLS].to_numpy()[:n]
+    return (lambda: service.predict_proba(X)), service.close
+
+def _bench_feature_store(n):
+    from feature_store import FeatureStore, BUILD_FEATURE_SPECS
+    bars = synthetic_ohlcv(n + 1_000)
+    store = FeatureStore(tempfile.mkdtemp(prefix="bench_store_"))
+    # The store path must match build_features before its speed means anything: on a cold
+    # store exactly, on a warm one as build_features over the stored history
+    pd.testing.assert_frame_equal(store.build_features("BENCH", bars.iloc[:n], compact=True),
+                                  fe.build_features(bars.iloc[:n], compact=True), rtol=1e-6)
+    window = bars.iloc[n // 2:n + 10]
+    expected = fe.build_features(bars.iloc[:n + 10], compact=True)
+    pd.testing.assert_frame_equal(store.build_features("BENCH", window, compact=True),
+                                  expected[expected.index >= window.index[0]], rtol=1e-6)
+    stop = iter(range(n + 11, n + 1_001))  # after the bars the warm check stored
+
+    def append_bar():
+        # One new bar per call, served with the last 1000 bars of context
+        end = next(stop)
+        return store.get("BENCH", BUILD_FEATURE_SPECS, bars.iloc[max(0, end - 1_000):end])
+    return append_bar, None
+
+def _bench_incremental(n):
+    from incremental_features import IncrementalFeatureEngine, INDICATOR_COLS
+    df = synthetic_ohlcv(max(n, 1_000))
+    # A flat run (RSI undefined, zero Bollinger width) and an all-gain run (RSI exactly
+    # 100), where running sums would leave residue that build_features doesn't have
+    cut = len(df) // 3
+    df.iloc[cut:cut + 30, df.columns.get_indexer(["Open", "High", "Low", "Close"])] = df["Close"].iloc[cut - 1]
+    df.iloc[2 * cut:2 * cut + 30, df.columns.get_loc("Close")] = df["Close"].iloc[2 * cut - 1] * 1.0001 ** np.arange(1, 31)
+    df["High"] = df[["High", "Close"]].max(axis=1)
+    df["Low"] = df[["Low", "Close"]].min(axis=1)
+    engine = IncrementalFeatureEngine()
+    got = engine.update(df)
+    expected = fe.build_features(df, compact=False)
+    pd.testing.assert_frame_equal(got[INDICATOR_COLS + ["Target"]], expected[INDICATOR_COLS + ["Target"]],
+                                  check_dtype=False, check_freq=False, rtol=1e-8)
+    ts, bar = df.index[-1], df.iloc[-1].to_dict()
+    # Re-sending the newest bar (a revised live bar): roll back one bar and re-apply it
+    return (lambda: engine.update_bar(ts, bar)), None
+
+# name -> (setup(n) -> (callable, teardown or None), max bars it is run at or None)
+BENCHMARKS = {
+    "ema": (_on_close(lambda s: fe.ema(s, 12)), None),
+    "sma": (_on_close(lambda s: fe.sma(s, 50)), None),
+    "rsi": (_on_close(lambda s: fe.rsi(s, 14)), None),
+    "macd": (_on_close(fe.macd), None),
+    "bollinger_bands": (_on_close(fe.bollinger_bands), None),
+    "true_range": (_on_bars(fe.true_range), None),
+    "atr": (_on_bars(fe.atr), None),
+    "build_features": (_on_bars(fe.build_features), None),
+    "build_features_fused": (_on_bars(lambda df: fe.build_features(df, fused=True)), None),
+    "feature_store_append": (_bench_feature_store, None),
+    "incremental_update": (_bench_incremental, 100_000),
+    "fused_indicators_numpy": (_on_bars(_fused("numpy")), None),
+    "fused_indicators_numba": (_on_bars(_fused("numba")), None),
+    "train_random_forest": (_on_features(lambda df: train_random_forest(df, test_days=max(1, len(df) // 5))), 100_000),
+    "train_extra_trees": (_on_features(lambda df: train_model(df, "extra_trees", test_days=max(1, len(df) // 5))), 100_000),
+    "train_hist_gradient_boosting": (_on_features(lambda df: train_model(df, "hist_gradient_boosting",
+                                                                         test_days=max(1, len(df) // 5))), 100_000),
+    "train_logistic": (_on_features(lambda df: train_model(df, "logistic", test_days=max(1, len(df) // 5))), 100_000),
+    "simple_backtest": (_on_features(lambda df: simple_backtest(df, _AlternatingModel(), test_days=len(df))), None),
+    "calculate_pivot_points": (_on_bars(_pivot_points_per_bar), 100_000),
+    "rolling_pivots": (_on_bars(_all_pivots), None),
+    "create_report_image": (_bench_report, 1),
+    "render_reports": (_bench_render_batch, 100),
+    "discord_delivery": (_bench_delivery, 100),
+    "fetch_daily_data": (_bench_fetch, 100_000),
+    "prediction_service": (_bench_predict, 100_000),
+}
+
+def _run(setup, n, repeat):
+    """
+    Time `repeat` runs (best wall time) and measure peak traced memory in one more run.
+    """
+    fn, teardown = setup(n)
+    try:
+        fn()  # warm-up (imports, caches, page faults)
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        if teardown:
+            teardown()
+    return {"time_s": min(times), "peak_mb": peak / 1024**2}
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated bar counts (default: %(default)s)")
+    parser.add_argument("--only", default="", help="comma-separated benchmark names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown / memory growth vs. baseline (default 25%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        setup, max_size = BENCHMARKS[name]
+        run_sizes = sorted({min(n, max_size) if max_size else n for n in sizes})
+        for n in run_sizes:
+            key = f"{name}[{n}]"
+            try:
+                results[key] = _run(setup, n, args.repeat)
+                print(f"{key:<40} {results[key]['time_s'] * 1000:>10.2f} ms  {results[key]['peak_mb']:>9.1f} MB")
+            except Exception as e:
+                results[key] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"{key:<40} skipped ({results[key]['error']})")
+
+    record = {
+        "timestamp": pd.Timestamp.now().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "results": results,
+    }
+    with open(HISTORY_PATH, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline yet; run with --save-baseline to record one.")
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if not base or "error" in res or "error" in base:
+            continue
+        # Absolute slack keeps tiny benchmarks from flagging on timer/allocator noise
+        for metric, slack in (("time_s", 0.001), ("peak_mb", 1.0)):
+            if res[metric] > base[metric] * (1 + args.tolerance) and res[metric] - base[metric] > slack:
+                regressions.append(f"{key} {metric}: {base[metric]:.4g} -> {res[metric]:.4g} "
+                                   f"({res[metric] / base[metric] - 1:+.0%})")
+    if regressions:
+        print("\nREGRESSIONS vs. baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nNo regressions vs. baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
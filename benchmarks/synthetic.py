@@ -0,0 +1,25 @@
+# benchmarks/synthetic.py
+import numpy as np
+import pandas as pd
+
+def synthetic_ohlcv(n, seed=0, freq="min", start="2000-01-03"):
+    """
+    Random-walk OHLCV bars shaped like data_fetch.fetch_daily_data output
+    (Volume, vw, Open, Close, High, Low, Timestamp, n; indexed by date).
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = close * (1 + rng.normal(0, 0.0005, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, n)))
+    index = pd.date_range(start, periods=n, freq=freq, name="date")
+    return pd.DataFrame({
+        "Volume": rng.integers(1_000, 1_000_000, n).astype(np.float64),
+        "vw": (high + low + close) / 3,
+        "Open": open_,
+        "Close": close,
+        "High": high,
+        "Low": low,
+        "Timestamp": index.as_unit("ms").asi8,
+        "n": rng.integers(1, 1_000, n),
+    }, index=index)
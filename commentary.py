@@ -0,0 +1,186 @@
+# commentary.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import numpy as np
+import openai
+
+from api_keys import OPENAI_API_KEY
+from config import (OPENAI_MODEL, OPENAI_BASE_URL, LLM_MAX_CONCURRENCY, LLM_TIMEOUT,
+                    COMMENTARY_CACHE_PATH, COMMENTARY_CACHE_TTL, COMMENTARY_CACHE_MAX_ENTRIES)
+
+SYSTEM_PROMPT = "You are a helpful financial assistant."
+
+def build_prompt(results, symbol="SPY"):
+    """
+    Chat prompt for the market context returned by
+    analysis.analyze_current_spy_and_vxx(..., return_data=True).
+    """
+    return f"""
+We have the following market context:
+- {symbol} is {results['market_trend']}
+- RSI_14 is {results['rsi_value']:.2f}, meaning {results['rsi_comment']}
+- VXX is {results['vxx_close']:.2f}, indicating {results['vxx_comment']}
+- Pivot Point: {results['pivot_point']}
+- Resistance Levels: {results['resistance_1']}, {results['resistance_2']}, {results['resistance_3']}
+- Support Levels: {results['support_1']}, {results['support_2']}, {results['support_3']}
+
+Generate a concise set of bullet points on potential actions or considerations
+for a trader or hedge fund in this scenario. Assume they have moderate risk tolerance.
+""".strip()
+
+def _normalize(value):
+    """
+    Numbers rounded to the 2 decimals the prompt shows, strings trimmed, so contexts
+    that produce the same prompt hash the same.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return round(float(value), 2) + 0.0  # + 0.0 turns -0.0 into 0.0
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return str(value)
+
+def cache_key(results, symbol="SPY", model=OPENAI_MODEL):
+    """
+    Hash of the normalized prompt inputs, the symbol, the model and the system prompt.
+    """
+    payload = {
+        "symbol": symbol,
+        "model": model,
+        "system": SYSTEM_PROMPT,
+        "inputs": {k: _normalize(v) for k, v in sorted(results.items())},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class CommentaryCache:
+    """
+    JSON-file cache of LLM responses keyed by cache_key().
+
+    A response is reused while it is younger than `ttl` seconds. Older responses stay
+    around as the per-symbol fallback for failed or timed-out requests until the
+    least recently used entries beyond `max_entries` are evicted.
+    """
+    def __init__(self, path=COMMENTARY_CACHE_PATH, ttl=COMMENTARY_CACHE_TTL,
+                 max_entries=COMMENTARY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Ignoring unreadable commentary cache {path}: {e}")
+
+    def get(self, key):
+        """
+        Cached text for `key` if it is still fresh, else None.
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry["created"] > self.ttl:
+                return None
+            entry["used"] = time.time()
+            return entry["text"]
+
+    def latest(self, symbol):
+        """
+        The most recently generated text for `symbol` regardless of age, or None.
+        """
+        with self._lock:
+            entries = [e for e in self.entries.values() if e["symbol"] == symbol]
+            return max(entries, key=lambda e: e["created"])["text"] if entries else None
+
+    def put(self, key, symbol, text):
+        now = time.time()
+        with self._lock:
+            self.entries[key] = {"symbol": symbol, "text": text, "created": now, "used": now}
+            if len(self.entries) > self.max_entries:
+                by_use = sorted(self.entries, key=lambda k: self.entries[k]["used"])
+                for old in by_use[:len(self.entries) - self.max_entries]:
+                    del self.entries[old]
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = json.dumps(self.entries)
+        with open(self.path + ".tmp", "w") as f:
+            f.write(snapshot)
+        os.replace(self.path + ".tmp", self.path)
+
+def make_client(base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY):
+    """
+    Async OpenAI client; `base_url` points it at any OpenAI-compatible server.
+    Retries are left to the caller, which falls back to cached text instead.
+    """
+    return openai.AsyncOpenAI(api_key=api_key, base_url=base_url or None, max_retries=0)
+
+async def _complete(client, prompt, model):
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=200,
+        temperature=0.7
+    )
+    return response.choices[0].message.content.strip()
+
+async def generate_commentary(contexts, client=None, cache=None, model=OPENAI_MODEL,
+                              max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT):
+    """
+    Generate commentary for many symbols concurrently, at most `max_concurrency`
+    requests in flight. A symbol whose market context matches a fresh cache entry is
+    answered from the cache without a request. If a request fails or takes longer than
+    `timeout` seconds, the symbol's last cached text is used instead (or the error
+    message if there is none).
+
+    :param contexts: Dict symbol -> results of analyze_current_spy_and_vxx(return_data=True).
+    :return: Dict symbol -> commentary text.
+    """
+    cache = cache if cache is not None else CommentaryCache()
+    own_client = client is None
+    client = make_client() if own_client else client
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def one(symbol, results):
+        key = cache_key(results, symbol, model)
+        text = cache.get(key)
+        if text is not None:
+            return text
+        async with semaphore:
+            try:
+                text = await asyncio.wait_for(_complete(client, build_prompt(results, symbol), model), timeout)
+            except Exception as e:
+                timed_out = isinstance(e, (asyncio.TimeoutError, openai.APITimeoutError))
+                error = "request timed out" if timed_out else str(e)
+                fallback = cache.latest(symbol)
+                if fallback is None:
+                    return f"Error calling OpenAI ChatCompletion: {error}"
+                print(f"[WARN] Commentary for {symbol} failed ({error}); using the last cached response.")
+                return fallback
+        cache.put(key, symbol, text)
+        return text
+
+    try:
+        texts = await asyncio.gather(*(one(symbol, results) for symbol, results in contexts.items()))
+    finally:
+        if own_client:
+            await client.close()
+    cache.save()
+    return dict(zip(contexts, texts))
+
+def commentary_for(contexts, **kwargs):
+    """
+    Blocking wrapper around generate_commentary for synchronous callers.
+    """
+    return asyncio.run(generate_commentary(contexts, **kwargs))
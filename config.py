@@ -1,4 +1,5 @@
 # config.py
+import os
 from api_keys import POLYGON_API_KEY
 
 # Which ticker to model? For a broad market proxy, we might use SPY.
@@ -15,4 +16,87 @@ TRAINING_LOOKBACK_DAYS = 3 * 365  # ~3 years
 BACKTEST_DAYS = 180  # last ~6 months
 
 # Some threshold for "market open" check (if you want to skip or adapt intraday logic)
-MARKET_STATUS_URL = "https://api.polygon.io/v1/marketstatus/now"
+POLYGON_BASE_URL = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io")
+MARKET_STATUS_PATH = "/v1/marketstatus/now"
+MARKET_STATUS_URL = f"{POLYGON_BASE_URL}{MARKET_STATUS_PATH}"
+# Market hours come from the local NYSE calendar (see trading_calendar.py), precomputed for these years.
+CALENDAR_FIRST_YEAR = 2000
+CALENDAR_LAST_YEAR = 2040
+# Compare the calendar with Polygon's market status at most this often (0 = never)
+MARKET_STATUS_CROSSCHECK_MINUTES = int(os.getenv("MARKET_STATUS_CROSSCHECK_MINUTES", "0"))
+
+# Opt-in memory-compact frames: float32 OHLCV/features, no unused Polygon fields (see data_fetch.compact_bars,
+# feature_engineering.compact_features). Tree-model (random_forest, extra_trees) accuracy is unchanged;
+# hist_gradient_boosting/logistic can shift. See benchmarks/bench_memory.py.
+COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "0") == "1"
+# Compute build_features' indicators in one fused kernel (Numba if installed, else NumPy) instead of
+# separate pandas rolling/ewm calls; see indicator_kernel.py and benchmarks/bench_indicators.py.
+FUSED_INDICATORS = os.getenv("FUSED_INDICATORS", "0") == "1"
+
+# Local on-disk bar cache (one Parquet file per symbol/timeframe)
+BAR_CACHE_DIR = os.getenv("BAR_CACHE_DIR", "data_cache")
+# Append-only 1-minute bar files, one per symbol and exchange day (see intraday_store.py)
+INTRADAY_DIR = os.getenv("INTRADAY_DIR", "intraday")
+
+# Shared Polygon HTTP client (see http_client.py)
+# Requests per minute allowed by your Polygon plan (free tier = 5; 0 disables the limiter)
+POLYGON_REQUESTS_PER_MINUTE = int(os.getenv("POLYGON_REQUESTS_PER_MINUTE", "5"))
+POLYGON_MAX_CONCURRENCY = 8   # parallel symbol fetches in fetch_many
+HTTP_TIMEOUT = 30             # seconds per request
+HTTP_MAX_RETRIES = 5          # retries on 429/5xx/connection errors, with exponential backoff
+
+# Saved state of the incremental indicator engine used by the hourly fetch job
+FEATURE_STATE_DIR = os.getenv("FEATURE_STATE_DIR", "feature_state")
+
+# Materialized indicator columns per symbol/timeframe/params (see feature_store.py)
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "feature_store")
+
+# Trained-model registry (content-addressed; see model_registry.py)
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models")
+MODEL_REGISTRY_MAX_ENTRIES = 20           # least recently used models beyond this are evicted
+MODEL_REGISTRY_MAX_BYTES = 500 * 1024**2  # ... as are models beyond this total size
+# Model trained and backtested by main.py: random_forest, extra_trees, hist_gradient_boosting or logistic
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "random_forest")
+
+# Hyperparameter search (see tuning.py); fold scores are cached here across searches
+TUNING_CACHE_PATH = os.getenv("TUNING_CACHE_PATH", "tuning_cache.jsonl")
+
+# Local prediction service (see prediction_service.py)
+PREDICT_HOST = os.getenv("PREDICT_HOST", "127.0.0.1")
+PREDICT_PORT = int(os.getenv("PREDICT_PORT", "8765"))
+PREDICT_MAX_BATCH = 4096   # rows per predict_proba call
+PREDICT_MAX_WAIT_MS = 0.0  # extra wait for more requests before predicting (0 = batch whatever is queued)
+
+# Report images and Discord webhook delivery (see post_to_discord.py)
+REPORT_FONT_PATH = os.getenv("REPORT_FONT_PATH", "arial.ttf")  # Pillow's default font is used if it can't be loaded
+DISCORD_TIMEOUT = 15       # seconds per webhook request
+DISCORD_MAX_RETRIES = 5    # retries on 429 (honouring retry_after), 5xx and connection errors
+
+# LLM market commentary (see commentary.py)
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # any OpenAI-compatible server; empty = api.openai.com
+LLM_MAX_CONCURRENCY = 4   # chat completions in flight at once
+LLM_TIMEOUT = 30          # seconds per completion before falling back to the last cached text
+COMMENTARY_CACHE_PATH = os.getenv("COMMENTARY_CACHE_PATH", "commentary_cache.json")
+COMMENTARY_CACHE_TTL = 6 * 3600        # seconds a response is reused for an identical market context
+COMMENTARY_CACHE_MAX_ENTRIES = 500     # least recently used responses beyond this are evicted
+
+# Keyed (symbol, timestamp) SQLite store for saved bars and features (see history_store.py)
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "history.db")
+
+# Saved Prophet models and forecasts per symbol (see forecasting.py)
+FORECAST_MODEL_DIR = os.getenv("FORECAST_MODEL_DIR", "forecast_models")
+
+# Per-stage timing/resource metrics (see instrumentation.py); off unless PIPELINE_METRICS=1
+METRICS_ENABLED = os.getenv("PIPELINE_METRICS", "0") == "1"
+METRICS_LOG_PATH = os.getenv("PIPELINE_METRICS_LOG", "metrics.jsonl")
+# Prometheus textfile-collector output (empty = don't write one)
+METRICS_PROM_PATH = os.getenv("PIPELINE_METRICS_PROM", "")
+# Profile one named stage, e.g. PIPELINE_PROFILE_STAGE=features; "cprofile" or "pyinstrument"
+PROFILE_STAGE = os.getenv("PIPELINE_PROFILE_STAGE", "")
+PROFILER = os.getenv("PIPELINE_PROFILER", "cprofile")
+
+# Live daemon (see daemon.py): symbols refreshed on every bar close during the session
+DAEMON_SYMBOLS = os.getenv("DAEMON_SYMBOLS", "SPY,VXX,GLD,OXY").split(",")
+DAEMON_BAR_INTERVAL = os.getenv("DAEMON_BAR_INTERVAL", "1h")
+DAEMON_BAR_DELAY_SECONDS = 60  # wait after a bar closes before fetching it, so Polygon has published it
@@ -0,0 +1,307 @@
+# daemon.py
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import history_store
+from config import (DAEMON_SYMBOLS, DAEMON_BAR_INTERVAL, DAEMON_BAR_DELAY_SECONDS,
+                    POLYGON_MAX_CONCURRENCY, TRAINING_LOOKBACK_DAYS)
+from data_fetch import fetch_bars
+from incremental_features import update_symbol
+import trading_calendar
+
+##############################################
+#  CLOCKS
+##############################################
+class Clock:
+    """
+    Wall clock. All times are tz-aware UTC pandas Timestamps.
+    """
+    def now(self):
+        return pd.Timestamp.now(tz="UTC")
+
+    async def sleep_until(self, when):
+        delay = (when - self.now()).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def run_blocking(self, executor, fn, *args):
+        """
+        Run `fn(*args)` in `executor` (None = the loop's default thread pool).
+        """
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+class SimulatedClock(Clock):
+    """
+    Virtual clock for running the daemon offline: time only moves when run_until()
+    advances it, jumping straight to the next sleeper's wake-up time. Work sent to an
+    executor takes no simulated time; use `await clock.sleep_until(...)` in a job to
+    model a slow step.
+    """
+    def __init__(self, start):
+        start = pd.Timestamp(start)
+        self._now = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+        self._sleepers = []
+        self._seq = itertools.count()
+        self._busy = 0
+
+    def now(self):
+        return self._now
+
+    async def sleep_until(self, when):
+        if when <= self._now:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (when, next(self._seq), future))
+        await future
+
+    async def run_blocking(self, executor, fn, *args):
+        self._busy += 1
+        try:
+            return await super().run_blocking(executor, fn, *args)
+        finally:
+            self._busy -= 1
+
+    async def _settle(self, rounds):
+        """
+        Let every runnable task proceed until all are waiting on the clock again.
+        """
+        while True:
+            for _ in range(rounds):
+                await asyncio.sleep(0)
+            if not self._busy:
+                return
+            await asyncio.sleep(0.001)  # executor work runs in real time
+
+    async def run_until(self, end, settle_rounds=50):
+        """
+        Advance simulated time to `end`, waking sleepers in time order.
+        """
+        end = pd.Timestamp(end)
+        end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+        await self._settle(settle_rounds)
+        while self._sleepers and self._sleepers[0][0] <= end:
+            when, _, future = heapq.heappop(self._sleepers)
+            self._now = max(self._now, when)
+            if not future.done():
+                future.set_result(None)
+            await self._settle(settle_rounds)
+        self._now = max(self._now, end)
+
+##############################################
+#  TRIGGERS
+##############################################
+# A trigger is a function next_fire(after) -> first fire time strictly after `after`.
+def _sessions_from(ts, max_days=14):
+    day = ts.tz_convert(trading_calendar.EXCHANGE_TZ).normalize().tz_localize(None)
+    sessions = trading_calendar.sessions_between(day - pd.Timedelta(days=1), day + pd.Timedelta(days=max_days))
+    return zip(sessions["open"], sessions["close"])
+
+def bar_closes(interval=DAEMON_BAR_INTERVAL, delay_seconds=DAEMON_BAR_DELAY_SECONDS):
+    """
+    Fire `delay_seconds` after each `interval` bar closes during the regular session
+    (bars are aligned to the open; the last, possibly short, bar closes at the close,
+    which is 13:00 ET on early-close days).
+    """
+    step = pd.Timedelta(interval)
+    delay = pd.Timedelta(seconds=delay_seconds)
+
+    def next_fire(after):
+        for open_, close in _sessions_from(after):
+            if close + delay <= after:
+                continue
+            k = max(1, int((after - delay - open_) // step) + 1)
+            fire = min(open_ + k * step, close) + delay
+            if fire <= after:
+                fire = close + delay
+            return fire
+        raise RuntimeError(f"No trading session found after {after}")
+    return next_fire
+
+def session_boundaries(which=("open", "close")):
+    """
+    Fire at each regular-session open and/or close.
+    """
+    def next_fire(after):
+        for open_, close in _sessions_from(after):
+            for name, ts in (("open", open_), ("close", close)):
+                if name in which and ts > after:
+                    return ts
+        raise RuntimeError(f"No trading session found after {after}")
+    return next_fire
+
+##############################################
+#  DAEMON
+##############################################
+class JobStats:
+    """
+    Run counts and latency history for one job. Times are measured on the daemon clock:
+    lag = start - scheduled fire time, latency = end - start.
+    """
+    def __init__(self, window=1000):
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.lags = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+
+    def summary(self):
+        lat = np.array(self.latencies) if self.latencies else np.array([np.nan])
+        lag = np.array(self.lags) if self.lags else np.array([np.nan])
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "latency_p50_s": float(np.percentile(lat, 50)),
+            "latency_p95_s": float(np.percentile(lat, 95)),
+            "latency_max_s": float(lat.max()),
+            "lag_p50_s": float(np.percentile(lag, 50)),
+            "lag_max_s": float(lag.max()),
+        }
+
+class Job:
+    def __init__(self, name, next_fire, fn, overrun):
+        if overrun not in ("skip", "queue"):
+            raise ValueError(f"overrun must be 'skip' or 'queue', got {overrun!r}")
+        self.name = name
+        self.next_fire = next_fire
+        self.fn = fn
+        self.overrun = overrun
+        self.stats = JobStats()
+        self.running = None   # task of the run in progress
+        self.pending = None   # fire time of a queued run (overrun="queue")
+
+class Daemon:
+    """
+    Asyncio job runner. Each job fires on its own trigger; independent jobs (e.g. one
+    pipeline per symbol) run concurrently. Blocking I/O goes to a thread pool bounded by
+    `max_io`, CPU-bound work to `executor` (a process pool by default).
+
+    If a job is still running when it fires again, overrun="skip" drops the new run
+    and overrun="queue" coalesces all missed fires into a single run started as soon
+    as the current one finishes.
+    """
+    def __init__(self, clock=None, executor=None, max_io=POLYGON_MAX_CONCURRENCY):
+        self.clock = clock or Clock()
+        self.executor = executor
+        self.max_io = max_io
+        self.jobs = {}
+        self._io_slots = None
+
+    def add_job(self, name, next_fire, fn, overrun="skip"):
+        """
+        Register async `fn(scheduled_time)` to run whenever `next_fire` triggers.
+        """
+        self.jobs[name] = Job(name, next_fire, fn, overrun)
+        return self.jobs[name]
+
+    async def run_io(self, fn, *args):
+        """
+        Run blocking I/O `fn(*args)` in a thread (at most `max_io` at a time).
+        """
+        async with self._io_slots:
+            return await self.clock.run_blocking(None, fn, *args)
+
+    async def run_cpu(self, fn, *args):
+        """
+        Run CPU-bound `fn(*args)` in the CPU executor.
+        """
+        return await self.clock.run_blocking(self.executor, fn, *args)
+
+    async def _execute(self, job, scheduled):
+        while scheduled is not None:
+            start = self.clock.now()
+            job.stats.lags.append((start - scheduled).total_seconds())
+            try:
+                await job.fn(scheduled)
+                job.stats.runs += 1
+            except Exception as e:
+                job.stats.failures += 1
+                print(f"[ERROR] Job {job.name} (fired {scheduled}) failed: {e}")
+            job.stats.latencies.append((self.clock.now() - start).total_seconds())
+            scheduled, job.pending = job.pending, None
+        job.running = None
+
+    async def _job_loop(self, job):
+        fire = job.next_fire(self.clock.now())
+        while True:
+            await self.clock.sleep_until(fire)
+            if job.running is None:
+                job.running = asyncio.create_task(self._execute(job, fire))
+            elif job.overrun == "queue" and job.pending is None:
+                job.pending = fire
+            else:
+                job.stats.skipped += 1
+                print(f"[WARN] Job {job.name} still running; dropping the {fire} run.")
+            fire = job.next_fire(fire)
+
+    async def run(self):
+        """
+        Run all jobs until cancelled.
+        """
+        self._io_slots = asyncio.Semaphore(self.max_io)
+        own_executor = self.executor is None
+        if own_executor:
+            self.executor = ProcessPoolExecutor()
+        loops = [asyncio.create_task(self._job_loop(job)) for job in self.jobs.values()]
+        try:
+            await asyncio.gather(*loops)
+        finally:
+            for task in loops:
+                task.cancel()
+            running = [job.running for job in self.jobs.values() if job.running is not None]
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*loops, *running, return_exceptions=True)
+            if own_executor:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+
+    def stats(self):
+        """
+        Per-job run counts and latency percentiles as a DataFrame.
+        """
+        return pd.DataFrame.from_dict({name: job.stats.summary() for name, job in self.jobs.items()},
+                                      orient="index")
+
+def symbol_pipeline(daemon, symbol, multiplier=1, timespan="day", lookback_days=TRAINING_LOOKBACK_DAYS):
+    """
+    Job body refreshing one symbol: fetch bars (I/O thread), update its incremental
+    features (CPU executor), upsert the new rows into the historical store (I/O thread).
+    """
+    async def run(scheduled):
+        df_raw = await daemon.run_io(fetch_bars, symbol, lookback_days, multiplier, timespan)
+        if df_raw.empty:
+            print(f"[WARN] No data returned for {symbol}.")
+            return
+        df_feat = await daemon.run_cpu(update_symbol, symbol, df_raw)
+        if not df_feat.empty:
+            await daemon.run_io(history_store.upsert, df_feat, symbol, "features")
+    return run
+
+def build_daemon(symbols=DAEMON_SYMBOLS, clock=None, executor=None, bar_interval=DAEMON_BAR_INTERVAL):
+    """
+    Daemon with one pipeline job per symbol on every bar close, plus a stats report
+    at each session close.
+    """
+    daemon = Daemon(clock=clock, executor=executor)
+    for symbol in symbols:
+        daemon.add_job(f"pipeline:{symbol}", bar_closes(bar_interval), symbol_pipeline(daemon, symbol))
+
+    async def report(scheduled):
+        print(f"=== Job stats at {scheduled} ===")
+        print(daemon.stats().to_string())
+    daemon.add_job("session_report", session_boundaries(("close",)), report)
+    return daemon
+
+if __name__ == "__main__":
+    print(f"=== Starting daemon for {', '.join(DAEMON_SYMBOLS)} ({DAEMON_BAR_INTERVAL} bars) ===")
+    try:
+        asyncio.run(build_daemon().run())
+    except KeyboardInterrupt:
+        pass
@@ -1,39 +1,244 @@
 # data_fetch.py
-import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from api_keys import POLYGON_API_KEY
-from config import TARGET_TICKER, TRAINING_LOOKBACK_DAYS
+from concurrent.futures import ThreadPoolExecutor
+from config import TRAINING_LOOKBACK_DAYS, POLYGON_MAX_CONCURRENCY, COMPACT_DTYPES
+from bar_cache import (load_bars, save_bars, merge_bars, invalidate_bars, iter_cached_bars,
+                       cached_covered_from, cached_gaps_checked_through, mark_gaps_checked, BarWriter)
+from http_client import get_client
+from trading_calendar import missing_sessions
+import intraday_store
 
-def fetch_daily_data(symbol, lookback_days=TRAINING_LOOKBACK_DAYS):
+# Polygon aggregate fields -> our column names, and the dtype every chunk is cast to
+# so pages (and cache row groups) always share one schema.
+_COLUMNS = {"o": "Open", "h": "High", "l": "Low", "c": "Close", "v": "Volume", "t": "Timestamp"}
+_BAR_DTYPES = {
+    "Volume": "float64", "vw": "float64", "Open": "float64", "Close": "float64",
+    "High": "float64", "Low": "float64", "Timestamp": "int64", "n": "int64",
+}
+
+def compact_bars(df):
     """
-    Fetch daily OHLCV data for `symbol` from Polygon,
-    covering approximately `lookback_days`.
-    Returns a DataFrame with date as index.
+    Memory-compact copy of fetched bars: float32 Open/High/Low/Close/Volume only.
+    The raw epoch `Timestamp` (already encoded in the int64 datetime index), the
+    volume-weighted price `vw` and the trade count `n` are dropped since nothing downstream uses them.
     """
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    start_date = (datetime.now() - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+    return df[["Open", "High", "Low", "Close", "Volume"]].astype(np.float32)
 
-    url = f"https://api.polygon.io/v2/aggs/ticker/{symbol}/range/1/day/{start_date}/{end_date}"
+def _results_to_frame(results):
+    """
+    Convert one page of Polygon aggregate results into a typed DataFrame indexed by date.
+    """
+    df = pd.DataFrame(results)
+    df.rename(columns=_COLUMNS, inplace=True)
+    df = df.reindex(columns=list(_BAR_DTYPES))
+    df["n"] = df["n"].fillna(0)
+    df = df.astype(_BAR_DTYPES)
+    df["date"] = pd.to_datetime(df["Timestamp"], unit="ms")
+    df.set_index("date", inplace=True)
+    return df
+
+def iter_aggregates(symbol, start_date, end_date, multiplier=1, timespan="day", limit=50000):
+    """
+    Stream OHLCV bars for `symbol` between `start_date` and `end_date` (inclusive,
+    "YYYY-MM-DD" strings) from Polygon, following `next_url` pagination.
+    Yields one typed DataFrame per page as it arrives, so memory stays bounded by `limit`.
+    :param multiplier: Size of the timespan multiplier (e.g. 5 with "minute" => 5-minute bars).
+    :param timespan: Polygon timespan ("minute", "hour", "day", "week", ...).
+    Raises on HTTP/network errors once the client's retries are exhausted.
+    """
+    url = f"/v2/aggs/ticker/{symbol}/range/{multiplier}/{timespan}/{start_date}/{end_date}"
     params = {
         "adjusted": "true",
         "sort": "asc",
-        "limit": 50000,
-        "apiKey": POLYGON_API_KEY
+        "limit": limit,
     }
-    try:
-        r = requests.get(url, params=params)
-        data = r.json()
-        if "results" not in data or not data["results"]:
-            print(f"[WARN] No daily data found for {symbol}.")
+    client = get_client()
+    while url:
+        data = client.get_json(url, params=params)
+        if data.get("results"):
+            yield _results_to_frame(data["results"])
+        # next_url already carries the cursor and query string
+        url = data.get("next_url")
+        params = None
+
+def _fetch_range(symbol, start_date, end_date, multiplier=1, timespan="day"):
+    """
+    Fetch all bars for `symbol` between `start_date` and `end_date` into one DataFrame.
+    Returns an empty DataFrame if Polygon has no data.
+    """
+    chunks = list(iter_aggregates(symbol, start_date, end_date, multiplier, timespan))
+    if not chunks:
+        print(f"[WARN] No {multiplier}/{timespan} data found for {symbol}.")
+        return pd.DataFrame()
+    df = pd.concat(chunks)
+    df.sort_index(inplace=True)
+    return df
+
+def ingest_bars(symbol, start_date, end_date, multiplier=1, timespan="minute"):
+    """
+    Stream bars for `symbol` straight from Polygon into the local bar cache, one page
+    (Parquet row group) at a time, so years of 1-minute bars ingest at constant memory.
+    Cached bars before `start_date` are kept; everything from `start_date` on is replaced.
+    :return: Number of rows in the rewritten cache file.
+    """
+    start_ts = pd.Timestamp(start_date)
+    covered_from = cached_covered_from(symbol, multiplier, timespan)
+    if covered_from is None or covered_from > start_ts:
+        covered_from = start_ts
+    with BarWriter(symbol, covered_from, multiplier, timespan) as writer:
+        for chunk in iter_cached_bars(symbol, multiplier, timespan):
+            writer.write(chunk[chunk.index < start_ts])
+        for chunk in iter_aggregates(symbol, start_date, end_date, multiplier, timespan):
+            writer.write(chunk)
+    return writer.rows
+
+def _load_bars(symbol, lookback_days, multiplier, timespan, use_cache, refresh, raise_errors):
+    """
+    Shared implementation of fetch_daily_data / fetch_bars / fetch_many.
+    With `raise_errors` False, fetch errors are printed and whatever is cached is returned.
+    """
+    end_date = datetime.now().strftime("%Y-%m-%d")
+    start_date = (datetime.now() - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+
+    failed = False
+
+    def fetch(start):
+        nonlocal failed
+        try:
+            return _fetch_range(symbol, start, end_date, multiplier, timespan)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"[ERROR] Failed to fetch data for {symbol}: {e}")
+            failed = True
             return pd.DataFrame()
-        
-        df = pd.DataFrame(data["results"])
-        df.rename(columns={"o": "Open", "h": "High", "l": "Low", "c": "Close", "v": "Volume", "t": "Timestamp"}, inplace=True)
-        df["date"] = pd.to_datetime(df["Timestamp"], unit="ms")
-        df.set_index("date", inplace=True)
-        df.sort_index(inplace=True)
+
+    if not use_cache:
+        return fetch(start_date)
+
+    if refresh:
+        invalidate_bars(symbol, multiplier, timespan)
+
+    cached, covered_from = load_bars(symbol, multiplier, timespan)
+    gaps_checked = checked_before = cached_gaps_checked_through(symbol, multiplier, timespan)
+    if cached.empty or covered_from is None or covered_from > pd.Timestamp(start_date):
+        # Cold cache, or the cache doesn't reach back far enough => fetch the whole window
+        df_new = fetch(start_date)
+        covered_from = pd.Timestamp(start_date) if covered_from is None else min(covered_from, pd.Timestamp(start_date))
+    else:
+        # Warm cache => only top up from the last cached bar's date (re-fetched in case it was partial),
+        # or from the first trading session missing from the cached daily bars. Gaps up to
+        # `gaps_checked` were already re-fetched once and came back empty (halts, bars the
+        # vendor doesn't have), so they aren't retried on every run.
+        top_up_from = cached.index[-1]
+        if multiplier == 1 and timespan == "day":
+            gap_start = max(cached.index[0], pd.Timestamp(start_date))
+            if gaps_checked is not None:
+                gap_start = max(gap_start, gaps_checked + pd.Timedelta(days=1))
+            gaps = missing_sessions(cached.index, start=gap_start)
+            if len(gaps):
+                print(f"[WARN] {len(gaps)} session(s) missing from cached {symbol} bars; re-fetching from {gaps[0].date()}.")
+                top_up_from = min(top_up_from, gaps[0])
+        df_new = fetch(top_up_from.strftime("%Y-%m-%d"))
+
+    df = merge_bars(cached, df_new)
+    if df.empty:
         return df
+    # Every session up to the last bar has now been requested at least once
+    if not failed and multiplier == 1 and timespan == "day":
+        gaps_checked = df.index[-1]
+    if not df_new.empty:
+        try:
+            save_bars(symbol, df, covered_from, multiplier, timespan, gaps_checked_through=gaps_checked)
+        except Exception as e:
+            print(f"[WARN] Could not write bar cache for {symbol}: {e}")
+    elif gaps_checked != checked_before:
+        mark_gaps_checked(symbol, gaps_checked, multiplier, timespan)
+
+    return df[df.index >= pd.Timestamp(start_date)]
+
+def fetch_bars(symbol, lookback_days=TRAINING_LOOKBACK_DAYS, multiplier=1, timespan="day",
+               use_cache=True, refresh=False, compact=COMPACT_DTYPES):
+    """
+    Fetch `multiplier`/`timespan` OHLCV bars (e.g. 1/"day", 5/"minute") for `symbol`
+    covering approximately `lookback_days`, through the local bar cache.
+    Returns a DataFrame with date as index.
+    :param compact: Return only float32 OHLCV columns (see compact_bars); the cache keeps full bars.
+    """
+    df = _load_bars(symbol, lookback_days, multiplier, timespan, use_cache, refresh, raise_errors=False)
+    return compact_bars(df) if compact and not df.empty else df
+
+def fetch_daily_data(symbol, lookback_days=TRAINING_LOOKBACK_DAYS, use_cache=True, refresh=False,
+                     compact=COMPACT_DTYPES):
+    """
+    Fetch daily OHLCV data for `symbol` from Polygon,
+    covering approximately `lookback_days`.
+    Returns a DataFrame with date as index.
+
+    Bars are kept in a local Parquet cache (see bar_cache.py). On a warm cache only
+    the bars from the last cached date onward are requested and merged in.
+    :param use_cache: Set False to bypass the cache entirely.
+    :param refresh: Set True to drop the cached bars and re-download the full window
+                    (e.g. after adjusted prices were restated by a split/dividend).
+    :param compact: Return only float32 OHLCV columns (see compact_bars).
+    """
+    return fetch_bars(symbol, lookback_days, 1, "day", use_cache, refresh, compact)
+
+def fetch_many(symbols, lookback_days=TRAINING_LOOKBACK_DAYS, max_workers=POLYGON_MAX_CONCURRENCY,
+               use_cache=True, refresh=False, multiplier=1, timespan="day", compact=COMPACT_DTYPES):
+    """
+    Fetch OHLCV data (daily by default) for many symbols concurrently.
+    Requests share the pooled, rate-limited client from http_client.py, so
+    `max_workers` only bounds concurrency; throughput is capped by the Polygon plan limit.
+    With `compact`, frames hold only float32 OHLCV columns (see compact_bars).
+    :return: Tuple (frames, errors):
+        frames - dict symbol -> DataFrame (empty if Polygon had no data),
+        errors - dict symbol -> error message for symbols whose fetch failed.
+    """
+    frames, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            symbol: pool.submit(_load_bars, symbol, lookback_days, multiplier, timespan,
+                                use_cache, refresh, True)
+            for symbol in symbols
+        }
+        for symbol, future in futures.items():
+            try:
+                df = future.result()
+                frames[symbol] = compact_bars(df) if compact and not df.empty else df
+            except Exception as e:
+                errors[symbol] = str(e)
+    return frames, errors
+
+def sync_minute_bars(symbol, lookback_days=30):
+    """
+    Bring `symbol`'s intraday store (see intraday_store.py) up to date with Polygon
+    1-minute bars, streaming page by page. Resumes from the last stored day (re-fetched,
+    so a minute that was still forming is replaced); an empty store is filled with the
+    last `lookback_days`.
+    :return: Number of new minute bars stored.
+    """
+    days = intraday_store.stored_days(symbol)
+    start = days[-1] if days else datetime.now() - timedelta(days=lookback_days)
+    rows = 0
+    for chunk in iter_aggregates(symbol, start.strftime("%Y-%m-%d"), datetime.now().strftime("%Y-%m-%d"), 1, "minute"):
+        rows += intraday_store.append_bars(symbol, chunk)
+    return rows
+
+def fetch_timeframe(symbol, timeframe="1d", lookback_days=TRAINING_LOOKBACK_DAYS):
+    """
+    Fetch OHLCV bars of any timeframe ("1d", "1h", "15min", "5min", "1min", ...) for `symbol`.
+    Daily bars come from fetch_daily_data; intraday bars are resampled from the local
+    minute store after syncing it with Polygon, and only bars that have closed are returned.
+    Returns a DataFrame with date as index.
+    """
+    if intraday_store.parse_timeframe(timeframe) is None:
+        return fetch_daily_data(symbol, lookback_days)
+    try:
+        sync_minute_bars(symbol, lookback_days)
     except Exception as e:
-        print(f"[ERROR] Failed to fetch data for {symbol}: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        print(f"[ERROR] Failed to fetch minute bars for {symbol}: {e}")
+    start = datetime.now() - timedelta(days=lookback_days)
+    return intraday_store.resample(symbol, timeframe, start=start)
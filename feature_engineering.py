@@ -2,6 +2,17 @@
 
 import numpy as np
 import pandas as pd
+from intraday_store import resample_ohlcv
+from support_resistance import pivot_features
+from indicator_kernel import INDICATOR_COLS, fused_indicators
+from config import COMPACT_DTYPES, FUSED_INDICATORS
+
+# build_features columns in ml_model.FEATURE_COLS order; compact frames store them in this
+# order as one contiguous float32 block
+FEATURE_COLUMNS = [
+    "RSI_14", "MACD", "MACD_signal", "SMA_50", "SMA_200", "BB_upper", "BB_lower", "ATR_14",
+    "Open", "High", "Low", "Close", "Volume"
+]
 
 def ema(series, span):
     """
@@ -92,46 +103,193 @@ def atr(df, window=14):
     tr = true_range(df)
     return tr.rolling(window).mean()
 
-def build_features(df):
+def build_features(df, timeframe=None, compact=COMPACT_DTYPES, pivots=None, fused=FUSED_INDICATORS):
     """
     Given a DataFrame with columns [Open, High, Low, Close, Volume],
     add multiple technical indicators as new columns for ML training,
-    and define a 'Target' column that indicates whether the next day's
-    Close is higher than today's (1 for bullish, 0 for bearish).
+    and define a 'Target' column that indicates whether the next bar's
+    Close is higher than this one's (1 for bullish, 0 for bearish).
+    Indicator windows are counted in bars, so they work on any timeframe.
 
     :param df: Original OHLCV DataFrame.
+    :param timeframe: If given (e.g. "5min", "1h", "1d"), `df` holds 1-minute bars and is
+                      first resampled to this timeframe (see intraday_store.resample_ohlcv).
+    :param compact: Return the memory-compact layout of compact_features (float32 features,
+                    int8 Target, no 'future_close' or raw Polygon fields).
+    :param pivots: Optional (method, period) pairs of pivot levels to add, e.g.
+                   [("classic", "bar"), ("fibonacci", "W")]; see support_resistance.pivot_features.
+    :param fused: Compute the indicators with indicator_kernel.fused_indicators (same values
+                  within float tolerance); bars containing NaNs use the pandas functions.
     :return: DataFrame with additional columns:
         RSI_14, MACD, MACD_signal, SMA_50, SMA_200,
-        BB_upper, BB_lower, ATR_14, Target, (and 'future_close' used internally).
+        BB_upper, BB_lower, ATR_14, Target, (and 'future_close' used internally),
+        plus PIV_* columns for `pivots`.
     """
-    df = df.copy()  # avoid modifying original
+    if timeframe is not None:
+        df = resample_ohlcv(df, timeframe)
+    else:
+        df = df.copy()  # avoid modifying original
+    # Compact bars carry float32 prices; indicators are always computed in float64
+    df = df.astype({c: np.float64 for c in ("Open", "High", "Low", "Close", "Volume")
+                    if c in df.columns and df[c].dtype == np.float32})
+
+    prices = df[["Close", "High", "Low"]].to_numpy() if fused else None
+    if fused and np.isfinite(prices).all():
+        # 1-5) All indicators in one pass, written into a single matrix
+        df[INDICATOR_COLS] = fused_indicators(prices[:, 0], prices[:, 1], prices[:, 2])
+    else:
+        # 1) RSI
+        df["RSI_14"] = rsi(df["Close"], 14)
 
-    # 1) RSI
-    df["RSI_14"] = rsi(df["Close"], 14)
+        # 2) MACD & MACD Signal
+        macd_line, signal_line = macd(df["Close"], fast=12, slow=26, signal=9)
+        df["MACD"] = macd_line
+        df["MACD_signal"] = signal_line
 
-    # 2) MACD & MACD Signal
-    macd_line, signal_line = macd(df["Close"], fast=12, slow=26, signal=9)
-    df["MACD"] = macd_line
-    df["MACD_signal"] = signal_line
+        # 3) SMA (50 & 200)
+        df["SMA_50"] = sma(df["Close"], 50)
+        df["SMA_200"] = sma(df["Close"], 200)
 
-    # 3) SMA (50 & 200)
-    df["SMA_50"] = sma(df["Close"], 50)
-    df["SMA_200"] = sma(df["Close"], 200)
+        # 4) Bollinger Bands
+        upper_bb, lower_bb = bollinger_bands(df["Close"], window=20, num_std=2)
+        df["BB_upper"] = upper_bb
+        df["BB_lower"] = lower_bb
 
-    # 4) Bollinger Bands
-    upper_bb, lower_bb = bollinger_bands(df["Close"], window=20, num_std=2)
-    df["BB_upper"] = upper_bb
-    df["BB_lower"] = lower_bb
+        # 5) ATR (14)
+        df["ATR_14"] = atr(df, window=14)
 
-    # 5) ATR (14)
-    df["ATR_14"] = atr(df, window=14)
+    # 6) Pivot levels from the previous bar / week / month (optional)
+    pivot_cols = []
+    if pivots:
+        levels = pivot_features(df, pivots)
+        pivot_cols = list(levels.columns)
+        df[pivot_cols] = levels
 
-    # 6) Define next-day "Target"
-    #    If tomorrow's Close > today's Close => 1 (Bullish), else 0
+    # 7) Define next-bar "Target"
+    #    If the next bar's Close > this bar's Close => 1 (Bullish), else 0
     df["future_close"] = df["Close"].shift(-1)
     df["Target"] = (df["future_close"] > df["Close"]).astype(int)
 
     # Drop rows where indicators are NaN (e.g., early rows that can't compute rolling)
     df.dropna(inplace=True)
 
-    return df
+    return compact_features(df, FEATURE_COLUMNS + pivot_cols) if compact else df
+
+def compact_features(df, feature_cols=FEATURE_COLUMNS):
+    """
+    Shrink a build_features frame for large multi-symbol panels: `feature_cols` become
+    one contiguous float32 block, 'Target' becomes int8, and 'future_close' and unused raw
+    columns (Timestamp, vw, n) are dropped. The tree backends cast features to float32
+    anyway, so their accuracy is unchanged; hist_gradient_boosting and logistic models
+    can shift (see benchmarks/bench_memory.py).
+    """
+    mat = np.empty((len(df), len(feature_cols)), dtype=np.float32, order="F")
+    for i, col in enumerate(feature_cols):
+        mat[:, i] = df[col].to_numpy()
+    out = pd.DataFrame(mat, index=df.index, columns=feature_cols, copy=False)
+    if "Target" in df.columns:
+        out["Target"] = df["Target"].to_numpy(dtype=np.int8)
+    return out
+
+def stack_panel(frames):
+    """
+    Stack per-symbol OHLCV DataFrames (e.g. the dict returned by data_fetch.fetch_many)
+    into one long panel indexed by (symbol, date).
+    :param frames: Dict symbol -> DataFrame indexed by date.
+    :return: DataFrame with a (symbol, date) MultiIndex.
+    """
+    frames = {s: df for s, df in frames.items() if not df.empty}
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, names=["symbol", "date"])
+
+def panel_indicators(close, high, low):
+    """
+    Compute every indicator in this module for many symbols at once.
+    Each input is 2-D, shaped (bars x symbols), as a NumPy array or DataFrame. Leading
+    or trailing NaNs mark symbols with shorter histories; rolling windows and EMAs only
+    start at each symbol's first valid bar, so ragged starts give the same values as
+    running the single-symbol functions on each column.
+    :return: Dict indicator name -> DataFrame (bars x symbols):
+        RSI_14, MACD, MACD_signal, SMA_50, SMA_200, BB_upper, BB_lower, ATR_14.
+    """
+    close, high, low = pd.DataFrame(close), pd.DataFrame(high), pd.DataFrame(low)
+    out = {}
+    out["RSI_14"] = rsi(close, 14)
+    out["MACD"], out["MACD_signal"] = macd(close, fast=12, slow=26, signal=9)
+    out["SMA_50"] = sma(close, 50)
+    out["SMA_200"] = sma(close, 200)
+    out["BB_upper"], out["BB_lower"] = bollinger_bands(close, window=20, num_std=2)
+    # True range column-wise; np.fmax skips NaN like the concat(...).max(axis=1) in true_range
+    prev_close = close.shift(1)
+    tr = np.fmax(high - low, np.fmax((high - prev_close).abs(), (low - prev_close).abs()))
+    out["ATR_14"] = tr.rolling(14).mean()
+    return out
+
+def build_panel_features(panel, compact=COMPACT_DTYPES, pivots=None):
+    """
+    Multi-symbol version of build_features: computes the same indicator columns and
+    'Target' for every symbol in one vectorized pass instead of one pandas pipeline per symbol.
+
+    Each symbol's bars are laid out by bar number (not calendar date) in a
+    (bars x symbols) matrix, so ragged starts and missing days give exactly the
+    per-symbol build_features result.
+
+    :param panel: Long OHLCV DataFrame indexed by (symbol, date), e.g. from stack_panel,
+                  or indexed by date with a 'symbol' column.
+    :return: Long DataFrame indexed by (symbol, date) with the build_features columns,
+             NaN rows dropped. See panel_to_tensor for a 3-D view.
+    :param compact: Return the compact_features layout (float32 features, int8 Target).
+    :param pivots: Optional (method, period) pivot levels to add, as in build_features.
+    """
+    if "symbol" in panel.columns:
+        df = panel.rename_axis("date").reset_index()
+    else:
+        df = panel.rename_axis(["symbol", "date"]).reset_index()
+    df = df.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+
+    # Position of each row in its symbol's own series, and of each symbol in the matrix
+    bar = df.groupby("symbol", sort=False).cumcount().to_numpy()
+    symbols = df["symbol"].unique()
+    col = df["symbol"].map({s: i for i, s in enumerate(symbols)}).to_numpy()
+
+    def to_matrix(field):
+        mat = np.full((bar.max() + 1, len(symbols)), np.nan)
+        mat[bar, col] = df[field].to_numpy(dtype=np.float64)
+        return mat
+
+    close = to_matrix("Close")
+    indicators = panel_indicators(close, to_matrix("High"), to_matrix("Low"))
+    for name, frame in indicators.items():
+        df[name] = frame.to_numpy()[bar, col]
+
+    # Next bar's Close within the same symbol (NaN past each symbol's last bar)
+    future_close = np.vstack([close[1:], np.full((1, len(symbols)), np.nan)])
+    df["future_close"] = future_close[bar, col]
+    df["Target"] = (df["future_close"] > df["Close"]).astype(int)
+
+    # Rows are sorted by (symbol, date), so pivots are computed for all symbols in one pass
+    pivot_cols = []
+    if pivots:
+        levels = pivot_features(df.set_index(["symbol", "date"]), pivots)
+        pivot_cols = list(levels.columns)
+        df[pivot_cols] = levels.to_numpy()
+
+    df.dropna(inplace=True)
+    df = df.set_index(["symbol", "date"])
+    return compact_features(df, FEATURE_COLUMNS + pivot_cols) if compact else df
+
+def panel_to_tensor(features, feature_cols):
+    """
+    Reshape long panel features (from build_panel_features) into a dense 3-D array
+    for cross-sectional training.
+    :return: Tuple (tensor, symbols, dates), where tensor has shape
+             (symbols x dates x features) with NaN where a symbol has no row for a date.
+    """
+    symbols = features.index.get_level_values(0).unique()
+    dates = features.index.get_level_values(1).unique().sort_values()
+    tensor = np.full((len(symbols), len(dates), len(feature_cols)), np.nan)
+    i = symbols.get_indexer(features.index.get_level_values(0))
+    j = dates.get_indexer(features.index.get_level_values(1))
+    tensor[i, j, :] = features[feature_cols].to_numpy(dtype=np.float64)
+    return tensor, symbols, dates
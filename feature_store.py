@@ -0,0 +1,305 @@
+# feature_store.py
+import os
+import re
+import json
+import math
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+import feature_engineering as fe
+from support_resistance import pivot_features
+from config import FEATURE_STORE_DIR, TRAINING_LOOKBACK_DAYS, COMPACT_DTYPES
+
+def _ema_warmup(span):
+    """
+    Bars after which an EMA no longer depends on its starting value (its weight has
+    decayed below double precision), so a tail recomputed from here matches a full pass.
+    """
+    return math.ceil(40 / -math.log(1 - 2 / (span + 1)))
+
+# compute(df, **params) returns one Series per output; lookback(**params) is the number of
+# bars before the first new one that compute needs to reproduce a full pass. Bump an
+# indicator's version when its computation changes so stored columns are rebuilt.
+Indicator = namedtuple("Indicator", ["params", "outputs", "compute", "lookback", "version"])
+
+INDICATORS = {
+    "rsi": Indicator({"period": 14}, ("rsi",),
+                     lambda df, period: (fe.rsi(df["Close"], period),),
+                     lambda period: period, 1),
+    "macd": Indicator({"fast": 12, "slow": 26, "signal": 9}, ("macd", "signal"),
+                      lambda df, fast, slow, signal: fe.macd(df["Close"], fast, slow, signal),
+                      lambda fast, slow, signal: _ema_warmup(max(fast, slow)) + _ema_warmup(signal), 1),
+    "sma": Indicator({"window": 50}, ("sma",),
+                     lambda df, window: (fe.sma(df["Close"], window),),
+                     lambda window: window - 1, 1),
+    "ema": Indicator({"span": 20}, ("ema",),
+                     lambda df, span: (fe.ema(df["Close"], span),),
+                     lambda span: _ema_warmup(span), 1),
+    "bbands": Indicator({"window": 20, "num_std": 2}, ("upper", "lower"),
+                        lambda df, window, num_std: fe.bollinger_bands(df["Close"], window, num_std),
+                        lambda window, num_std: window - 1, 1),
+    "atr": Indicator({"window": 14}, ("atr",),
+                     lambda df, window: (fe.atr(df, window),),
+                     lambda window: window, 1),
+}
+
+# The indicator columns of feature_engineering.build_features, as store features
+BUILD_FEATURE_SPECS = {
+    "RSI_14": "rsi(14)",
+    "MACD": "macd(12,26,9).macd",
+    "MACD_signal": "macd(12,26,9).signal",
+    "SMA_50": "sma(50)",
+    "SMA_200": "sma(200)",
+    "BB_upper": "bbands(20,2).upper",
+    "BB_lower": "bbands(20,2).lower",
+    "ATR_14": "atr(14)",
+}
+
+BAR_COLS = ["Open", "High", "Low", "Close", "Volume"]
+_SPEC = re.compile(r"^\s*(\w+)\s*(?:\((.*)\))?\s*(?:\.(\w+))?\s*$")
+
+def _ns(index):
+    """
+    int64 nanosecond timestamps of a DatetimeIndex.
+    """
+    return np.asarray(index, dtype="datetime64[ns]").view(np.int64)
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and "." not in text else value
+
+def parse_feature(spec):
+    """
+    Parse a feature spec into (indicator, params, outputs).
+
+    Specs are strings such as "rsi", "rsi(21)", "macd(8, 21, 5)", "bbands(window=10)" or
+    "bbands(20,2).upper" (one output of a multi-output indicator), or tuples
+    (indicator, params dict) / (indicator, params dict, output). Unspecified params
+    take the indicator's defaults; without an output, all of them are selected.
+    """
+    if isinstance(spec, str):
+        m = _SPEC.match(spec)
+        if not m:
+            raise ValueError(f"Can't parse feature spec {spec!r}")
+        name, args, output = m.groups()
+        given = {}
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator {name!r}; available: {sorted(INDICATORS)}")
+        positional = list(INDICATORS[name].params)
+        for i, arg in enumerate(a for a in (args or "").split(",") if a.strip()):
+            key, _, value = arg.rpartition("=")
+            given[key.strip() or positional[i]] = _number(value.strip())
+    else:
+        name, given, output = (tuple(spec) + (None,))[:3]
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator {name!r}; available: {sorted(INDICATORS)}")
+    indicator = INDICATORS[name]
+    unknown = set(given) - set(indicator.params)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) {sorted(unknown)} for {name}")
+    params = {**indicator.params, **given}
+    if output is not None and output not in indicator.outputs:
+        raise ValueError(f"{name} has outputs {indicator.outputs}, not {output!r}")
+    return name, params, (output,) if output else indicator.outputs
+
+def feature_key(name, params, output=None):
+    """
+    Stored column name of one indicator output, e.g. rsi_14, macd_12_26_9_signal.
+    Without `output`, the name of the indicator/params group.
+    """
+    group = "_".join([name] + [str(v) for v in params.values()])
+    return group if output is None or output == name else f"{group}_{output}"
+
+class FeatureStore:
+    """
+    Materialized indicator columns per (symbol, timeframe), each keyed by indicator and
+    parameters, persisted as append-only float64 column files (memory-mapped on read)
+    alongside the bars they were computed from:
+
+        FEATURE_STORE_DIR/SYMBOL/TIMEFRAME/index.i8, bars/Close.f8, ...,
+                                           features/macd_12_26_9_signal.f8, macd_12_26_9.json
+
+    Incoming bars are merged with the stored ones. New bars only extend the columns:
+    each indicator recomputes just the tail plus the lookback it needs. A revised bar
+    (e.g. a daily bar that was partial) recomputes from that bar on, and bars earlier
+    than the stored history rebuild everything. Not safe for concurrent writers.
+    """
+    def __init__(self, root=FEATURE_STORE_DIR):
+        self.root = root
+        self.computed_rows = {}  # feature key -> rows computed by the last get()
+
+    def _dir(self, symbol, timeframe):
+        return os.path.join(self.root, symbol.upper(), str(timeframe))
+
+    @staticmethod
+    def _read(path, dtype):
+        n = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+        return np.memmap(path, dtype=dtype, mode="r", shape=(n,)) if n else np.empty(0, dtype)
+
+    @staticmethod
+    def _write_tail(path, start, values, dtype=np.float64):
+        """
+        Keep the first `start` values of the column file at `path` and append `values`.
+        """
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.truncate(start * np.dtype(dtype).itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    def _stored_bars(self, base):
+        index = self._read(os.path.join(base, "index.i8"), np.int64)
+        cols = {c: self._read(os.path.join(base, "bars", f"{c}.f8"), np.float64) for c in BAR_COLS}
+        n = min([len(index)] + [len(v) for v in cols.values()])
+        return index[:n], {c: v[:n] for c, v in cols.items()}
+
+    def sync_bars(self, symbol, bars, timeframe="1d"):
+        """
+        Merge `bars` (DataFrame indexed by date with Open/High/Low/Close/Volume) into the
+        stored bars; on duplicate timestamps the new values win.
+        :return: Number of leading stored rows that are unchanged (features are valid up to here).
+        """
+        base = self._dir(symbol, timeframe)
+        os.makedirs(os.path.join(base, "bars"), exist_ok=True)
+        os.makedirs(os.path.join(base, "features"), exist_ok=True)
+        if not (bars.index.is_monotonic_increasing and bars.index.is_unique):
+            bars = bars[~bars.index.duplicated(keep="last")].sort_index()
+        new_ts = _ns(bars.index)
+        new_vals = {c: bars[c].to_numpy(dtype=np.float64) for c in BAR_COLS}
+        index, stored = self._stored_bars(base)
+        n = len(index)
+
+        if n == 0 or (len(new_ts) and new_ts[0] < index[0]):
+            valid = 0
+        else:
+            # First stored row that the new bars revise or insert a bar before
+            k = int(np.searchsorted(new_ts, index[-1], side="right"))
+            p0 = int(np.searchsorted(index, new_ts[0])) if k else n
+            if p0 + k <= n and np.array_equal(index[p0:p0 + k], new_ts[:k]):
+                # Usual case: the new bars cover a contiguous run of the stored ones
+                changed = np.zeros(k, dtype=bool)
+                for c in BAR_COLS:
+                    old, new = stored[c][p0:p0 + k], new_vals[c][:k]
+                    changed |= (old != new) & ~(np.isnan(old) & np.isnan(new))
+                valid = p0 + int(changed.argmax()) if changed.any() else n
+            else:
+                pos = np.searchsorted(index, new_ts[:k])
+                exists = index[pos] == new_ts[:k]
+                changed = ~exists
+                for c in BAR_COLS:
+                    old, new = stored[c][pos[exists]], new_vals[c][:k][exists]
+                    changed[exists] |= (old != new) & ~(np.isnan(old) & np.isnan(new))
+                valid = int(pos[changed].min()) if changed.any() else n
+
+        # Stored rows from `valid` on are merged with the new bars and rewritten
+        keep = new_ts > index[valid - 1] if valid else np.ones(len(new_ts), dtype=bool)
+        if valid == n and not keep.any():
+            return valid
+        old_tail = pd.DataFrame({c: np.asarray(stored[c][valid:]) for c in BAR_COLS},
+                                index=np.asarray(index[valid:]))
+        new_tail = pd.DataFrame({c: new_vals[c][keep] for c in BAR_COLS}, index=new_ts[keep])
+        merged = pd.concat([old_tail, new_tail])
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        del index, stored
+        for c in BAR_COLS:
+            self._write_tail(os.path.join(base, "bars", f"{c}.f8"), valid, merged[c].to_numpy())
+        self._write_tail(os.path.join(base, "index.i8"), valid, merged.index.to_numpy(np.int64), np.int64)
+        return valid
+
+    def _materialize(self, base, name, params, n, valid):
+        """
+        Bring every output column of one indicator/params group up to `n` rows.
+        """
+        indicator = INDICATORS[name]
+        group = feature_key(name, params)
+        meta_path = os.path.join(base, "features", group + ".json")
+        meta = {"indicator": name, "params": params, "version": indicator.version}
+        paths = [os.path.join(base, "features", feature_key(name, params, o) + ".f8") for o in indicator.outputs]
+        done = 0
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                if json.load(f) == meta:
+                    done = min(os.path.getsize(p) // 8 if os.path.exists(p) else 0 for p in paths)
+        done = min(done, valid, n)
+        if done < n:
+            start = max(0, done - indicator.lookback(**params))
+            index, stored = self._stored_bars(base)
+            df = pd.DataFrame({c: np.asarray(stored[c][start:n]) for c in BAR_COLS},
+                              index=pd.DatetimeIndex(np.asarray(index[start:n])))
+            del index, stored
+            outputs = indicator.compute(df, **params)
+            for path, series in zip(paths, outputs):
+                self._write_tail(path, done, series.to_numpy(dtype=np.float64)[done - start:])
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(meta_path + ".tmp", meta_path)
+        for o in indicator.outputs:
+            self.computed_rows[feature_key(name, params, o)] = n - done
+
+    def get(self, symbol, features, bars=None, timeframe="1d", dtype=np.float64):
+        """
+        Feature columns of `symbol` as one aligned matrix, computing only what isn't stored yet.
+
+        :param features: List of feature specs (see parse_feature), or dict column name -> spec
+                         selecting one output each (e.g. BUILD_FEATURE_SPECS).
+        :param bars: New bars to merge in first (see sync_bars); if None they are fetched
+                     with data_fetch.fetch_timeframe.
+        :return: DataFrame (one contiguous `dtype` block) on `bars`' index.
+        """
+        if bars is None:
+            from data_fetch import fetch_timeframe
+            bars = fetch_timeframe(symbol, timeframe, TRAINING_LOOKBACK_DAYS)
+        names, columns = [], []
+        items = features.items() if isinstance(features, dict) else ((None, s) for s in features)
+        for label, spec in items:
+            name, params, outputs = parse_feature(spec)
+            if label is not None and len(outputs) != 1:
+                raise ValueError(f"{spec!r} has several outputs; select one, e.g. '{spec}.{outputs[0]}'")
+            for o in outputs:
+                names.append(label or feature_key(name, params, o))
+                columns.append((name, params, o))
+
+        base = self._dir(symbol, timeframe)
+        valid = self.sync_bars(symbol, bars, timeframe)
+        index, _ = self._stored_bars(base)
+        n = len(index)
+        self.computed_rows = {}
+        for name, params in {feature_key(nm, p): (nm, p) for nm, p, _ in columns}.values():
+            self._materialize(base, name, params, n, valid)
+
+        # Stored bars are unique and sorted, so bars spanning as many stored rows as
+        # they hold map to one contiguous slice
+        ts = _ns(bars.index)
+        rows = np.searchsorted(index, ts[[0, -1]]) if len(ts) else np.zeros(0, dtype=np.int64)
+        contiguous = len(ts) == 0 or rows[-1] - rows[0] + 1 == len(ts)
+        if not contiguous:
+            rows = np.searchsorted(index, ts)
+        out = np.empty((len(ts), len(columns)), dtype=dtype, order="F")
+        for j, (name, params, o) in enumerate(columns):
+            values = self._read(os.path.join(base, "features", feature_key(name, params, o) + ".f8"), np.float64)
+            out[:, j] = values[rows[0]:rows[0] + len(ts)] if contiguous and len(ts) else values[rows]
+        return pd.DataFrame(out, index=bars.index, columns=names, copy=False)
+
+    def build_features(self, symbol, bars, timeframe="1d", compact=COMPACT_DTYPES, pivots=None):
+        """
+        feature_engineering.build_features(bars, compact=compact, pivots=pivots) with the
+        indicator columns served from the store. On a cold store the result is the same.
+        Once earlier bars are stored, the indicators see that history too: the warm-up
+        rows build_features(bars) would drop are kept, and EMA-based columns (MACD) are
+        seeded earlier. The result is then build_features over the stored history,
+        restricted to `bars`' dates, which has more rows than build_features(bars).
+        Pivot levels and Target come from `bars` alone. There is no `fused` option: only
+        the new bars' tails are computed, so there is no full pass to fuse.
+        """
+        # Compact bars carry float32 prices; the other columns are computed in float64
+        df = bars.astype({c: np.float64 for c in BAR_COLS if bars[c].dtype == np.float32})
+        df[list(BUILD_FEATURE_SPECS)] = self.get(symbol, BUILD_FEATURE_SPECS, bars, timeframe)
+        pivot_cols = []
+        if pivots:
+            levels = pivot_features(df, pivots)
+            pivot_cols = list(levels.columns)
+            df[pivot_cols] = levels
+        df["future_close"] = df["Close"].shift(-1)
+        df["Target"] = (df["future_close"] > df["Close"]).astype(int)
+        df.dropna(inplace=True)
+        return fe.compact_features(df, fe.FEATURE_COLUMNS + pivot_cols) if compact else df
@@ -0,0 +1,99 @@
+# forecasting.py
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
+
+import history_store
+from config import FORECAST_MODEL_DIR
+
+def _stan_init(model):
+    """
+    Fitted parameters of a Prophet model, in the form Prophet.fit(init=...) accepts,
+    so a refit on slightly more data starts from the previous optimum.
+    """
+    params = {}
+    for name in ("k", "m", "sigma_obs"):
+        params[name] = model.params[name][0][0]
+    for name in ("delta", "beta"):
+        params[name] = model.params[name][0]
+    return params
+
+def _data_hash(df):
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()[:32]
+
+def _paths(symbol, model_dir):
+    stem = os.path.join(model_dir, symbol.upper())
+    return stem + ".prophet.json", stem + ".meta.json", stem + ".forecast.parquet"
+
+def forecast_symbol(symbol, periods=180, model_dir=FORECAST_MODEL_DIR):
+    """
+    Forecast `symbol`'s Close for `periods` days with Prophet, reusing earlier work:
+      - same data and horizon as last time => the saved forecast is returned as is;
+      - same data, new horizon            => the saved model is loaded and only predicts;
+      - new bars                           => the model is refit, warm-started from the
+                                              previous fit's parameters.
+    :return: Prophet forecast DataFrame (ds, yhat, yhat_lower, yhat_upper, ...) or None.
+    """
+    df = history_store.read(symbol, columns=["Close"])
+    if df.empty or "Close" not in df.columns:
+        print(f"No stored data found for {symbol}.")
+        return None
+    df = df.reset_index()[["date", "Close"]]
+    df.columns = ["ds", "y"]
+
+    model_path, meta_path, forecast_path = _paths(symbol, model_dir)
+    data_hash = _data_hash(df)
+    meta, prev_model = {}, None
+    if os.path.exists(meta_path) and os.path.exists(model_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(model_path) as f:
+            prev_model = model_from_json(f.read())
+
+    if prev_model is not None and meta.get("data_hash") == data_hash:
+        if meta.get("periods") == periods and os.path.exists(forecast_path):
+            return pd.read_parquet(forecast_path)
+        model = prev_model
+    else:
+        model = Prophet()
+        init = _stan_init(prev_model) if prev_model is not None else None
+        try:
+            model.fit(df, init=init)
+        except Exception:
+            # A previous fit with a different changepoint layout can't seed this one
+            model = Prophet()
+            model.fit(df)
+
+    future = model.make_future_dataframe(periods=periods)
+    forecast = model.predict(future)
+
+    os.makedirs(model_dir, exist_ok=True)
+    with open(model_path, "w") as f:
+        f.write(model_to_json(model))
+    forecast.to_parquet(forecast_path)
+    with open(meta_path, "w") as f:
+        json.dump({"data_hash": data_hash, "periods": periods, "rows": len(df),
+                   "last_date": str(df["ds"].iloc[-1])}, f)
+    return forecast
+
+def forecast_many(symbols, periods=180, max_workers=None, model_dir=FORECAST_MODEL_DIR):
+    """
+    Run forecast_symbol for many symbols in a process pool (one symbol per task).
+    :return: Dict symbol -> forecast DataFrame (symbols that failed or had no data are omitted).
+    """
+    forecasts = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {s: pool.submit(forecast_symbol, s, periods, model_dir) for s in symbols}
+        for symbol, future in futures.items():
+            try:
+                forecast = future.result()
+            except Exception as e:
+                print(f"[ERROR] Forecast failed for {symbol}: {e}")
+                continue
+            if forecast is not None:
+                forecasts[symbol] = forecast
+    return forecasts
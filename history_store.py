@@ -0,0 +1,129 @@
+# history_store.py
+import os
+import sqlite3
+import pandas as pd
+from config import HISTORY_DB_PATH
+
+def _sql_type(dtype):
+    if dtype.kind in "iubM":
+        return "INTEGER"
+    if dtype.kind == "f":
+        return "REAL"
+    return "TEXT"
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS _schema (tbl TEXT, col TEXT, dtype TEXT, PRIMARY KEY (tbl, col))")
+    return conn
+
+def _check_table(table):
+    if not table.isidentifier():
+        raise ValueError(f"Invalid table name: {table!r}")
+
+def _ensure_table(conn, table, df):
+    """
+    Create `table` keyed by (symbol, ts) if needed, add any new columns,
+    and record each column's pandas dtype so reads restore it.
+    """
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ('
+                 'symbol TEXT NOT NULL, ts INTEGER NOT NULL, PRIMARY KEY (symbol, ts)) WITHOUT ROWID')
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    for col, dtype in df.dtypes.items():
+        if col not in existing:
+            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}" {_sql_type(dtype)}')
+        conn.execute("INSERT OR IGNORE INTO _schema VALUES (?, ?, ?)", (table, col, str(dtype)))
+
+def upsert(df, symbol, table="bars", db_path=HISTORY_DB_PATH):
+    """
+    Insert or update the rows of `df` (indexed by date) for `symbol`.
+    Rows are keyed by (symbol, timestamp), so re-saving overlapping data replaces
+    the old values instead of duplicating them.
+    :return: Number of rows written.
+    """
+    _check_table(table)
+    if df.empty:
+        return 0
+    cols = list(df.columns)
+    values = []
+    for col in cols:
+        series = df[col]
+        if series.dtype.kind == "M":
+            series = series.dt.as_unit("ns").astype("int64")
+        values.append(series.astype(object).where(series.notna(), None).tolist())
+    ts = pd.DatetimeIndex(df.index).as_unit("ns").asi8.tolist()
+    rows = zip([symbol] * len(df), ts, *values)
+
+    quoted = ", ".join(f'"{c}"' for c in cols)
+    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in cols)
+    sql = (f'INSERT INTO "{table}" (symbol, ts, {quoted}) VALUES ({", ".join("?" * (len(cols) + 2))}) '
+           f'ON CONFLICT(symbol, ts) DO UPDATE SET {updates}')
+    conn = _connect(db_path)
+    try:
+        with conn:
+            _ensure_table(conn, table, df)
+            conn.executemany(sql, rows)
+    finally:
+        conn.close()
+    return len(df)
+
+def read(symbol, start=None, end=None, columns=None, table="bars", db_path=HISTORY_DB_PATH, last=None):
+    """
+    Read stored rows for `symbol`, optionally restricted to [start, end] and to `columns`.
+    Only the requested columns and date range are read, using the (symbol, ts) key.
+    If `last` is given, only the latest `last` rows in that range are read.
+    :return: DataFrame indexed by date with the dtypes it was saved with (empty if none).
+    """
+    _check_table(table)
+    if not os.path.exists(db_path):
+        return pd.DataFrame()
+    conn = _connect(db_path)
+    try:
+        schema = dict(conn.execute("SELECT col, dtype FROM _schema WHERE tbl = ? ORDER BY rowid", (table,)))
+        if not schema:
+            return pd.DataFrame()
+        columns = [c for c in (columns or schema) if c in schema]
+        selected = "".join(f', "{c}"' for c in columns)
+        sql = f'SELECT ts{selected} FROM "{table}" WHERE symbol = ?'
+        params = [symbol]
+        if start is not None:
+            sql += " AND ts >= ?"
+            params.append(pd.Timestamp(start).value)
+        if end is not None:
+            sql += " AND ts <= ?"
+            params.append(pd.Timestamp(end).value)
+        if last is not None:
+            sql = f"SELECT * FROM ({sql} ORDER BY ts DESC LIMIT ?)"
+            params.append(int(last))
+        df = pd.read_sql_query(sql + " ORDER BY ts", conn, params=params)
+    finally:
+        conn.close()
+
+    df.index = pd.to_datetime(df.pop("ts"), unit="ns")
+    df.index.name = "date"
+    for col in df.columns:
+        dtype = schema[col]
+        try:
+            if dtype.startswith("datetime64"):
+                df[col] = pd.to_datetime(df[col], unit="ns")
+            else:
+                df[col] = df[col].astype(dtype)
+        except (ValueError, TypeError):
+            pass  # e.g. an int column that now holds NULLs stays float
+    return df
+
+def symbols(table="bars", db_path=HISTORY_DB_PATH):
+    """
+    List the symbols stored in `table`.
+    """
+    _check_table(table)
+    if not os.path.exists(db_path):
+        return []
+    conn = _connect(db_path)
+    try:
+        return [r[0] for r in conn.execute(f'SELECT DISTINCT symbol FROM "{table}"')]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
@@ -0,0 +1,124 @@
+# http_client.py
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from api_keys import POLYGON_API_KEY
+from instrumentation import span, add_bytes
+from config import (POLYGON_BASE_URL, POLYGON_REQUESTS_PER_MINUTE, POLYGON_MAX_CONCURRENCY,
+                    HTTP_TIMEOUT, HTTP_MAX_RETRIES)
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+    :param rate: Tokens added per second (0 or less disables limiting).
+    :param capacity: Maximum burst size (defaults to max(1, rate)).
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then consume it.
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class PolygonClient:
+    """
+    Pooled keep-alive HTTP client for the Polygon REST API.
+    All requests share one requests.Session, go through a token-bucket rate limiter
+    and are retried with exponential backoff on 429/5xx responses and connection errors.
+    """
+    def __init__(self, base_url=POLYGON_BASE_URL, api_key=POLYGON_API_KEY,
+                 requests_per_minute=POLYGON_REQUESTS_PER_MINUTE, pool_size=POLYGON_MAX_CONCURRENCY, timeout=HTTP_TIMEOUT,
+                 max_retries=HTTP_MAX_RETRIES, backoff_base=0.5):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.bucket = TokenBucket(requests_per_minute / 60.0,
+                                  capacity=max(1, requests_per_minute) if requests_per_minute > 0 else None)
+        self.session = requests.Session()
+        # Send the key as a header rather than a query param so it never shows up in error URLs
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt, response=None):
+        """
+        Seconds to wait before retry `attempt`, honouring a Retry-After header if present.
+        """
+        if response is not None and response.headers.get("Retry-After"):
+            try:
+                return float(response.headers["Retry-After"])
+            except ValueError:
+                pass
+        return self.backoff_base * (2 ** attempt)
+
+    def get_json(self, url, params=None):
+        """
+        GET `url` and return the decoded JSON body. `url` may be absolute or a path
+        relative to `base_url` (e.g. "/v2/aggs/ticker/SPY/range/1/day/...").
+        Raises requests.HTTPError / requests.RequestException once retries are exhausted.
+        """
+        if not url.startswith("http"):
+            url = self.base_url + url
+        with span("http_get", url=url.split("?")[0]):
+            return self._get_json(url, params)
+
+    def _get_json(self, url, params):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            if r.status_code == 429 or r.status_code >= 500:
+                if attempt == self.max_retries:
+                    r.raise_for_status()
+                time.sleep(self._backoff(attempt, r))
+                continue
+            r.raise_for_status()
+            add_bytes(len(r.content))
+            return r.json()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Return the process-wide shared PolygonClient (created on first use).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PolygonClient()
+        return _client
+
+def set_client(client):
+    """
+    Replace the shared client (e.g. to point at a local stub server in tests).
+    """
+    global _client
+    with _client_lock:
+        _client = client
@@ -0,0 +1,283 @@
+# incremental_features.py
+import os
+import math
+import pickle
+from collections import deque
+import pandas as pd
+from config import FEATURE_STATE_DIR
+
+# Bumped when the pickled state layout changes; older state files are discarded and the
+# engine is rebuilt from the bars passed to the next update
+_STATE_VERSION = 3
+
+# Column order produced by feature_engineering.build_features (after the OHLCV columns)
+INDICATOR_COLS = ["RSI_14", "MACD", "MACD_signal", "SMA_50", "SMA_200", "BB_upper", "BB_lower", "ATR_14"]
+
+class _RollingWindow:
+    """
+    Fixed-length window keeping a running mean and sum of squared deviations (M2),
+    updated Welford-style in O(1) as each value enters and the oldest one leaves.
+    Like pandas' rolling mean/var, a window of identical values (e.g. the zero gains
+    of a flat run) gives exactly that value and a variance of 0, not the residue the
+    running updates leave behind.
+    """
+    __slots__ = ("size", "values", "mean", "m2", "run")
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.run = 0  # trailing values equal to the newest one
+
+    def scalars(self):
+        return self.mean, self.m2, self.run
+
+    def push(self, x):
+        """
+        Add `x`, evicting the oldest value once the window is full.
+        :return: The evicted value, or None.
+        """
+        self.run = self.run + 1 if self.values and self.values[-1] == x else 1
+        if len(self.values) < self.size:
+            self.values.append(x)
+            delta = x - self.mean
+            self.mean += delta / len(self.values)
+            self.m2 += delta * (x - self.mean)
+            return None
+        old = self.values.popleft()
+        self.values.append(x)
+        new_mean = self.mean + (x - old) / self.size
+        self.m2 += (x - old) * (x - new_mean + old - self.mean)
+        self.mean = new_mean
+        return old
+
+    def undo(self, evicted, scalars):
+        """
+        Reverse the last push, given the value it evicted and the scalars() before it.
+        """
+        self.values.pop()
+        if evicted is not None:
+            self.values.appendleft(evicted)
+        self.mean, self.m2, self.run = scalars
+
+    def average(self):
+        if len(self.values) < self.size:
+            return math.nan
+        return self.values[-1] if self.run >= self.size else self.mean
+
+    def std(self):
+        if len(self.values) < self.size:
+            return math.nan
+        if self.run >= self.size:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / (self.size - 1))
+
+class IncrementalFeatureEngine:
+    """
+    Stateful, bar-by-bar version of feature_engineering.build_features.
+
+    Keeps running window means (and M2 for the Bollinger std) and EWM state for RSI,
+    MACD/signal, SMA 50/200, Bollinger Bands and ATR, so each appended bar costs O(1)
+    work regardless of window length or how much history came before. Output rows match
+    build_features within float tolerance, with the same NaN rows (flat runs included).
+
+    A bar's Target depends on the next bar's Close, so `update` returns a row once the
+    bar after it has arrived. Re-sending the most recent bar (e.g. a partial daily bar
+    that has since moved) rolls the state back one bar and re-applies it, and re-emits
+    the previous row with its corrected Target.
+    """
+    def __init__(self, rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9,
+                 sma_fast=50, sma_slow=200, bb_window=20, bb_num_std=2, atr_window=14):
+        self.params = dict(rsi_period=rsi_period, macd_fast=macd_fast, macd_slow=macd_slow,
+                           macd_signal=macd_signal, sma_fast=sma_fast, sma_slow=sma_slow,
+                           bb_window=bb_window, bb_num_std=bb_num_std, atr_window=atr_window)
+        self.state = {
+            "windows": {
+                "sma_fast": _RollingWindow(sma_fast),
+                "sma_slow": _RollingWindow(sma_slow),
+                "bb": _RollingWindow(bb_window),
+                "gains": _RollingWindow(rsi_period),
+                "losses": _RollingWindow(rsi_period),
+                "trs": _RollingWindow(atr_window),
+            },
+            "ema_fast": None,
+            "ema_slow": None,
+            "ema_signal": None,
+            "prev_close": None,
+            "last_ts": None,
+            "pending": None,   # (timestamp, row dict) of the newest bar, awaiting its Target
+        }
+        # (scalar state before the newest bar, [(window, evicted value, window scalars)]
+        # of its pushes), for rolling back a revised bar
+        self._undo = None
+
+    @property
+    def last_timestamp(self):
+        return self.state["last_ts"]
+
+    @staticmethod
+    def _ewm_step(prev, x, span):
+        # Same arithmetic as pandas' ewm(span=span, adjust=False).mean()
+        if prev is None:
+            return x
+        alpha = 2.0 / (span + 1.0)
+        old_wt = 1.0 - alpha
+        return ((old_wt * prev) + (alpha * x)) / (old_wt + alpha)
+
+    def _push(self, name, x):
+        window = self.state["windows"][name]
+        scalars = window.scalars()
+        self._undo[1].append((name, window.push(x), scalars))
+        return window
+
+    def _apply(self, ts, row):
+        """
+        Advance the state by one bar and return the finalized previous row (or None).
+        """
+        p, s = self.params, self.state
+        close, high, low = float(row["Close"]), float(row["High"]), float(row["Low"])
+        prev_close = s["prev_close"]
+
+        # RSI: rolling means of gains/losses over close-to-close changes
+        if prev_close is not None:
+            delta = close - prev_close
+            self._push("gains", max(delta, 0.0))
+            self._push("losses", -min(delta, 0.0))
+        avg_gain = s["windows"]["gains"].average()
+        avg_loss = s["windows"]["losses"].average()
+        if math.isnan(avg_gain) or math.isnan(avg_loss) or (avg_gain == 0 and avg_loss == 0):
+            rsi_val = math.nan
+        elif avg_loss == 0:
+            rsi_val = 100.0
+        else:
+            rsi_val = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        # MACD & signal
+        s["ema_fast"] = self._ewm_step(s["ema_fast"], close, p["macd_fast"])
+        s["ema_slow"] = self._ewm_step(s["ema_slow"], close, p["macd_slow"])
+        macd_line = s["ema_fast"] - s["ema_slow"]
+        s["ema_signal"] = self._ewm_step(s["ema_signal"], macd_line, p["macd_signal"])
+
+        # SMAs & Bollinger Bands
+        sma_fast = self._push("sma_fast", close).average()
+        sma_slow = self._push("sma_slow", close).average()
+        bb = self._push("bb", close)
+        bb_ma, bb_std = bb.average(), bb.std()
+
+        # ATR: the first bar has no previous close, so its TR is just High - Low
+        if prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        atr_val = self._push("trs", tr).average()
+        s["prev_close"] = close
+
+        features = dict(row)
+        features.update({
+            "RSI_14": rsi_val,
+            "MACD": macd_line,
+            "MACD_signal": s["ema_signal"],
+            "SMA_50": sma_fast,
+            "SMA_200": sma_slow,
+            "BB_upper": bb_ma + (p["bb_num_std"] * bb_std),
+            "BB_lower": bb_ma - (p["bb_num_std"] * bb_std),
+            "ATR_14": atr_val,
+        })
+
+        finalized = None
+        if s["pending"] is not None:
+            prev_ts, prev_row = s["pending"]
+            prev_row = dict(prev_row)
+            prev_row["future_close"] = close
+            prev_row["Target"] = int(close > prev_row["Close"])
+            if not any(isinstance(v, float) and math.isnan(v) for v in prev_row.values()):
+                finalized = (prev_ts, prev_row)
+        s["pending"] = (ts, features)
+        s["last_ts"] = ts
+        return finalized
+
+    def _rollback(self):
+        # Rows in "pending" are never mutated in place, so restoring the scalars and
+        # reversing the window pushes undoes the newest bar exactly
+        scalars, pushes = self._undo
+        for name, evicted, window_scalars in reversed(pushes):
+            self.state["windows"][name].undo(evicted, window_scalars)
+        self.state.update(scalars)
+
+    def update_bar(self, ts, bar):
+        """
+        Feed a single bar (`bar` is a dict with at least High/Low/Close; any other
+        fields are carried through to the output row). This is the low-latency path
+        for live updates and involves no pandas work.
+        :return: Tuple (timestamp, row dict) for the bar this one finalized, or None.
+        """
+        last_ts = self.state["last_ts"]
+        if last_ts is not None and ts < last_ts:
+            return None
+        if ts == last_ts and self._undo is not None:
+            self._rollback()
+        self._undo = ({k: v for k, v in self.state.items() if k != "windows"}, [])
+        return self._apply(ts, bar)
+
+    def update(self, df):
+        """
+        Feed new bars (a DataFrame indexed by date with at least High/Low/Close, as returned
+        by fetch_daily_data). Bars older than the last one seen are ignored; a bar with the
+        same timestamp as the last one replaces it.
+        :return: DataFrame of newly finalized feature rows, in build_features' layout.
+        """
+        df = df.sort_index()
+        if self.state["last_ts"] is not None:
+            df = df[df.index >= self.state["last_ts"]]
+
+        out = {}
+        for ts, row in zip(df.index, df.to_dict("records")):
+            finalized = self.update_bar(ts, row)
+            if finalized is not None:
+                out[finalized[0]] = finalized[1]
+
+        if not out:
+            return pd.DataFrame()
+        result = pd.DataFrame.from_dict(out, orient="index")
+        result.index.name = df.index.name
+        result["Target"] = result["Target"].astype(int)
+        return result
+
+    def save(self, path):
+        """
+        Persist the engine state so the next run can continue where this one stopped.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump({"version": _STATE_VERSION, "params": self.params,
+                         "state": self.state, "undo": self._undo}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Restore an engine saved with `save`; returns a fresh engine if `path` doesn't exist.
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        engine = cls(**saved["params"])
+        if saved.get("version") != _STATE_VERSION:
+            return engine
+        engine.state = saved["state"]
+        engine._undo = saved["undo"]
+        return engine
+
+def update_symbol(symbol, df_raw, state_dir=FEATURE_STATE_DIR):
+    """
+    Run the bars of `df_raw` that are new since the last call through `symbol`'s saved
+    engine and persist its state. CPU-bound; safe to run in a worker process.
+    :return: DataFrame of the newly finalized feature rows (empty if none).
+    """
+    state_path = os.path.join(state_dir, f"{symbol.lower()}_engine.pkl")
+    engine = IncrementalFeatureEngine.load(state_path)
+    df_feat = engine.update(df_raw)
+    engine.save(state_path)
+    return df_feat
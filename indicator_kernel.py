@@ -0,0 +1,261 @@
+# indicator_kernel.py
+import math
+import numpy as np
+from incremental_features import INDICATOR_COLS
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Fixed parameters of feature_engineering.build_features
+RSI_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL = 14, 12, 26, 9
+SMA_FAST, SMA_SLOW, BB_WINDOW, BB_NUM_STD, ATR_WINDOW = 50, 200, 20, 2, 14
+# Rows per block in the NumPy kernel; sums restart every block so their rounding error
+# doesn't grow with the length of the series
+_BLOCK = 65536
+# Bars per block of the NumPy EMA recurrence (one small matrix product per block)
+_EMA_BLOCK = 64
+
+def _kernel_loop(close, high, low, out):
+    """
+    Single pass over the bars computing every indicator column of INDICATOR_COLS into
+    `out` (n x 8). Rolling windows are running sums (with the RSI windows tracking how
+    many non-zero values they hold, so an all-zero window is exactly 0 as in pandas);
+    EMAs use pandas' ewm(adjust=False) arithmetic. Compiled with Numba when available.
+    """
+    n = close.shape[0]
+    a_fast = 2.0 / (MACD_FAST + 1.0)
+    a_slow = 2.0 / (MACD_SLOW + 1.0)
+    a_sig = 2.0 / (MACD_SIGNAL + 1.0)
+    ema_fast = ema_slow = ema_sig = 0.0
+    gain_sum = loss_sum = 0.0
+    gain_nz = loss_nz = 0
+    sum_fast = sum_slow = sum_bb = tr_sum = 0.0
+    for i in range(n):
+        c = close[i]
+        # MACD & signal
+        if i == 0:
+            ema_fast = ema_slow = c
+        else:
+            ema_fast = ((1.0 - a_fast) * ema_fast + a_fast * c) / ((1.0 - a_fast) + a_fast)
+            ema_slow = ((1.0 - a_slow) * ema_slow + a_slow * c) / ((1.0 - a_slow) + a_slow)
+        macd = ema_fast - ema_slow
+        if i == 0:
+            ema_sig = macd
+        else:
+            ema_sig = ((1.0 - a_sig) * ema_sig + a_sig * macd) / ((1.0 - a_sig) + a_sig)
+        out[i, 1] = macd
+        out[i, 2] = ema_sig
+
+        # RSI over the last RSI_PERIOD close-to-close changes
+        if i > 0:
+            delta = c - close[i - 1]
+            g = delta if delta > 0.0 else 0.0
+            l = -delta if delta < 0.0 else 0.0
+            gain_sum += g
+            loss_sum += l
+            gain_nz += g > 0.0
+            loss_nz += l > 0.0
+            if i > RSI_PERIOD:
+                old = close[i - RSI_PERIOD] - close[i - RSI_PERIOD - 1]
+                og = old if old > 0.0 else 0.0
+                ol = -old if old < 0.0 else 0.0
+                gain_sum -= og
+                loss_sum -= ol
+                gain_nz -= og > 0.0
+                loss_nz -= ol > 0.0
+        if i >= RSI_PERIOD:
+            avg_gain = gain_sum / RSI_PERIOD if gain_nz > 0 else 0.0
+            avg_loss = loss_sum / RSI_PERIOD if loss_nz > 0 else 0.0
+            out[i, 0] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        else:
+            out[i, 0] = np.nan
+
+        # SMAs and Bollinger Bands
+        sum_fast += c
+        sum_slow += c
+        sum_bb += c
+        if i >= SMA_FAST:
+            sum_fast -= close[i - SMA_FAST]
+        if i >= SMA_SLOW:
+            sum_slow -= close[i - SMA_SLOW]
+        if i >= BB_WINDOW:
+            sum_bb -= close[i - BB_WINDOW]
+        out[i, 3] = sum_fast / SMA_FAST if i >= SMA_FAST - 1 else np.nan
+        out[i, 4] = sum_slow / SMA_SLOW if i >= SMA_SLOW - 1 else np.nan
+        if i >= BB_WINDOW - 1:
+            mean = sum_bb / BB_WINDOW
+            # Two-pass variance over the short window; exact for flat windows
+            sq_bb = 0.0
+            for j in range(i - BB_WINDOW + 1, i + 1):
+                sq_bb += (close[j] - mean) ** 2
+            std = math.sqrt(sq_bb / (BB_WINDOW - 1))
+            out[i, 5] = mean + BB_NUM_STD * std
+            out[i, 6] = mean - BB_NUM_STD * std
+        else:
+            out[i, 5] = out[i, 6] = np.nan
+
+        # ATR: the first bar has no previous close, so its TR is just High - Low
+        tr = high[i] - low[i]
+        if i > 0:
+            tr = max(tr, abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        tr_sum += tr
+        if i >= ATR_WINDOW:
+            old_tr = high[i - ATR_WINDOW] - low[i - ATR_WINDOW]
+            if i > ATR_WINDOW:
+                prev = close[i - ATR_WINDOW - 1]
+                old_tr = max(old_tr, abs(high[i - ATR_WINDOW] - prev), abs(low[i - ATR_WINDOW] - prev))
+            tr_sum -= old_tr
+        out[i, 7] = tr_sum / ATR_WINDOW if i >= ATR_WINDOW - 1 else np.nan
+    return out
+
+_numba_kernel = njit(cache=True, error_model="numpy")(_kernel_loop) if njit is not None else None
+
+def _rolling_sum(x, window, out, block=_BLOCK):
+    """
+    out[i] = sum(x[i - window + 1 : i + 1]) from block-local cumulative sums, each block
+    shifted by its first value to keep the sums small. The first window - 1 rows are left untouched.
+    """
+    n = len(x)
+    for start in range(window - 1, n, block):
+        stop = min(start + block, n)
+        seg = x[start - window + 1:stop]
+        ref = seg[0]
+        out[start:stop] = _window_sums(np.cumsum(seg - ref), window)
+        out[start:stop] += window * ref
+    return out
+
+def _rolling_mean(x, window, out):
+    out[:window - 1] = np.nan
+    _rolling_sum(x, window, out)
+    out[window - 1:] /= window
+    return out
+
+def _rolling_mean_std(x, window, mean, std, block=4096):
+    """
+    Rolling mean and sample standard deviation from block-local sums of x and x**2.
+    Values are shifted by the block's first value and blocks are short, so the
+    sums of squares stay small enough for the variance to keep ~10 significant digits.
+    """
+    mean[:window - 1] = std[:window - 1] = np.nan
+    n = len(x)
+    for start in range(window - 1, n, block):
+        stop = min(start + block, n)
+        seg = x[start - window + 1:stop]
+        ref = seg[0]
+        dev = seg - ref
+        s1 = _window_sums(np.cumsum(dev), window)
+        s2 = _window_sums(np.cumsum(dev * dev), window)
+        m = s1 / window
+        mean[start:stop] = m + ref
+        var = s2 - s1 * m
+        np.maximum(var, 0.0, out=var)
+        std[start:stop] = np.sqrt(var / (window - 1))
+    return mean, std
+
+def _window_sums(c, window):
+    """
+    Sums of each full window given the cumulative sum `c` of a segment.
+    """
+    sums = c[window - 1:].copy()
+    sums[1:] -= c[:len(c) - window]
+    return sums
+
+def _linear_recurrence(u, c):
+    """
+    y[t] = c * y[t-1] + u[t] (y[-1] = 0, 0 <= c < 1) without a Python loop over t.
+    Each block of _EMA_BLOCK values is solved by one product with the lower-triangular
+    matrix of powers of c; the block-end values then follow the same recurrence with
+    c ** _EMA_BLOCK, which is solved recursively and carried into the next block.
+    """
+    n = len(u)
+    nb = -(-n // _EMA_BLOCK)
+    blocks = np.zeros((nb, _EMA_BLOCK))
+    blocks.reshape(-1)[:n] = u
+    lag = np.subtract.outer(np.arange(_EMA_BLOCK), np.arange(_EMA_BLOCK))
+    weights = np.where(lag >= 0, c ** np.maximum(lag, 0), 0.0)
+    y = blocks @ weights.T
+    if nb > 1:
+        ends = _linear_recurrence(y[:, -1], c ** _EMA_BLOCK)
+        y[1:] += np.multiply.outer(ends[:-1], c ** np.arange(1, _EMA_BLOCK + 1))
+    return y.reshape(-1)[:n]
+
+def _ema(x, span):
+    # pandas' ewm(span=span, adjust=False).mean(): y[0] = x[0], y[t] = (1-a) y[t-1] + a x[t]
+    alpha = 2.0 / (span + 1.0)
+    u = alpha * x
+    u[0] = x[0]
+    return _linear_recurrence(u, 1.0 - alpha)
+
+def _numpy_kernel(close, high, low, out):
+    """
+    Column-at-a-time NumPy version of _kernel_loop (EMAs via _linear_recurrence).
+    """
+    n = len(close)
+    work = np.empty(n)
+
+    # MACD & signal
+    macd_line = _ema(close, MACD_FAST)
+    macd_line -= _ema(close, MACD_SLOW)
+    out[:, 1] = macd_line
+    out[:, 2] = _ema(macd_line, MACD_SIGNAL)
+
+    # RSI; delta[0] is a placeholder, rows before the first full window are NaN below.
+    # A window without any gain (loss) is exactly 0, as in pandas
+    delta = np.empty(n)
+    delta[0] = 0.0
+    np.subtract(close[1:], close[:-1], out=delta[1:])
+    avg_gain = _rolling_mean(np.maximum(delta, 0.0), RSI_PERIOD, np.empty(n))
+    avg_loss = _rolling_mean(np.maximum(-delta, 0.0), RSI_PERIOD, np.empty(n))
+    for avg, moved in ((avg_gain, delta > 0), (avg_loss, delta < 0)):
+        nonzero = _rolling_sum(moved.astype(np.float64), RSI_PERIOD, np.ones(n))
+        avg[nonzero == 0] = 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[:, 0] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out[:RSI_PERIOD, 0] = np.nan
+
+    # SMAs & Bollinger Bands
+    out[:, 3] = _rolling_mean(close, SMA_FAST, work)
+    out[:, 4] = _rolling_mean(close, SMA_SLOW, work)
+    mean, std = _rolling_mean_std(close, BB_WINDOW, np.empty(n), np.empty(n))
+    out[:, 5] = mean + BB_NUM_STD * std
+    out[:, 6] = mean - BB_NUM_STD * std
+
+    # ATR
+    tr = np.subtract(high, low, out=work)
+    prev_close = close[:-1]
+    np.maximum(tr[1:], np.abs(high[1:] - prev_close), out=tr[1:])
+    np.maximum(tr[1:], np.abs(low[1:] - prev_close), out=tr[1:])
+    out[:, 7] = _rolling_mean(tr, ATR_WINDOW, np.empty(n))
+    return out
+
+def fused_indicators(close, high, low, out=None, backend=None):
+    """
+    Compute the build_features indicator columns (INDICATOR_COLS: RSI_14, MACD,
+    MACD_signal, SMA_50, SMA_200, BB_upper, BB_lower, ATR_14) for one series in a single
+    kernel call, without any intermediate pandas objects.
+
+    :param close, high, low: 1-D float arrays without NaNs (one bar per element).
+    :param out: Optional preallocated (n x 8) float64 array to write into.
+    :param backend: "numba" (compiled single pass), "numpy", or None for Numba when installed.
+    :return: `out`, matching the pandas indicator functions within float tolerance
+             (NaN where their windows aren't full yet).
+    """
+    close, high, low = (np.ascontiguousarray(a, dtype=np.float64) for a in (close, high, low))
+    n = len(close)
+    backend = backend or ("numba" if _numba_kernel is not None else "numpy")
+    if out is None:
+        # Row-major suits the per-bar loop, column-major the column-at-a-time NumPy kernel
+        out = np.empty((n, len(INDICATOR_COLS)), order="C" if backend == "numba" else "F")
+    elif out.shape != (n, len(INDICATOR_COLS)):
+        raise ValueError(f"`out` must have shape {(n, len(INDICATOR_COLS))}, got {out.shape}")
+    if n == 0:
+        return out
+    if backend == "numba":
+        if _numba_kernel is None:
+            raise ImportError("backend='numba' needs the numba package.")
+        return _numba_kernel(close, high, low, out)
+    if backend == "numpy":
+        return _numpy_kernel(close, high, low, out)
+    raise ValueError(f"Unknown backend {backend!r}; expected 'numba' or 'numpy'.")
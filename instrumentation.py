@@ -0,0 +1,174 @@
+# instrumentation.py
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+import cProfile
+import pstats
+from config import METRICS_ENABLED, METRICS_LOG_PATH, METRICS_PROM_PATH, PROFILE_STAGE, PROFILER
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+_lock = threading.Lock()
+_bytes_downloaded = 0
+_finished = deque(maxlen=1000)  # recent spans, for the Prometheus textfile
+enabled = METRICS_ENABLED
+
+def add_bytes(n):
+    """
+    Count bytes received over HTTP (called by http_client); spans report the delta.
+    """
+    global _bytes_downloaded
+    if enabled:
+        with _lock:
+            _bytes_downloaded += n
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+class Span:
+    """
+    One timed pipeline stage. Set `rows` inside the block to record rows processed.
+    """
+    def __init__(self, name, rows=None, **attrs):
+        self.name = name
+        self.rows = rows
+        self.attrs = attrs
+        self._profiler = None
+
+    def _start_profiler(self):
+        if PROFILER == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self._profiler = Profiler()
+                self._profiler.start()
+                return
+            except ImportError:
+                print("[WARN] pyinstrument is not installed; falling back to cProfile.")
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def _stop_profiler(self):
+        if isinstance(self._profiler, cProfile.Profile):
+            self._profiler.disable()
+            path = f"profile_{self.name}.prof"
+            self._profiler.dump_stats(path)
+            pstats.Stats(self._profiler).sort_stats("cumulative").print_stats(15)
+        else:
+            self._profiler.stop()
+            path = f"profile_{self.name}.html"
+            with open(path, "w") as f:
+                f.write(self._profiler.output_html())
+            print(self._profiler.output_text())
+        print(f"Profile for stage '{self.name}' saved to {path}")
+
+    def __enter__(self):
+        if PROFILE_STAGE and PROFILE_STAGE == self.name:
+            self._start_profiler()
+        self._bytes0 = _bytes_downloaded
+        self._cpu0 = time.process_time()
+        self._wall0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall0
+        cpu = time.process_time() - self._cpu0
+        if self._profiler is not None:
+            self._stop_profiler()
+        if not enabled:
+            return False
+        record = {
+            "ts": time.time(),
+            "stage": self.name,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "peak_rss_mb": _peak_rss_mb(),
+            "rows": self.rows,
+            "bytes_downloaded": _bytes_downloaded - self._bytes0,
+            "ok": exc_type is None,
+            **self.attrs,
+        }
+        with _lock:
+            _finished.append(record)
+            with open(METRICS_LOG_PATH, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        return False
+
+class _NoopSpan:
+    """
+    Returned by span() when instrumentation is off; costs one attribute check.
+    """
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP = _NoopSpan()
+
+def span(name, rows=None, **attrs):
+    """
+    Context manager timing a pipeline stage:
+        with span("features") as sp:
+            df_feat = build_features(df_raw)
+            sp.rows = len(df_feat)
+    Records wall time, CPU time, peak RSS, rows and bytes downloaded as one JSON line
+    in METRICS_LOG_PATH. Enable with PIPELINE_METRICS=1; when disabled this is a no-op.
+    Set PIPELINE_PROFILE_STAGE=<name> to also run that stage under cProfile
+    (or pyinstrument, with PIPELINE_PROFILER=pyinstrument).
+    """
+    if not enabled and PROFILE_STAGE != name:
+        return _NOOP
+    return Span(name, rows, **attrs)
+
+def timed(name=None):
+    """
+    Decorator form of span(); the stage name defaults to the function name.
+    """
+    def decorator(fn):
+        stage = name or fn.__name__
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorator
+
+def write_prometheus(path=METRICS_PROM_PATH):
+    """
+    Write the spans recorded so far as a Prometheus textfile (for node_exporter's
+    textfile collector). Each stage reports its most recent run. No-op if `path` is empty.
+    """
+    if not path:
+        return
+    with _lock:
+        latest = {r["stage"]: r for r in _finished}
+    metrics = [
+        ("pipeline_stage_wall_seconds", "wall_s", "Wall-clock time of the last run of each stage."),
+        ("pipeline_stage_cpu_seconds", "cpu_s", "CPU time of the last run of each stage."),
+        ("pipeline_stage_peak_rss_megabytes", "peak_rss_mb", "Process peak RSS at the end of each stage."),
+        ("pipeline_stage_rows", "rows", "Rows processed by the last run of each stage."),
+        ("pipeline_stage_bytes_downloaded", "bytes_downloaded", "Bytes downloaded during each stage."),
+    ]
+    lines = []
+    for metric, field, help_text in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for stage, record in latest.items():
+            if record.get(field) is not None:
+                lines.append(f'{metric}{{stage="{stage}"}} {record[field]}')
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,182 @@
+# intraday_store.py
+import os
+import numpy as np
+import pandas as pd
+import trading_calendar
+from config import INTRADAY_DIR
+
+# One fixed-size record per 1-minute bar, in one append-only file per symbol and
+# exchange day. float32 prices/volume keep a year of regular-session minutes for
+# 50 symbols (~5M bars) around 140 MB on disk; files are read by memory-mapping.
+BAR_DTYPE = np.dtype([("ts", "<i8"), ("open", "<f4"), ("high", "<f4"),
+                      ("low", "<f4"), ("close", "<f4"), ("volume", "<f4")])
+_FIELDS = (("open", "Open"), ("high", "High"), ("low", "Low"), ("close", "Close"), ("volume", "Volume"))
+
+def _day_path(symbol, day, root=INTRADAY_DIR):
+    return os.path.join(root, symbol.upper(), f"{pd.Timestamp(day):%Y-%m-%d}.bin")
+
+def stored_days(symbol, root=INTRADAY_DIR):
+    """
+    Exchange dates (sorted Timestamps) with minute bars stored for `symbol`.
+    """
+    sym_dir = os.path.join(root, symbol.upper())
+    if not os.path.isdir(sym_dir):
+        return []
+    return sorted(pd.Timestamp(name[:-4]) for name in os.listdir(sym_dir) if name.endswith(".bin"))
+
+def day_bars(symbol, day, root=INTRADAY_DIR):
+    """
+    Minute bars of `symbol` on exchange date `day` as a read-only memory-mapped
+    structured array (fields: ts, open, high, low, close, volume). Nothing is copied
+    into memory until the fields are read. Empty array if nothing is stored.
+    """
+    path = _day_path(symbol, day, root)
+    # A torn trailing record (interrupted append) is ignored
+    n = os.path.getsize(path) // BAR_DTYPE.itemsize if os.path.exists(path) else 0
+    if n == 0:
+        return np.empty(0, BAR_DTYPE)
+    return np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(n,))
+
+def _exchange_days(ts_ns):
+    local = pd.DatetimeIndex(pd.to_datetime(ts_ns, unit="ns", utc=True)).tz_convert(trading_calendar.EXCHANGE_TZ)
+    return local.tz_localize(None).normalize().asi8
+
+def append_bars(symbol, df, root=INTRADAY_DIR):
+    """
+    Append 1-minute bars to `symbol`'s per-day files.
+    :param df: DataFrame indexed by UTC timestamp (naive or tz-aware) with
+               Open/High/Low/Close/Volume, e.g. a data_fetch.iter_aggregates page.
+    Bars at or before the last stored bar of their day are dropped, except that a new
+    version of the last stored bar (a minute that was still forming) overwrites it.
+    :return: Number of new bars written.
+    """
+    if df.empty:
+        return 0
+    ts = pd.DatetimeIndex(df.index)
+    ts = ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+    rec = np.empty(len(df), BAR_DTYPE)
+    rec["ts"] = ts.as_unit("ns").asi8
+    for field, col in _FIELDS:
+        rec[field] = df[col].to_numpy()
+    rec = rec[np.argsort(rec["ts"], kind="stable")]
+
+    days = _exchange_days(rec["ts"])
+    starts = np.r_[0, np.flatnonzero(np.diff(days)) + 1]
+    written = 0
+    for day, chunk in zip(days[starts], np.split(rec, starts[1:])):
+        path = _day_path(symbol, pd.Timestamp(day), root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stored = day_bars(symbol, pd.Timestamp(day), root)
+        n_stored = len(stored)
+        last_ts = int(stored["ts"][-1]) if n_stored else None
+        del stored
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.truncate(n_stored * BAR_DTYPE.itemsize)
+            if last_ts is not None:
+                # Re-fetches usually start at the day's first minute, so look the last
+                # stored minute up anywhere in the chunk
+                i = np.searchsorted(chunk["ts"], last_ts)
+                if i < len(chunk) and chunk["ts"][i] == last_ts:
+                    f.seek((n_stored - 1) * BAR_DTYPE.itemsize)
+                    f.write(chunk[i:i + 1].tobytes())
+                chunk = chunk[chunk["ts"] > last_ts]
+            f.seek(0, os.SEEK_END)
+            f.write(chunk.tobytes())
+        written += len(chunk)
+    return written
+
+def parse_timeframe(timeframe):
+    """
+    Bar length in nanoseconds for an intraday timeframe ("1min", "5min", "15min", "1h", ...),
+    or None for daily bars ("1d", "day").
+    """
+    if str(timeframe).lower() in ("1d", "d", "day", "daily"):
+        return None
+    step = pd.Timedelta(timeframe)
+    if step <= pd.Timedelta(0) or step >= pd.Timedelta(days=1):
+        raise ValueError(f"Unsupported timeframe: {timeframe!r}")
+    return step.value
+
+def _resample_arrays(ts, open_, high, low, close, volume, step, now_ns=None):
+    """
+    Aggregate sorted 1-minute bars into `step`-nanosecond bars aligned to each session's
+    open (the last bar ends at the close), or one bar per session if `step` is None.
+    Only regular-session minutes are used. The inputs may be views such as memmap
+    fields, which ufunc.reduceat reduces without copying. When the session minutes are
+    one contiguous run (a single day's file) extended hours are sliced off; minutes
+    from several sessions interleaved with extended hours are gathered into copies.
+    If `now_ns` is given, bars that haven't closed by then are dropped.
+    :return: Dict of arrays: date (bar start, or session date for daily bars),
+             Open, High, Low, Close, Volume, end (bar close).
+    """
+    day, opens, closes, in_session = trading_calendar.locate_sessions(ts)
+    if not in_session.all():
+        idx = np.flatnonzero(in_session)
+        contiguous = len(idx) and idx[-1] - idx[0] + 1 == len(idx)
+        keep = slice(idx[0], idx[-1] + 1) if contiguous else in_session
+        ts, open_, high, low, close, volume, day, opens, closes = (
+            a[keep] for a in (ts, open_, high, low, close, volume, day, opens, closes))
+    if len(ts) == 0:
+        return None
+    if step is None:
+        label, end = day, closes
+    else:
+        label = opens + (ts - opens) // step * step
+        end = np.minimum(label + step, closes)
+    starts = np.flatnonzero(np.r_[True, label[1:] != label[:-1]])
+    lasts = np.r_[starts[1:], len(ts)] - 1
+    out = {
+        "date": label[starts],
+        "Open": np.asarray(open_[starts], dtype=np.float64),
+        "High": np.maximum.reduceat(high, starts).astype(np.float64),
+        "Low": np.minimum.reduceat(low, starts).astype(np.float64),
+        "Close": np.asarray(close[lasts], dtype=np.float64),
+        "Volume": np.add.reduceat(volume, starts, dtype=np.float64),
+        "end": end[starts],
+    }
+    if now_ns is not None:
+        done = out["end"] <= now_ns
+        out = {k: v[done] for k, v in out.items()}
+    return out
+
+def _to_frame(parts):
+    parts = [p for p in parts if p is not None]
+    cols = ["Open", "High", "Low", "Close", "Volume"]
+    if not parts:
+        return pd.DataFrame(columns=cols, index=pd.DatetimeIndex([], name="date"))
+    index = pd.DatetimeIndex(pd.to_datetime(np.concatenate([p["date"] for p in parts]), unit="ns"), name="date")
+    return pd.DataFrame({c: np.concatenate([p[c] for p in parts]) for c in cols}, index=index)
+
+def resample(symbol, timeframe="5min", start=None, end=None, complete_only=True, root=INTRADAY_DIR):
+    """
+    OHLCV bars of `symbol` at `timeframe` (see parse_timeframe), built from the stored
+    minute bars of the exchange days in [start, end], one memory-mapped day at a time.
+    Intraday bars are labelled by their UTC start time (like Polygon's), daily bars by
+    session date.
+    :param complete_only: Drop bars that haven't closed yet (a still-forming session).
+    :return: DataFrame indexed by date with Open, High, Low, Close, Volume.
+    """
+    step = parse_timeframe(timeframe)
+    now_ns = pd.Timestamp.now(tz="UTC").value if complete_only else None
+    parts = []
+    for day in stored_days(symbol, root):
+        if (start is not None and day < pd.Timestamp(start).normalize()) or \
+                (end is not None and day > pd.Timestamp(end)):
+            continue
+        bars = day_bars(symbol, day, root)
+        if len(bars):
+            parts.append(_resample_arrays(bars["ts"], bars["open"], bars["high"], bars["low"],
+                                          bars["close"], bars["volume"], step, now_ns))
+    return _to_frame(parts)
+
+def resample_ohlcv(df, timeframe, complete_only=False):
+    """
+    Resample a DataFrame of 1-minute bars (indexed by UTC timestamp, with
+    Open/High/Low/Close/Volume) to `timeframe` the same way resample() does.
+    """
+    ts = pd.DatetimeIndex(df.index)
+    ts = ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+    order = np.argsort(ts.asi8, kind="stable")
+    now_ns = pd.Timestamp.now(tz="UTC").value if complete_only else None
+    arrays = [ts.as_unit("ns").asi8[order]] + [df[col].to_numpy()[order] for _, col in _FIELDS]
+    return _to_frame([_resample_arrays(*arrays, parse_timeframe(timeframe), now_ns)])
@@ -1,45 +1,34 @@
-import os
-import openai
-import schedule
-import time
-import pandas as pd
-from datetime import datetime
 import matplotlib.pyplot as plt
-from prophet import Prophet
 
 from market_status import is_market_open
-from config import TARGET_TICKER, BACKTEST_DAYS
-from data_fetch import fetch_daily_data
-from feature_engineering import build_features
-from ml_model import train_random_forest
+from config import TARGET_TICKER, BACKTEST_DAYS, MODEL_BACKEND
+from data_fetch import fetch_daily_data, fetch_many
+from feature_store import FeatureStore
+from incremental_features import update_symbol
+from model_registry import cached_train_model
 from backtest import simple_backtest
 from analysis import analyze_current_spy_and_vxx
+import history_store
+from forecasting import forecast_symbol, forecast_many
+from instrumentation import span, write_prometheus
+from commentary import build_prompt, commentary_for
 
 # NEW: Import functions from post_to_discord.py
 from post_to_discord import generate_report, create_report_image, post_image_to_discord
 
 # Import API keys
-from api_keys import OPENAI_API_KEY, DISCORD_WEBHOOK_URL
+from api_keys import DISCORD_WEBHOOK_URL
 
-##############################################
-#  SET YOUR OPENAI API KEY
-##############################################
-# Instantiate the OpenAI client
-client = openai.Client(api_key=OPENAI_API_KEY)
-
-def save_data_to_csv(data, filename="historical_data.csv"):
+def save_data(df, symbol, table="bars"):
     """
-    Save the given data to a CSV file.
+    Upsert the given data (indexed by date) for `symbol` into the historical store.
+    Re-saving overlapping dates updates those rows instead of duplicating them.
     """
-    df = pd.DataFrame(data)
-    if os.path.exists(filename):
-        df.to_csv(filename, mode='a', header=False, index=False)
-    else:
-        df.to_csv(filename, mode='w', header=True, index=False)
+    history_store.upsert(df, symbol, table=table)
 
 def fetch_and_save_data():
     """
-    Fetch data, calculate TA indicators, and save to CSV.
+    Fetch data, calculate TA indicators, and save to the historical store.
     """
     if not is_market_open():
         print("Market is not open now. Skipping data fetch.")
@@ -51,37 +40,42 @@ def fetch_and_save_data():
         print(f"No data returned for {TARGET_TICKER}. Exiting.")
         return
 
-    print("=== Building features ===")
-    df_feat = build_features(df_raw)
+    # Only the bars since the last tick go through the indicator engine;
+    # its rolling/EWM state is carried between runs on disk.
+    print("=== Updating features ===")
+    df_feat = update_symbol(TARGET_TICKER, df_raw)
     if df_feat.empty:
-        print("No data after building features. Exiting.")
+        print("No new feature rows since the last run.")
         return
 
-    # Save the data to CSV
-    save_data_to_csv(df_feat)
+    # Save the data to the historical store
+    save_data(df_feat, TARGET_TICKER, table="features")
 
 def save_data_for_symbols(symbols):
     """
-    Fetch and save data for given symbols to CSV.
+    Fetch and save data for given symbols to the historical store.
     """
+    print(f"=== Fetching and saving data for {', '.join(symbols)} ===")
+    with span("fetch_many", symbols=len(symbols)) as sp:
+        frames, errors = fetch_many(symbols)
+        sp.rows = sum(len(df) for df in frames.values())
     for symbol in symbols:
-        print(f"=== Fetching and saving {symbol} data ===")
-        df = fetch_daily_data(symbol)
-        if not df.empty:
-            save_data_to_csv(df, f"{symbol.lower()}_data.csv")
+        if symbol in errors:
+            print(f"[ERROR] Failed to fetch data for {symbol}: {errors[symbol]}")
+        elif not frames[symbol].empty:
+            save_data(frames[symbol], symbol)
         else:
             print(f"No data for {symbol}.")
 
-def read_data_from_csv(symbol):
+def read_data(symbol, columns=None, start=None, end=None, table="bars"):
     """
-    Read data from CSV file for the given symbol.
+    Read data for the given symbol from the historical store, optionally
+    limited to `columns` and the [start, end] date range.
     """
-    filename = f"{symbol.lower()}_data.csv"
-    if os.path.exists(filename):
-        return pd.read_csv(filename)
-    else:
-        print(f"No CSV file found for {symbol}.")
-        return pd.DataFrame()
+    df = history_store.read(symbol, start=start, end=end, columns=columns, table=table)
+    if df.empty:
+        print(f"No stored data found for {symbol}.")
+    return df
 
 def plot_historical_data(symbols):
     """
@@ -89,14 +83,9 @@ def plot_historical_data(symbols):
     """
     plt.figure(figsize=(14, 7))
     for symbol in symbols:
-        df = read_data_from_csv(symbol)
+        df = read_data(symbol, columns=["Close"])
         if not df.empty:
-            print(f"Columns in {symbol} data: {df.columns}")  # Debugging line
-            if 'Timestamp' in df.columns:
-                df['date'] = pd.to_datetime(df['Timestamp'], unit='ms')
-                plt.plot(df['date'], df['Close'], label=symbol)
-            else:
-                print(f"'Timestamp' column not found in {symbol} data")
+            plt.plot(df.index, df['Close'], label=symbol)
     plt.xlabel('Date')
     plt.ylabel('Close Price')
     plt.title('Historical Data')
@@ -107,31 +96,19 @@ def plot_historical_data(symbols):
 def predict_future(symbol, periods=180):
     """
     Predict the future prices for the given symbol using Prophet.
+    Fitted models are cached per symbol (see forecasting.py).
     """
-    df = read_data_from_csv(symbol)
-    if df.empty:
-        return None
-
-    if 'Timestamp' not in df.columns or 'Close' not in df.columns:
-        print(f"'Timestamp' or 'Close' column not found in {symbol} data")
-        return None
-
-    df['date'] = pd.to_datetime(df['Timestamp'], unit='ms')
-    df = df[['date', 'Close']]
-    df.columns = ['ds', 'y']
-    model = Prophet()
-    model.fit(df)
-    future = model.make_future_dataframe(periods=periods)
-    forecast = model.predict(future)
-    return forecast
+    return forecast_symbol(symbol, periods)
 
 def plot_predictions(symbols, periods=180):
     """
     Plot predictions for the given symbols.
+    The per-symbol Prophet fits run in parallel across processes.
     """
+    forecasts = forecast_many(symbols, periods)
     plt.figure(figsize=(14, 7))
     for symbol in symbols:
-        forecast = predict_future(symbol, periods)
+        forecast = forecasts.get(symbol)
         if forecast is not None:
             plt.plot(forecast['ds'], forecast['yhat'], label=f"{symbol} Prediction")
     plt.xlabel('Date')
@@ -141,7 +118,10 @@ def plot_predictions(symbols, periods=180):
     plt.savefig('predictions.png')
     plt.show()
 
-def main():
+def main(backend=MODEL_BACKEND):
+    """
+    :param backend: Model backend to train and backtest (see ml_model.MODEL_BACKENDS).
+    """
     # Save SPY, VXX, GLD, and OXY data before running the scheduler
     save_data_for_symbols(["SPY", "VXX", "GLD", "OXY"])
 
@@ -157,76 +137,64 @@ def main():
     
     # 2) Model pipeline (fetch data, build features, train RandomForest, backtest)
     print(f"=== Fetching daily data for {TARGET_TICKER} ===")
-    df_raw = fetch_daily_data(TARGET_TICKER)
+    with span("fetch", symbol=TARGET_TICKER) as sp:
+        df_raw = fetch_daily_data(TARGET_TICKER)
+        sp.rows = len(df_raw)
     if df_raw.empty:
         print(f"No data returned for {TARGET_TICKER}. Exiting.")
         return
     
     print("=== Building features ===")
-    df_feat = build_features(df_raw)
+    with span("features") as sp:
+        # Indicators come from the store's full history, so the warm-up rows at the start
+        # of the lookback window are kept once earlier bars are stored
+        df_feat = FeatureStore().build_features(TARGET_TICKER, df_raw)
+        sp.rows = len(df_feat)
     if df_feat.empty:
         print("No data after building features. Exiting.")
         return
     
-    print("=== Training Random Forest Model ===")
-    model, metrics = train_random_forest(df_feat, test_days=BACKTEST_DAYS)
+    print(f"=== Training {backend} model ===")
+    with span("train", rows=len(df_feat), backend=backend):
+        model, metrics = cached_train_model(df_feat, backend, test_days=BACKTEST_DAYS, cost_metrics=True)
     print(f"Train accuracy: {metrics['train_accuracy']:.2f}, "
           f"Test accuracy: {metrics['test_accuracy']:.2f}")
-    print(f"Train size: {metrics['train_size']}, Test size: {metrics['test_size']}\n")
+    print(f"Train size: {metrics['train_size']}, Test size: {metrics['test_size']}")
+    if "predict_ms_per_1k" in metrics:  # models cached before these were recorded lack them
+        print(f"Fit time: {metrics['fit_s']:.2f}s, predict latency: {metrics['predict_ms_per_1k']:.2f} ms/1k rows, "
+              f"model size: {metrics['model_bytes'] / 1024:.0f} KiB")
+    print()
     
     print("=== Simple Backtest ===")
-    bt_results = simple_backtest(df_feat, model, test_days=BACKTEST_DAYS, initial_capital=100000)
+    with span("backtest", rows=BACKTEST_DAYS):
+        bt_results = simple_backtest(df_feat, model, test_days=BACKTEST_DAYS, initial_capital=100000)
     print(f"Final capital: ${bt_results['final_capital']:.2f}")
     print(f"Total return: ${bt_results['total_return']:.2f} "
           f"({bt_results['return_pct']:.2f}%)\n")
     
     # 3) Quick SPY & VXX outlook
     print("=== Quick SPY & VXX Outlook ===")
-    results = analyze_current_spy_and_vxx(
-        spy_symbol="SPY", 
-        vxx_symbol="VXX", 
-        lookback_days=365 * 2, 
-        return_data=True
-    )
+    with span("analysis"):
+        results = analyze_current_spy_and_vxx(
+            spy_symbol="SPY", 
+            vxx_symbol="VXX", 
+            lookback_days=365 * 2, 
+            return_data=True
+        )
     if not results:
         print("No SPY/VXX data to pass to AI.")
         return
     
-    # 4) Use ChatCompletion with a chat-based model (e.g. gpt-3.5-turbo)
-    prompt_text = f"""
-We have the following market context:
-- SPY is {results['market_trend']}
-- RSI_14 is {results['rsi_value']:.2f}, meaning {results['rsi_comment']}
-- VXX is {results['vxx_close']:.2f}, indicating {results['vxx_comment']}
-- Pivot Point: {results['pivot_point']}
-- Resistance Levels: {results['resistance_1']}, {results['resistance_2']}, {results['resistance_3']}
-- Support Levels: {results['support_1']}, {results['support_2']}, {results['support_3']}
-
-Generate a concise set of bullet points on potential actions or considerations
-for a trader or hedge fund in this scenario. Assume they have moderate risk tolerance.
-""".strip()
+    # 4) AI commentary: async, and cached per market context (see commentary.py)
+    prompt_text = build_prompt(results)
 
     print("\n=== AI Chat Prompt ===")
     print(prompt_text)
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # or 'gpt-4' if you have access
-            messages=[
-                {"role": "system", "content": "You are a helpful financial assistant."},
-                {"role": "user", "content": prompt_text}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        # Access the AI-generated content
-        ai_text = response.choices[0].message.content.strip()
-        
-        print("\n=== AI Response ===")
-        print(ai_text)
-    except Exception as e:
-        ai_text = f"Error calling OpenAI ChatCompletion: {e}"
-        print(ai_text)
+
+    with span("openai"):
+        ai_text = commentary_for({"SPY": results})["SPY"]
+    print("\n=== AI Response ===")
+    print(ai_text)
 
     print("\nAll done!")
 
@@ -254,16 +222,18 @@ for a trader or hedge fund in this scenario. Assume they have moderate risk tole
     
     # Generate report as an image with color-coded support/resistance levels
     report_image_path = "report.png"
-    create_report_image(
-        report, 
-        output_file=report_image_path,
-        color_coding={
-            "support": "green",  # Color for support levels
-            "resistance": "red",  # Color for resistance levels
-            "Pivot Point": "blue",  # Color for pivot points
-            "trend": "blue",  # Color for the trend
-        }
-    )
+    with span("render"):
+        create_report_image(
+            report, 
+            output_file=report_image_path,
+            color_coding={
+                "support": "green",  # Color for support levels
+                "resistance": "red",  # Color for resistance levels
+                "Pivot Point": "blue",  # Color for pivot points
+                "trend": "blue",  # Color for the trend
+            }
+        )
+    write_prometheus()
 
     # # Post the report image to Discord
     # if "discord.com/api/webhooks" in DISCORD_WEBHOOK_URL:
@@ -271,14 +241,8 @@ for a trader or hedge fund in this scenario. Assume they have moderate risk tole
     # else:
     #     print("Discord Webhook URL not set or invalid. Skipping Discord post.")
 
-    # Comment out the scheduler code
-    # Schedule the fetch_and_save_data function to run every hour during market hours
-    # schedule.every().hour.at(":00").do(fetch_and_save_data)
-
-    # print("=== Starting the scheduler ===")
-    # while True:
-    #     schedule.run_pending()
-    #     time.sleep(1)
+    # The live hourly fetch loop now runs as an asyncio daemon triggered on bar
+    # closes and session boundaries: python daemon.py (see daemon.py)
 
 if __name__ == "__main__":
     main()
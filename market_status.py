@@ -1,17 +1,39 @@
 # market_status.py
-import requests
-from api_keys import POLYGON_API_KEY
-from config import MARKET_STATUS_URL
+import time
+import trading_calendar
+from http_client import get_client
+from config import MARKET_STATUS_PATH, MARKET_STATUS_CROSSCHECK_MINUTES
 
-def is_market_open():
+_last_crosscheck = 0.0
+
+def polygon_market_status():
     """
     Calls the Polygon.io v1/marketstatus/now endpoint to see if market is open.
+    :return: True/False, or None if the status could not be fetched.
     """
     try:
-        r = requests.get(MARKET_STATUS_URL, params={"apiKey": POLYGON_API_KEY})
-        data = r.json()
+        data = get_client().get_json(MARKET_STATUS_PATH)
         return (data.get("market", "").lower() == "open")
     except Exception as e:
         print(f"[WARN] Could not fetch market status: {e}")
-        # By default, assume not open
-        return False
+        return None
+
+def is_market_open(ts=None):
+    """
+    True if the regular NYSE session is open at `ts` (default: now), answered from the
+    local trading calendar without any network call.
+
+    If MARKET_STATUS_CROSSCHECK_MINUTES is set, the answer for "now" is compared with
+    Polygon's market status at most that often and a mismatch (e.g. an unscheduled
+    closure missing from the calendar) is reported.
+    """
+    is_open = trading_calendar.is_open(ts)
+    global _last_crosscheck
+    if ts is None and MARKET_STATUS_CROSSCHECK_MINUTES > 0 and \
+            time.monotonic() - _last_crosscheck >= MARKET_STATUS_CROSSCHECK_MINUTES * 60:
+        _last_crosscheck = time.monotonic()
+        remote = polygon_market_status()
+        if remote is not None and remote != is_open:
+            print(f"[WARN] Trading calendar says market {'open' if is_open else 'closed'}, "
+                  f"Polygon says {'open' if remote else 'closed'}.")
+    return is_open
@@ -1,13 +1,71 @@
 # ml_model.py
+import time
+import pickle
+import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score
 
-def train_random_forest(df, test_days=180):
+FEATURE_COLS = [
+    "RSI_14", "MACD", "MACD_signal", "SMA_50", "SMA_200", "BB_upper", "BB_lower", "ATR_14",
+    "Open", "High", "Low", "Close", "Volume"
+]
+
+def _logistic(C=1.0, **params):
+    # Features are on very different scales (prices, volume, RSI), so standardize first
+    return make_pipeline(StandardScaler(), LogisticRegression(C=C, max_iter=1000, **params))
+
+# Model backends: name -> (estimator class or factory, default params). Every backend is a
+# sklearn classifier with predict/predict_proba, so the backtest and the prediction
+# service work with any of them.
+MODEL_BACKENDS = {
+    "random_forest": (RandomForestClassifier, {"n_estimators": 100, "max_depth": 5, "random_state": 42}),
+    "extra_trees": (ExtraTreesClassifier, {"n_estimators": 100, "max_depth": 5, "random_state": 42}),
+    "hist_gradient_boosting": (HistGradientBoostingClassifier,
+                               {"max_iter": 100, "max_depth": 5, "learning_rate": 0.1, "random_state": 42}),
+    "logistic": (_logistic, {"C": 1.0}),
+}
+
+def make_model(backend="random_forest", **params):
+    """
+    Unfitted estimator of a MODEL_BACKENDS backend; `params` override its defaults.
+    """
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend {backend!r}; available: {sorted(MODEL_BACKENDS)}")
+    factory, defaults = MODEL_BACKENDS[backend]
+    return factory(**{**defaults, **params})
+
+def predict_latency_ms(model, X, rows=1000, repeat=3):
+    """
+    Best-of-`repeat` wall time in ms of model.predict on `rows` rows of the DataFrame or
+    array `X` (tiled if shorter).
+    """
+    if len(X) == 0:
+        return float("nan")
+    take = np.arange(rows) % len(X)
+    batch = X.iloc[take] if isinstance(X, pd.DataFrame) else X[take]
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        model.predict(batch)
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000
+
+def model_size_bytes(model):
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+def train_model(df, backend="random_forest", test_days=180, cost_metrics=False, **params):
     """
     1) Splits data into train/test by date (last `test_days` are test).
-    2) Trains a RandomForestClassifier to predict 'Target' from the feature set.
-    Returns the model, plus performance metrics.
+    2) Trains the `backend` model (see MODEL_BACKENDS) to predict 'Target' from the feature set.
+    Any `params` override the backend's defaults.
+    Returns the model, plus performance metrics: accuracies, split sizes and fit time.
+    With `cost_metrics`, also predict latency per 1k rows and pickled model size, so
+    backends can be compared on cost too (this costs extra predict calls and a pickle).
     """
     # Make sure we have enough data
     if len(df) < (test_days + 100):
@@ -17,38 +75,134 @@ def train_random_forest(df, test_days=180):
     df = df.sort_index()
     
     # Decide which columns are features
-    feature_cols = [
-        "RSI_14", "MACD", "MACD_signal", "SMA_50", "SMA_200", "BB_upper", "BB_lower", "ATR_14", 
-        "Open", "High", "Low", "Close", "Volume"
-    ]
-    df_features = df[feature_cols].copy()
-    df_target = df["Target"].copy()
-    
-    # Split
+    feature_cols = FEATURE_COLS
+    
+    # Split: select the feature block once and take train/test as positional row
+    # slices of it, so the split copies nothing beyond that one selection
     train_cutoff = df.index[-test_days]  # approximate
-    df_train = df[df.index < train_cutoff]
-    df_test  = df[df.index >= train_cutoff]
+    split = df.index.searchsorted(train_cutoff, side="left")
+    X, y = df[feature_cols], df["Target"]
     
-    X_train = df_train[feature_cols]
-    y_train = df_train["Target"]
-    X_test = df_test[feature_cols]
-    y_test = df_test["Target"]
+    X_train = X.iloc[:split]
+    y_train = y.iloc[:split]
+    X_test = X.iloc[split:]
+    y_test = y.iloc[split:]
     
-    rf = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
-    rf.fit(X_train, y_train)
+    model = make_model(backend, **params)
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
     
     # Evaluate
-    train_preds = rf.predict(X_train)
-    test_preds = rf.predict(X_test)
+    train_preds = model.predict(X_train)
+    test_preds = model.predict(X_test)
     
     train_acc = accuracy_score(y_train, train_preds)
     test_acc  = accuracy_score(y_test, test_preds)
     
     metrics = {
+        "backend": backend,
         "train_accuracy": train_acc,
         "test_accuracy": test_acc,
-        "train_size": len(df_train),
-        "test_size": len(df_test)
+        "train_size": len(X_train),
+        "test_size": len(X_test),
+        "fit_s": fit_s,
     }
+    if cost_metrics:
+        metrics["predict_ms_per_1k"] = predict_latency_ms(model, X_test if len(X_test) else X_train)
+        metrics["model_bytes"] = model_size_bytes(model)
     
-    return rf, metrics
+    return model, metrics
+
+def train_random_forest(df, test_days=180, **rf_params):
+    """
+    train_model with the RandomForestClassifier backend. Any `rf_params` override the
+    default settings (n_estimators=100, max_depth=5, random_state=42).
+    Returns the model, plus performance metrics.
+    """
+    return train_model(df, "random_forest", test_days=test_days, **rf_params)
+
+def compare_backends(df, backends=None, test_days=180, params=None):
+    """
+    Train every backend on the same split and rank them for the live path.
+
+    :param backends: Backend names (default: all of MODEL_BACKENDS).
+    :param params: Optional dict backend -> param overrides.
+    :return: Tuple (dict backend -> fitted model, DataFrame with one row of train_model
+             metrics per backend plus 'accuracy_per_ms' (test accuracy per ms of predict
+             latency per 1k rows), sorted by it, best first).
+    """
+    params = params or {}
+    models, rows = {}, []
+    for backend in backends or MODEL_BACKENDS:
+        models[backend], metrics = train_model(df, backend, test_days=test_days, cost_metrics=True,
+                                               **params.get(backend, {}))
+        rows.append(metrics)
+    table = pd.DataFrame(rows)
+    table["accuracy_per_ms"] = table["test_accuracy"] / table["predict_ms_per_1k"]
+    return models, table.sort_values("accuracy_per_ms", ascending=False).reset_index(drop=True)
+
+def _fit_fold(X, y, train_start, train_end, test_end, backend, rf_params):
+    """
+    Fit one walk-forward fold on rows [train_start, train_end) and predict [train_end, test_end).
+    X and y are shared (memory-mapped by joblib for large arrays), only sliced here.
+    """
+    rf = make_model(backend, **rf_params)
+    rf.fit(X[train_start:train_end], y[train_start:train_end])
+    X_test = X[train_end:test_end]
+    proba = rf.predict_proba(X_test)
+    # A fold whose training window saw only one class has a single proba column
+    bullish = proba[:, list(rf.classes_).index(1)] if 1 in rf.classes_ else np.zeros(len(X_test))
+    return train_end, rf.predict(X_test), bullish
+
+def walk_forward_predict(df, min_train_size=500, retrain_every=21, window="expanding",
+                         train_size=None, n_jobs=-1, backend="random_forest", **rf_params):
+    """
+    Walk-forward retraining: refit the model every `retrain_every` bars and
+    predict the following bars with a model that never saw them.
+
+    :param min_train_size: Bars in the first training window; predictions start after it.
+    :param retrain_every: Retrain cadence in bars (e.g. 21 ~ monthly on daily bars).
+    :param window: "expanding" (train on all bars so far) or "rolling" (last `train_size` bars).
+    :param train_size: Rolling window length (defaults to `min_train_size`).
+    :param n_jobs: Folds fitted in parallel (joblib; -1 = all cores).
+    :param backend: Model backend (see MODEL_BACKENDS).
+    :param rf_params: Overrides of the backend's default params, as in train_model.
+    :return: DataFrame indexed by date with out-of-sample 'pred' (0/1), 'proba'
+             (P(bullish)) and 'Target' for every bar after the first training window,
+             ready for backtest.backtest_signals.
+    """
+    if window not in ("expanding", "rolling"):
+        raise ValueError(f"window must be 'expanding' or 'rolling', got {window!r}")
+    df = df.sort_index()
+    # Prepare the feature matrix once; folds only take slices of it.
+    # float32 is what sklearn's trees use internally, so this avoids a per-fold cast.
+    X = np.ascontiguousarray(df[FEATURE_COLS].to_numpy(dtype=np.float32))
+    y = df["Target"].to_numpy()
+    n = len(df)
+    if n <= min_train_size:
+        print("[WARN] Not enough data for walk-forward predictions.")
+        return pd.DataFrame(columns=["pred", "proba", "Target"])
+
+    train_size = train_size or min_train_size
+
+    folds = []
+    for train_end in range(min_train_size, n, retrain_every):
+        train_start = 0 if window == "expanding" else max(0, train_end - train_size)
+        folds.append((train_start, train_end, min(train_end + retrain_every, n)))
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(X, y, start, end, test_end, backend, rf_params) for start, end, test_end in folds
+    )
+
+    pred = np.empty(n - min_train_size, dtype=int)
+    proba = np.empty(n - min_train_size)
+    for train_end, fold_pred, fold_proba in results:
+        offset = train_end - min_train_size
+        pred[offset:offset + len(fold_pred)] = fold_pred
+        proba[offset:offset + len(fold_proba)] = fold_proba
+
+    return pd.DataFrame(
+        {"pred": pred, "proba": proba, "Target": y[min_train_size:]},
+        index=df.index[min_train_size:]
+    )
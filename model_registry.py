@@ -0,0 +1,137 @@
+# model_registry.py
+import os
+import json
+import time
+import hashlib
+import joblib
+import pandas as pd
+import sklearn
+from config import MODEL_REGISTRY_DIR, MODEL_REGISTRY_MAX_ENTRIES, MODEL_REGISTRY_MAX_BYTES
+from ml_model import FEATURE_COLS, make_model, train_model
+
+def model_key(df, feature_cols, params):
+    """
+    Content hash identifying a trained model: the feature matrix and target (values and
+    dates), the feature list, the training parameters and the sklearn version.
+    """
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df[feature_cols + ["Target"]], index=True).values.tobytes())
+    h.update(json.dumps({"features": feature_cols, "params": params,
+                         "sklearn": sklearn.__version__}, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:32]
+
+def _hyperparams(backend, model_params):
+    """
+    Every hyperparameter of the estimator train_model would fit, backend defaults included,
+    so a changed default in MODEL_BACKENDS changes the key too.
+    """
+    params = make_model(backend, **model_params).get_params(deep=True)
+    # Nested estimators (pipeline steps) are covered by their flattened "step__param" entries
+    return {k: v for k, v in params.items() if k != "steps" and not hasattr(v, "get_params")}
+
+def _paths(key, registry_dir):
+    stem = os.path.join(registry_dir, key)
+    return stem + ".joblib", stem + ".json"
+
+def _touch(meta_path, meta):
+    meta["last_used"] = time.time()
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(meta_path + ".tmp", meta_path)
+
+def list_models(registry_dir=MODEL_REGISTRY_DIR):
+    """
+    Return a DataFrame with the metadata of every stored model, most recently used first.
+    """
+    if not os.path.isdir(registry_dir):
+        return pd.DataFrame()
+    rows = []
+    for name in os.listdir(registry_dir):
+        if name.endswith(".json"):
+            with open(os.path.join(registry_dir, name)) as f:
+                rows.append(json.load(f))
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("last_used", ascending=False).reset_index(drop=True)
+
+def load_model(key=None, registry_dir=MODEL_REGISTRY_DIR, mmap_mode="r"):
+    """
+    Load a stored model by key, or the most recently used one if `key` is None.
+    :return: Tuple (model, key).
+    """
+    if key is None:
+        models = list_models(registry_dir)
+        if models.empty:
+            raise FileNotFoundError(f"No models in {registry_dir}; train one first.")
+        key = models.iloc[0]["key"]
+    return joblib.load(_paths(key, registry_dir)[0], mmap_mode=mmap_mode), key
+
+def evict(registry_dir=MODEL_REGISTRY_DIR, max_entries=MODEL_REGISTRY_MAX_ENTRIES,
+          max_bytes=MODEL_REGISTRY_MAX_BYTES):
+    """
+    Drop least-recently-used models until at most `max_entries` remain and their
+    total size is under `max_bytes`.
+    """
+    models = list_models(registry_dir)
+    total = 0
+    for i, meta in models.iterrows():
+        total += meta["size_bytes"]
+        # The most recently used model is always kept
+        if i > 0 and (i >= max_entries or total > max_bytes):
+            for path in _paths(meta["key"], registry_dir):
+                if os.path.exists(path):
+                    os.remove(path)
+
+def cached_train_model(df, backend="random_forest", test_days=180, registry_dir=MODEL_REGISTRY_DIR,
+                       cost_metrics=False, **model_params):
+    """
+    Drop-in replacement for train_model that reuses a previously trained model
+    when the feature matrix, feature list, backend and hyperparameters are unchanged.
+
+    On a hit the estimator is loaded from disk (memory-mapped) instead of refitted.
+    Returns (model, metrics) like train_model (`cost_metrics` is passed through when
+    training); metrics also carry 'cache_hit' and 'model_key'. The stored metadata (data range, size, last use) is in list_models().
+    """
+    df = df.sort_index()
+    params = {"model": backend, "test_days": test_days, **_hyperparams(backend, model_params)}
+    key = model_key(df, FEATURE_COLS, params)
+    model_path, meta_path = _paths(key, registry_dir)
+
+    if os.path.exists(model_path) and os.path.exists(meta_path):
+        try:
+            t0 = time.perf_counter()
+            model = joblib.load(model_path, mmap_mode="r")
+            with open(meta_path) as f:
+                meta = json.load(f)
+            _touch(meta_path, meta)
+            print(f"Loaded cached model {key} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+            return model, {**meta["metrics"], "cache_hit": True, "model_key": key}
+        except Exception as e:
+            print(f"[WARN] Could not load cached model {key}, retraining: {e}")
+
+    model, metrics = train_model(df, backend, test_days=test_days, cost_metrics=cost_metrics, **model_params)
+
+    os.makedirs(registry_dir, exist_ok=True)
+    joblib.dump(model, model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+    train_cutoff = df.index[-test_days]
+    meta = {
+        "key": key,
+        "params": params,
+        "metrics": metrics,
+        "data_start": str(df.index[0]),
+        "data_end": str(df.index[-1]),
+        "test_start": str(train_cutoff),
+        "rows": len(df),
+        "created": time.time(),
+        "size_bytes": os.path.getsize(model_path),
+    }
+    _touch(meta_path, meta)
+    evict(registry_dir)
+    return model, {**metrics, "cache_hit": False, "model_key": key}
+
+def cached_train_random_forest(df, test_days=180, registry_dir=MODEL_REGISTRY_DIR, **rf_params):
+    """
+    cached_train_model with the RandomForest backend (drop-in for train_random_forest).
+    """
+    return cached_train_model(df, "random_forest", test_days, registry_dir, **rf_params)
@@ -1,5 +1,22 @@
+import io
+import time
+import queue
+import threading
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 import requests
+from config import REPORT_FONT_PATH, DISCORD_TIMEOUT, DISCORD_MAX_RETRIES
+
+# Report image layout
+IMAGE_WIDTH = 800
+PADDING = 20
+LINE_HEIGHT = 30
+FONT_SIZE = 20
+HEADER_FONT_SIZE = 24
+DEFAULT_MESSAGE = "Here is your trading report with support and resistance levels!"
+# Discord accepts at most 10 attachments per webhook message
+MAX_ATTACHMENTS = 10
 
 def generate_report(weekly_data, daily_data):
     """
@@ -19,73 +36,306 @@ Trade Setup: {daily_data.get('trade_setup', 'N/A')}
 """
     return report.strip()
 
+@lru_cache(maxsize=None)
+def _font(font_path, size):
+    """
+    Load a TrueType font once per (path, size); Pillow's built-in font if it can't be loaded.
+    """
+    try:
+        return ImageFont.truetype(font_path, size)
+    except OSError:
+        print(f"[WARN] Could not load font {font_path}; using Pillow's default font.")
+        return ImageFont.load_default(size)
+
+@lru_cache(maxsize=4096)
+def _wrap(paragraph, font_path, size, max_width):
+    """
+    Split one paragraph into lines no wider than `max_width` pixels in the given font.
+    Cached, since most report lines (headers, labels) repeat across reports and runs.
+    """
+    font = _font(font_path, size)
+    lines, line = [], ""
+    for word in paragraph.split(" "):
+        candidate = f"{line} {word}" if line else word
+        if not line or font.getlength(candidate) <= max_width:
+            line = candidate
+        else:
+            lines.append(line)
+            line = word
+    lines.append(line)
+    return tuple(lines)
+
+@lru_cache(maxsize=256)
+def _layout(report_text, font_path):
+    """
+    Wrapped lines of a report as a tuple of (text, is_header) pairs.
+    """
+    max_width = IMAGE_WIDTH - 2 * PADDING
+    lines = []
+    for paragraph in report_text.split("\n"):
+        header = "===" in paragraph
+        size = HEADER_FONT_SIZE if header else FONT_SIZE
+        lines.extend((line, header) for line in _wrap(paragraph, font_path, size, max_width))
+    return tuple(lines)
+
+@lru_cache(maxsize=4096)
+def _line_mask(line, font_path, size):
+    """
+    One line of text rasterized as an 8-bit coverage mask, plus the x offset to draw it
+    at (negative if the first glyph overhangs its origin). Drawing text is the bulk of
+    the rendering time and most lines repeat across reports, so masks are cached.
+    """
+    font = _font(font_path, size)
+    left, _, right, bottom = font.getbbox(line)
+    left = min(0, left)
+    mask = Image.new("L", (max(1, right - left), max(1, bottom)))
+    ImageDraw.Draw(mask).text((-left, 0), line, fill=255, font=font)
+    return mask, left
+
+def render_report(report_text, color_coding=None, fmt="PNG", font_path=REPORT_FONT_PATH):
+    """
+    Render a report to an encoded image in memory.
+
+    :param report_text: The report text to be displayed on the image.
+    :param color_coding: A dictionary of keywords mapped to colors for text styling.
+    :param fmt: Pillow image format to encode to (e.g. "PNG", "JPEG").
+    :return: The encoded image as bytes.
+    """
+    lines = _layout(report_text, font_path)
+    keywords = [(k.lower(), color) for k, color in (color_coding or {}).items()]
+
+    img = Image.new("RGB", (IMAGE_WIDTH, PADDING * 2 + len(lines) * LINE_HEIGHT), color="white")
+    draw = ImageDraw.Draw(img)
+    y = PADDING
+    for line, header in lines:
+        if line:
+            if header:
+                color, size = "blue", HEADER_FONT_SIZE
+            else:
+                lower = line.lower()
+                color, size = next((c for k, c in keywords if k in lower), "black"), FONT_SIZE
+            mask, dx = _line_mask(line, font_path, size)
+            draw.bitmap((PADDING + dx, y), mask, fill=color)
+        y += LINE_HEIGHT
+
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+def render_reports(reports, color_coding=None, fmt="PNG", workers=1):
+    """
+    Render many reports (e.g. one per symbol) in one batch.
+    Fonts and wrapped layouts are shared across the batch; with `workers` > 1 the
+    reports are rendered on a thread pool (Pillow releases the GIL while drawing and encoding).
+
+    :param reports: Dict name -> report text.
+    :return: Dict name -> encoded image bytes, in the same order.
+    """
+    def render(text):
+        return render_report(text, color_coding, fmt)
+
+    if workers > 1 and len(reports) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(reports, pool.map(render, reports.values())))
+    return {name: render(text) for name, text in reports.items()}
+
 def create_report_image(report_text, output_file="report.png", color_coding=None):
     """
     Creates an image of the report text and saves it to a file with optional color coding.
-    
+
     :param report_text: The report text to be displayed on the image.
     :param output_file: The file path to save the image.
     :param color_coding: A dictionary of keywords mapped to colors for text styling.
+    :return: The encoded PNG bytes (see render_report to skip the file).
     """
-    # Font settings (ensure you have a valid .ttf font on your system)
-    font_path = "arial.ttf"  # Replace with a valid path to a font file
-    font = ImageFont.truetype(font_path, 20)
-    header_font = ImageFont.truetype(font_path, 24)
-    padding = 20
-    image_width = 800
-    max_line_length = 70
+    image = render_report(report_text, color_coding)
+    with open(output_file, "wb") as f:
+        f.write(image)
+    print(f"Report image saved to {output_file}")
+    return image
 
-    # Wrap text and split into lines
-    lines = []
-    for paragraph in report_text.split("\n"):
-        words = paragraph.split(" ")
-        line = ""
-        for word in words:
-            if len(line) + len(word) + 1 <= max_line_length:
-                line += word + " "
-            else:
-                lines.append(line.strip())
-                line = word + " "
-        if line:
-            lines.append(line.strip())
+class DiscordWebhook:
+    """
+    Keep-alive client for one Discord webhook URL.
+    Posts are retried with exponential backoff on 5xx responses and connection errors;
+    429 responses wait for the `retry_after` Discord sends. When the rate-limit headers
+    say the bucket is empty, the next post waits for the reset instead of hitting a 429.
+    """
+    def __init__(self, webhook_url, timeout=DISCORD_TIMEOUT, max_retries=DISCORD_MAX_RETRIES, backoff_base=0.5):
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.session = requests.Session()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
 
-    # Calculate image height
-    image_height = padding * 2 + len(lines) * 30
+    def _retry_after(self, response):
+        """
+        Seconds Discord asks us to wait after a 429 (JSON body first, then the Retry-After header).
+        """
+        try:
+            return float(response.json()["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            return self.backoff_base
 
-    # Create image
-    img = Image.new("RGB", (image_width, image_height), color="white")
-    draw = ImageDraw.Draw(img)
+    def _track_limits(self, response):
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            try:
+                reset_after = float(response.headers.get("X-RateLimit-Reset-After", "0"))
+            except ValueError:
+                return
+            with self._lock:
+                self._resume_at = max(self._resume_at, time.monotonic() + reset_after)
 
-    # Draw text with color coding
-    y = padding
-    for line in lines:
-        line_color = "black"  # Default text color
-        if color_coding:
-            for keyword, color in color_coding.items():
-                if keyword.lower() in line.lower():
-                    line_color = color
-                    break
-
-        # Use bold font for headers
-        if "===" in line:
-            draw.text((padding, y), line, fill="blue", font=header_font)
-        else:
-            draw.text((padding, y), line, fill=line_color, font=font)
-        y += 30
+    def _wait_for_bucket(self):
+        with self._lock:
+            wait = self._resume_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
 
-    # Save image
-    img.save(output_file)
-    print(f"Report image saved to {output_file}")
+    def post(self, content=None, files=None):
+        """
+        Post a message to the webhook.
+        :param content: Message text.
+        :param files: Dict filename -> bytes of up to MAX_ATTACHMENTS attachments.
+        :return: The final requests.Response.
+        Raises requests.HTTPError / requests.RequestException once retries are exhausted
+        (or at once for other 4xx responses).
+        """
+        data = {"content": content} if content else {}
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_bucket()
+            # Rebuilt per attempt: requests consumes the multipart body
+            parts = [(f"files[{i}]", (name, payload)) for i, (name, payload) in enumerate((files or {}).items())]
+            try:
+                r = self.session.post(self.webhook_url, data=data, files=parts or None, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff_base * (2 ** attempt))
+                continue
+            self._track_limits(r)
+            if r.status_code == 429:
+                if attempt == self.max_retries:
+                    r.raise_for_status()
+                wait = self._retry_after(r)
+                with self._lock:
+                    self._resume_at = max(self._resume_at, time.monotonic() + wait)
+                continue
+            if r.status_code >= 500:
+                if attempt == self.max_retries:
+                    r.raise_for_status()
+                time.sleep(self.backoff_base * (2 ** attempt))
+                continue
+            r.raise_for_status()
+            return r
 
-def post_image_to_discord(image_path, webhook_url):
+    def close(self):
+        self.session.close()
+
+class DiscordDelivery:
     """
-    Posts the report image to Discord.
+    Background delivery queue for a Discord webhook: send() returns immediately with a
+    Future and a worker thread posts queued messages in order through one DiscordWebhook
+    (one reused connection, rate limits and retries handled there), so rendering and the
+    rest of the pipeline never wait on Discord.
+
+    Usage:
+        with DiscordDelivery(DISCORD_WEBHOOK_URL) as delivery:
+            delivery.send_images(render_reports(reports))
     """
-    with open(image_path, "rb") as image_file:
-        payload = {"content": "Here is your trading report with support and resistance levels!"}
-        files = {"file": image_file}
-        response = requests.post(webhook_url, data=payload, files=files)
-        if response.status_code in [200, 204]:
-            print("Image successfully posted to Discord!")
-        else:
-            print(f"Failed to post to Discord. Status Code: {response.status_code}")
+    def __init__(self, webhook_url, **kwargs):
+        self.webhook = DiscordWebhook(webhook_url, **kwargs)
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="discord-delivery", daemon=True)
+        self._worker.start()
+
+    def send(self, content=None, files=None):
+        """
+        Queue one message (see DiscordWebhook.post).
+        :return: Future resolving to the response, or to the exception if delivery failed.
+        """
+        future = Future()
+        self._queue.put((content, files, future))
+        return future
+
+    def send_images(self, images, content=DEFAULT_MESSAGE, fmt="png"):
+        """
+        Queue encoded images (dict name -> bytes, e.g. from render_reports), packed
+        MAX_ATTACHMENTS to a message.
+        :return: List of Futures, one per message.
+        """
+        items = [(f"{name}.{fmt}", image) for name, image in images.items()]
+        return [self.send(content, dict(items[i:i + MAX_ATTACHMENTS]))
+                for i in range(0, len(items), MAX_ATTACHMENTS)]
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                content, files, future = item
+                try:
+                    future.set_result(self.webhook.post(content, files))
+                    self.sent += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"[ERROR] Discord delivery failed: {e}")
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Block until every queued message has been delivered or has failed.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Deliver what is queued, then stop the worker and close the connection.
+        """
+        self._queue.put(None)
+        self._worker.join()
+        self.webhook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_webhooks = {}
+_webhooks_lock = threading.Lock()
+
+def post_image_to_discord(image, webhook_url, content=DEFAULT_MESSAGE):
+    """
+    Posts the report image to Discord (blocking; see DiscordDelivery to queue posts).
+    :param image: Path to the image file, or encoded image bytes from render_report.
+    :return: True if the image was posted.
+    """
+    with _webhooks_lock:
+        webhook = _webhooks.get(webhook_url)
+        if webhook is None:
+            webhook = _webhooks[webhook_url] = DiscordWebhook(webhook_url)
+    if isinstance(image, (bytes, bytearray)):
+        filename = "report.png"
+    else:
+        filename = image.replace("\\", "/").rsplit("/", 1)[-1]
+        with open(image, "rb") as image_file:
+            image = image_file.read()
+    try:
+        response = webhook.post(content, {filename: image})
+    except requests.RequestException as e:
+        print(f"Failed to post to Discord: {e}")
+        return False
+    print(f"Image successfully posted to Discord! (status {response.status_code})")
+    return True
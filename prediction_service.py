@@ -0,0 +1,281 @@
+# prediction_service.py
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+
+import history_store
+from model_registry import load_model
+from ml_model import FEATURE_COLS
+from config import (MODEL_REGISTRY_DIR, PREDICT_HOST, PREDICT_PORT, PREDICT_MAX_BATCH,
+                    PREDICT_MAX_WAIT_MS)
+
+class CompiledForest:
+    """
+    A fitted sklearn tree ensemble classifier (RandomForest / ExtraTrees) flattened into
+    NumPy node arrays and evaluated for all trees and rows at once, one tree level per
+    step. Gives the same probabilities as model.predict_proba without sklearn's
+    per-tree Python overhead, which dominates for small batches.
+    """
+    def __init__(self, model):
+        trees = [est.tree_ for est in model.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+        self.roots = offsets.astype(np.int32)
+        self.classes_ = model.classes_
+        self.depth = max(t.max_depth for t in trees)
+        feature, threshold, children, value = [], [], [], []
+        for offset, t in zip(offsets, trees):
+            ids = np.arange(t.node_count) + offset
+            leaf = t.children_left < 0
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(np.where(leaf, np.inf, t.threshold))
+            # children[2 * node] is taken when x <= threshold, children[2 * node + 1] otherwise;
+            # leaves point back to themselves, so every row can take `depth` steps
+            children.append(np.column_stack([np.where(leaf, ids, t.children_left + offset),
+                                             np.where(leaf, ids, t.children_right + offset)]))
+            v = t.value[:, 0, :]
+            value.append(v / v.sum(axis=1, keepdims=True))
+        self.feature = np.concatenate(feature).astype(np.int32)
+        # sklearn compares float32 features with float64 thresholds; rounding each
+        # threshold down to float32 gives the same result with a float32 comparison
+        threshold = np.concatenate(threshold)
+        threshold32 = threshold.astype(np.float32)
+        too_high = threshold32 > threshold
+        threshold32[too_high] = np.nextafter(threshold32[too_high], np.float32(-np.inf))
+        self.threshold = threshold32
+        self.children = np.concatenate(children).astype(np.int32).ravel()
+        # One contiguous row of leaf probabilities per class
+        self.value = np.ascontiguousarray(np.concatenate(value).T)
+
+    @staticmethod
+    def supports(model):
+        return hasattr(model, "estimators_") and all(hasattr(est, "tree_") for est in model.estimators_) \
+            and getattr(model, "n_outputs_", 1) == 1 and hasattr(model, "classes_")
+
+    def predict_proba(self, X, chunk_rows=4096):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if len(X) > chunk_rows:
+            # Working arrays are (trees x rows); chunking bounds their size
+            return np.concatenate([self.predict_proba(X[i:i + chunk_rows], chunk_rows)
+                                   for i in range(0, len(X), chunk_rows)])
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_base = np.tile(np.arange(n_rows, dtype=np.int32) * n_features, len(self.roots))
+        node = np.repeat(self.roots, n_rows)
+        # np.take is markedly faster than fancy indexing for these 1-D gathers
+        for _ in range(self.depth):
+            go_right = np.take(flat, row_base + np.take(self.feature, node)) > np.take(self.threshold, node)
+            node = np.take(self.children, 2 * node + go_right)
+        return np.column_stack([np.take(v, node).reshape(len(self.roots), n_rows).mean(axis=0)
+                                for v in self.value])
+
+class PredictionService:
+    """
+    In-process prediction service around one trained classifier.
+
+    Requests (feature rows for one or many symbols) can arrive from any thread; a single
+    worker thread takes everything queued at that moment (up to `max_batch` rows,
+    optionally waiting `max_wait_ms` for more) and answers it with one predict_proba
+    call. Request and batch latencies are kept for stats().
+    """
+    def __init__(self, model, feature_cols=FEATURE_COLS, max_batch=PREDICT_MAX_BATCH,
+                 max_wait_ms=PREDICT_MAX_WAIT_MS):
+        self.model = model
+        self.feature_cols = list(feature_cols)
+        self.classes = [int(c) if isinstance(c, np.integer) else c for c in model.classes_]
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        if CompiledForest.supports(model):
+            self._predict_proba = CompiledForest(model).predict_proba
+        elif hasattr(model, "feature_names_in_"):
+            # Fitted on a DataFrame: pass the batch with the same column names, or sklearn
+            # warns about missing feature names on every batch
+            self._predict_proba = lambda X: model.predict_proba(pd.DataFrame(X, columns=self.feature_cols))
+        else:
+            self._predict_proba = model.predict_proba
+        self._queue = queue.Queue()
+        self._request_latencies = deque(maxlen=10000)
+        self._batch_latencies = deque(maxlen=10000)
+        self._batch_sizes = deque(maxlen=10000)
+        self._worker = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def from_registry(cls, key=None, registry_dir=MODEL_REGISTRY_DIR, **kwargs):
+        """
+        Load a model saved by model_registry (the most recently used one if `key` is None).
+        """
+        model, key = load_model(key, registry_dir, mmap_mode=None)
+        print(f"Loaded model {key} for serving")
+        return cls(model, **kwargs)
+
+    def submit(self, X):
+        """
+        Queue feature rows (2-D, columns in `feature_cols` order) for prediction.
+        :return: Future resolving to the (rows x classes) probability array.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != len(self.feature_cols):
+            raise ValueError(f"Expected {len(self.feature_cols)} features, got {X.shape[1]}")
+        future = Future()
+        self._queue.put((X, future, time.perf_counter()))
+        return future
+
+    def predict_proba(self, X, timeout=None):
+        """
+        Blocking form of submit().
+        """
+        return self.submit(X).result(timeout)
+
+    def predict_symbols(self, features, timeout=None):
+        """
+        :param features: Dict symbol -> feature row (sequence in `feature_cols` order, or
+                         dict column -> value).
+        :return: Dict symbol -> {"proba": {class: p, ...}, "pred": most likely class}.
+        """
+        symbols = list(features)
+        X = np.array([[row[c] for c in self.feature_cols] if isinstance(row, dict) else row
+                      for row in features.values()], dtype=np.float64)
+        proba = self.predict_proba(X, timeout)
+        return {
+            symbol: {"proba": {str(c): float(p) for c, p in zip(self.classes, row)},
+                     "pred": self.classes[int(np.argmax(row))]}
+            for symbol, row in zip(symbols, proba)
+        }
+
+    def latest_features(self, symbols, table="features"):
+        """
+        Latest stored feature row of each symbol from the historical store.
+        Symbols without stored features are left out.
+        """
+        rows = {}
+        for symbol in symbols:
+            df = history_store.read(symbol, columns=self.feature_cols, table=table, last=1)
+            if not df.empty and list(df.columns) == self.feature_cols:
+                rows[symbol] = df.iloc[-1].to_numpy(dtype=np.float64)
+        return rows
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, rows = [item], len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._predict_batch(batch, rows)
+
+    def _predict_batch(self, batch, rows):
+        t0 = time.perf_counter()
+        try:
+            proba = self._predict_proba(np.concatenate([X for X, _, _ in batch]))
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        done = time.perf_counter()
+        self._batch_latencies.append(done - t0)
+        self._batch_sizes.append(rows)
+        start = 0
+        for X, future, submitted in batch:
+            future.set_result(proba[start:start + len(X)])
+            start += len(X)
+            self._request_latencies.append(done - submitted)
+
+    def stats(self):
+        """
+        Request latency (submit to result) and batch predict latency percentiles in ms,
+        plus batch sizes, over the last 10k requests/batches.
+        """
+        def pct(values, q):
+            return float(np.percentile(values, q) * 1000) if values else None
+        req, bat = list(self._request_latencies), list(self._batch_latencies)
+        return {
+            "requests": len(req),
+            "batches": len(bat),
+            "mean_batch_rows": float(np.mean(self._batch_sizes)) if self._batch_sizes else None,
+            "request_p50_ms": pct(req, 50),
+            "request_p99_ms": pct(req, 99),
+            "batch_p50_ms": pct(bat, 50),
+            "batch_p99_ms": pct(bat, 99),
+        }
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+def make_server(service, host=PREDICT_HOST, port=PREDICT_PORT):
+    """
+    Thin local HTTP front end:
+        POST /predict  {"features": {"SPY": [...], ...}}  or  {"symbols": ["SPY", ...]}
+                       (the latter uses each symbol's latest stored feature row)
+        GET  /metrics  latency stats
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body, status=200):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(service.stats())
+            else:
+                self._send({"error": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send({"error": "not found"}, 404)
+                return
+            try:
+                t0 = time.perf_counter()
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                features = request.get("features") or service.latest_features(request.get("symbols", []))
+                predictions = service.predict_symbols(features) if features else {}
+                self._send({"predictions": predictions,
+                            "latency_ms": (time.perf_counter() - t0) * 1000})
+            except Exception as e:
+                self._send({"error": str(e)}, 400)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve predictions from a registry model over local HTTP.")
+    parser.add_argument("--model-key", default=None, help="registry key (default: most recently used model)")
+    parser.add_argument("--host", default=PREDICT_HOST)
+    parser.add_argument("--port", type=int, default=PREDICT_PORT)
+    args = parser.parse_args()
+    service = PredictionService.from_registry(args.model_key)
+    server = make_server(service, args.host, args.port)
+    print(f"=== Serving predictions on http://{args.host}:{args.port} ===")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 def calculate_pivot_points(high, low, close):
     """
     Calculate the pivot point and support/resistance levels based on the previous day's high, low, and close.
@@ -29,3 +32,138 @@ def calculate_pivot_points(high, low, close):
         "Support 2": round(support_2, 2),
         "Support 3": round(support_3, 2),
     }
+
+##############################
+#  VECTORIZED PIVOT LEVELS
+##############################
+
+PIVOT_METHODS = ("classic", "fibonacci", "camarilla", "woodie")
+PIVOT_PERIODS = ("bar", "W", "M")
+_DAY_NS = 86_400 * 10**9
+
+def pivot_levels(high, low, close, method="classic"):
+    """
+    Pivot point and support/resistance levels from each element's high, low and close.
+    Works elementwise on scalars, NumPy arrays, Series or (bars x symbols) DataFrames.
+
+    :param method: "classic" (as in calculate_pivot_points), "fibonacci", "camarilla"
+                   (adds R4/S4) or "woodie" (pivot weighted toward the close).
+    :return: Dict level name (P, R1.., S1..) -> values shaped like the inputs.
+    """
+    rng = high - low
+    if method in ("classic", "woodie"):
+        p = (high + low + 2 * close) / 4 if method == "woodie" else (high + low + close) / 3
+        return {
+            "P": p,
+            "R1": 2 * p - low, "R2": p + rng, "R3": high + 2 * (p - low),
+            "S1": 2 * p - high, "S2": p - rng, "S3": low - 2 * (high - p),
+        }
+    if method == "fibonacci":
+        p = (high + low + close) / 3
+        return {
+            "P": p,
+            "R1": p + 0.382 * rng, "R2": p + 0.618 * rng, "R3": p + rng,
+            "S1": p - 0.382 * rng, "S2": p - 0.618 * rng, "S3": p - rng,
+        }
+    if method == "camarilla":
+        step = 1.1 * rng
+        return {
+            "P": (high + low + close) / 3,
+            "R1": close + step / 12, "R2": close + step / 6, "R3": close + step / 4, "R4": close + step / 2,
+            "S1": close - step / 12, "S2": close - step / 6, "S3": close - step / 4, "S4": close - step / 2,
+        }
+    raise ValueError(f"Unknown pivot method {method!r}; expected one of {PIVOT_METHODS}")
+
+def _period_codes(dates, period):
+    """
+    Integer label per bar that changes exactly when a new `period` starts:
+    "W" = Monday-based calendar weeks, "M" = calendar months.
+    """
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    if period == "W":
+        # 1970-01-01 was a Thursday; shifting by 3 days makes weeks start on Monday
+        return (dates.as_unit("ns").asi8 // _DAY_NS + 3) // 7
+    if period == "M":
+        return dates.values.astype("datetime64[M]").astype(np.int64)
+    raise ValueError(f"Unknown pivot period {period!r}; expected one of {PIVOT_PERIODS}")
+
+def rolling_pivots(high, low, close, dates=None, period="bar", method="classic", groups=None):
+    """
+    The pivot levels in force at every bar of a series or long panel: computed from the
+    previous bar's (period="bar") or previous calendar week's ("W") / month's ("M")
+    high, low and close, so a bar only sees levels known at its open. NaN where there
+    is no previous period.
+
+    :param high, low, close: 1-D arrays (or Series) sorted by time within each group.
+    :param dates: Bar timestamps; required for "W" and "M".
+    :param groups: Optional symbol label per bar for a long panel sorted by (symbol, date);
+                   periods never span two symbols.
+    :return: Dict level name -> float64 array with one value per bar.
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    n = len(close)
+    if n == 0:
+        return {name: np.empty(0) for name in pivot_levels(high, low, close, method)}
+    same_group = np.ones(n - 1, dtype=bool)
+    if groups is not None:
+        groups = np.asarray(groups)
+        same_group = groups[1:] == groups[:-1]
+
+    if period == "bar":
+        # Levels from the previous bar's high/low/close; NaN inputs where there is none
+        prev = []
+        for values in (high, low, close):
+            shifted = np.empty(n)
+            shifted[0] = np.nan
+            shifted[1:] = values[:-1]
+            shifted[1:][~same_group] = np.nan
+            prev.append(shifted)
+        return pivot_levels(*prev, method)
+
+    if dates is None:
+        raise ValueError("rolling_pivots needs `dates` for weekly or monthly pivots.")
+    codes = _period_codes(dates, period)
+    new = np.r_[True, (codes[1:] != codes[:-1]) | ~same_group]
+    starts = np.flatnonzero(new)
+    lasts = np.r_[starts[1:], n] - 1
+    levels = pivot_levels(np.maximum.reduceat(high, starts), np.minimum.reduceat(low, starts),
+                          close[lasts], method)
+    # Each bar takes the levels of the period before its own, within the same group
+    lengths = np.diff(np.r_[starts, n])
+    has_prev = np.r_[False, same_group[starts[1:] - 1]]
+    out = {}
+    for name, values in levels.items():
+        prev = np.r_[np.nan, values[:-1]]
+        prev[~has_prev] = np.nan
+        out[name] = np.repeat(prev, lengths)
+    return out
+
+def pivot_feature_name(method, period="bar", level="P"):
+    """
+    Column name of a pivot feature, e.g. PIV_classic_R1 or PIV_W_fibonacci_S2.
+    """
+    return f"PIV_{method}_{level}" if period == "bar" else f"PIV_{period}_{method}_{level}"
+
+def pivot_features(df, pivots=(("classic", "bar"),)):
+    """
+    Rolling pivot levels as feature columns for an OHLC DataFrame indexed by date, or a
+    long panel indexed by (symbol, date) sorted by symbol then date.
+
+    :param pivots: Iterable of (method, period) pairs, method in PIVOT_METHODS and
+                   period in PIVOT_PERIODS ("bar" = previous bar, "W" = previous week,
+                   "M" = previous month).
+    :return: DataFrame on df's index with one column per level (see pivot_feature_name).
+    """
+    if isinstance(df.index, pd.MultiIndex):
+        groups, dates = df.index.codes[0], df.index.get_level_values(-1)
+    else:
+        groups, dates = None, df.index
+    high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ("High", "Low", "Close"))
+    columns = {}
+    for method, period in pivots:
+        levels = rolling_pivots(high, low, close, dates, period, method, groups)
+        for level, values in levels.items():
+            columns[pivot_feature_name(method, period, level)] = values
+    return pd.DataFrame(columns, index=df.index)
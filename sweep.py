@@ -0,0 +1,153 @@
+# sweep.py
+import os
+import json
+import time
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from data_fetch import fetch_many
+from feature_engineering import build_features
+from ml_model import train_random_forest, walk_forward_predict
+from backtest import simple_backtest, backtest_signals
+
+# Grid keys that control the split/backtest; every other key is a RandomForest hyperparameter
+SPLIT_KEYS = ("ticker", "mode", "test_days", "threshold",
+              "min_train_size", "retrain_every", "window", "train_size")
+
+# Feature frames per ticker, set once per worker process by _init_worker
+_FEATURES = {}
+
+def expand_grid(grid):
+    """
+    Expand a dict of {param: [values]} into a list of cell dicts (cartesian product).
+    """
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def cell_id(cell):
+    """
+    Stable identifier for a grid cell, used to checkpoint finished cells.
+    """
+    return hashlib.sha1(json.dumps(cell, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def _init_worker(features):
+    global _FEATURES
+    _FEATURES = features
+
+def _walk_forward_cell(df, cell, rf_params):
+    """
+    Walk-forward predictions for one cell (see ml_model.walk_forward_predict), backtested
+    with backtest_signals. Folds run serially: the sweep already uses every core.
+    :return: Tuple (metrics dict, backtest summary or None).
+    """
+    preds = walk_forward_predict(df, min_train_size=cell.get("min_train_size", 500),
+                                 retrain_every=cell.get("retrain_every", 21),
+                                 window=cell.get("window", "expanding"),
+                                 train_size=cell.get("train_size"), n_jobs=1, **rf_params)
+    if preds.empty:
+        return {"test_size": 0, "folds": 0}, None
+    threshold = cell.get("threshold")
+    signal = preds["pred"] if threshold is None else (preds["proba"] >= threshold).astype(int)
+    metrics = {
+        "test_accuracy": (preds["pred"] == preds["Target"]).mean(),
+        "test_size": len(preds),
+        "folds": -(-len(preds) // cell.get("retrain_every", 21)),
+    }
+    return metrics, backtest_signals(df, signal)
+
+def run_cell(cell):
+    """
+    Train and backtest one grid cell. Runs inside a worker process.
+    Cells with mode "walk_forward" retrain every `retrain_every` bars after a first
+    `min_train_size`-bar window instead of using a single `test_days` split.
+    :return: Dict row for the results table (cell params + metrics).
+    """
+    t0 = time.perf_counter()
+    df = _FEATURES[cell["ticker"]]
+    rf_params = {k: v for k, v in cell.items() if k not in SPLIT_KEYS}
+    if cell.get("mode", "split") == "walk_forward":
+        metrics, bt = _walk_forward_cell(df, cell, rf_params)
+    else:
+        test_days = cell.get("test_days", 180)
+        model, metrics = train_random_forest(df, test_days=test_days, **rf_params)
+        bt = simple_backtest(df, model, test_days=test_days, threshold=cell.get("threshold"))
+    row = {"cell_id": cell_id(cell), **cell, **metrics}
+    for key in ("final_capital", "return_pct", "sharpe", "max_drawdown", "turnover", "num_trades"):
+        row[key] = bt[key] if bt else float("nan")
+    row["elapsed_s"] = time.perf_counter() - t0
+    return row
+
+def _append_row(row, results_path):
+    """
+    Append one finished cell to the results CSV (this doubles as the checkpoint).
+    If the row has columns the file doesn't (the grid gained a parameter), the file is rewritten.
+    """
+    df_row = pd.DataFrame([row])
+    if not os.path.exists(results_path):
+        df_row.to_csv(results_path, index=False)
+        return
+    columns = list(pd.read_csv(results_path, nrows=0).columns)
+    if set(df_row.columns) <= set(columns):
+        df_row.reindex(columns=columns).to_csv(results_path, mode="a", header=False, index=False)
+    else:
+        pd.concat([pd.read_csv(results_path), df_row]).to_csv(results_path, index=False)
+
+def run_sweep(grid, results_path="sweep_results.csv", max_workers=None, lookback_days=None):
+    """
+    Run a parameter sweep of train_random_forest + simple_backtest across a process pool.
+
+    :param grid: Dict of {param: [values]}. Must include "ticker"; may include "test_days",
+                 "threshold" (probability cutoff for going long) and any RandomForest
+                 hyperparameters (n_estimators, max_depth, min_samples_leaf, ...).
+                 "mode": "walk_forward" cells are backtested on walk-forward predictions
+                 instead, with "min_train_size", "retrain_every", "window" and
+                 "train_size" as in ml_model.walk_forward_predict.
+    :param results_path: CSV the results are streamed to, one row per finished cell.
+                         Cells already present there are skipped, so an interrupted
+                         sweep resumes where it stopped.
+    :param max_workers: Process count (defaults to os.cpu_count()).
+    :return: DataFrame of all results (previous and new).
+    """
+    cells = expand_grid(grid)
+    done = set()
+    if os.path.exists(results_path):
+        done = set(pd.read_csv(results_path, usecols=["cell_id"])["cell_id"])
+    todo = [c for c in cells if cell_id(c) not in done]
+    print(f"=== Sweep: {len(cells)} cells, {len(cells) - len(todo)} already done ===")
+
+    if todo:
+        # Fetch and build features once per ticker; workers receive them at start-up
+        tickers = sorted({c["ticker"] for c in todo})
+        kwargs = {"lookback_days": lookback_days} if lookback_days else {}
+        frames, errors = fetch_many(tickers, **kwargs)
+        for symbol, err in errors.items():
+            print(f"[ERROR] Failed to fetch data for {symbol}: {err}")
+        features = {s: build_features(df) for s, df in frames.items() if not df.empty}
+        todo = [c for c in todo if c["ticker"] in features]
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(features,)) as pool:
+            futures = {pool.submit(run_cell, c): c for c in todo}
+            for i, future in enumerate(as_completed(futures), 1):
+                try:
+                    _append_row(future.result(), results_path)
+                except Exception as e:
+                    print(f"[ERROR] Cell {futures[future]} failed: {e}")
+                if i % 50 == 0 or i == len(todo):
+                    print(f"  {i}/{len(todo)} cells finished")
+
+    if not os.path.exists(results_path):
+        return pd.DataFrame()
+    return pd.read_csv(results_path)
+
+if __name__ == "__main__":
+    results = run_sweep({
+        "ticker": ["SPY", "QQQ"],
+        "test_days": [120, 180, 250],
+        "threshold": [0.5, 0.55, 0.6],
+        "n_estimators": [100, 300],
+        "max_depth": [3, 5, 8],
+    })
+    print(results.sort_values("sharpe", ascending=False).head(10).to_string(index=False))
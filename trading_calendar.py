@@ -0,0 +1,211 @@
+# trading_calendar.py
+import datetime as dt
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+from config import CALENDAR_FIRST_YEAR, CALENDAR_LAST_YEAR
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+REGULAR_OPEN = dt.time(9, 30)
+REGULAR_CLOSE = dt.time(16, 0)
+EARLY_CLOSE = dt.time(13, 0)
+
+# Unscheduled full-day closures (national days of mourning, 9/11, Hurricane Sandy)
+SPECIAL_CLOSURES = {
+    dt.date(2001, 9, 11), dt.date(2001, 9, 12), dt.date(2001, 9, 13), dt.date(2001, 9, 14),
+    dt.date(2004, 6, 11), dt.date(2007, 1, 2), dt.date(2012, 10, 29), dt.date(2012, 10, 30),
+    dt.date(2018, 12, 5), dt.date(2025, 1, 9),
+}
+
+def _easter(year):
+    """
+    Gregorian Easter Sunday (anonymous Gregorian algorithm).
+    """
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return dt.date(year, month, day)
+
+def _nth_weekday(year, month, weekday, n):
+    """
+    The `n`-th `weekday` (Mon=0) of the month; n=-1 for the last one.
+    """
+    if n > 0:
+        first = dt.date(year, month, 1)
+        return first + dt.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = dt.date(year + month // 12, month % 12 + 1, 1) - dt.timedelta(days=1)
+    return last - dt.timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(day):
+    """
+    Saturday holidays are observed on Friday, Sunday holidays on Monday.
+    """
+    if day.weekday() == 5:
+        return day - dt.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + dt.timedelta(days=1)
+    return day
+
+def holidays(year):
+    """
+    NYSE full-day holidays observed in `year` (including special closures).
+    """
+    days = {
+        _nth_weekday(year, 2, 0, 3),                 # Washington's Birthday
+        _easter(year) - dt.timedelta(days=2),        # Good Friday
+        _nth_weekday(year, 5, 0, -1),                # Memorial Day
+        _observed(dt.date(year, 7, 4)),              # Independence Day
+        _nth_weekday(year, 9, 0, 1),                 # Labor Day
+        _nth_weekday(year, 11, 3, 4),                # Thanksgiving
+        _observed(dt.date(year, 12, 25)),            # Christmas
+    }
+    # New Year's Day falling on a Saturday is not observed on the Friday before (NYSE Rule 7.2)
+    new_year = dt.date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.add(_observed(new_year))
+    if year >= 1998:
+        days.add(_nth_weekday(year, 1, 0, 3))        # Martin Luther King Jr. Day
+    if year >= 2022:
+        days.add(_observed(dt.date(year, 6, 19)))    # Juneteenth
+    days |= {d for d in SPECIAL_CLOSURES if d.year == year}
+    return days
+
+def early_closes(year):
+    """
+    Days in `year` the NYSE closes at 13:00 ET: July 3rd, the day after
+    Thanksgiving and Christmas Eve, when they are otherwise trading days.
+    """
+    closed = holidays(year)
+    days = {_nth_weekday(year, 11, 3, 4) + dt.timedelta(days=1)}
+    for day in (dt.date(year, 7, 3), dt.date(year, 12, 24)):
+        if day.weekday() < 5 and day not in closed:
+            days.add(day)
+    return days
+
+def _build_sessions(first_year, last_year):
+    """
+    Precompute every session in [first_year, last_year] as sorted int64 arrays of
+    UTC open/close nanoseconds (DST handled by the exchange time zone).
+    """
+    closed, early = set(), set()
+    for year in range(first_year, last_year + 1):
+        closed |= holidays(year)
+        early |= early_closes(year)
+    days = pd.bdate_range(f"{first_year}-01-01", f"{last_year}-12-31")
+    days = days[~days.isin(pd.DatetimeIndex(sorted(closed)))]
+    is_early = days.isin(pd.DatetimeIndex(sorted(early)))
+    close_times = np.where(is_early, pd.Timedelta(hours=13).value, pd.Timedelta(hours=16).value)
+
+    def to_utc_ns(local):
+        return pd.DatetimeIndex(local).tz_localize(EXCHANGE_TZ).tz_convert("UTC").as_unit("ns").asi8
+
+    opens = to_utc_ns(days + pd.Timedelta(hours=9, minutes=30))
+    closes = to_utc_ns(days + pd.to_timedelta(close_times))
+    return days.as_unit("ns"), opens, closes, is_early
+
+_DAYS, _OPENS, _CLOSES, _EARLY = _build_sessions(CALENDAR_FIRST_YEAR, CALENDAR_LAST_YEAR)
+
+def _to_ns(ts):
+    """
+    Nanoseconds since the epoch (UTC) for `ts`; naive timestamps are taken as UTC, None is now.
+    """
+    if ts is None:
+        return pd.Timestamp.now(tz="UTC").value
+    ts = pd.Timestamp(ts)
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts).value
+
+def _utc(ns):
+    return pd.Timestamp(int(ns), tz="UTC")
+
+def _check(i, ts):
+    if i >= len(_OPENS):
+        raise ValueError(f"{ts} is beyond the trading calendar (last year {CALENDAR_LAST_YEAR}).")
+    return i
+
+def is_open(ts=None):
+    """
+    True if the regular NYSE session is open at `ts` (default: now).
+    """
+    v = _to_ns(ts)
+    i = np.searchsorted(_OPENS, v, side="right") - 1
+    return bool(i >= 0 and v < _CLOSES[i])
+
+def next_open(ts=None):
+    """
+    The first session open strictly after `ts` (default: now), as a UTC Timestamp.
+    """
+    return _utc(_OPENS[_check(np.searchsorted(_OPENS, _to_ns(ts), side="right"), ts)])
+
+def next_close(ts=None):
+    """
+    The first session close strictly after `ts` (default: now), as a UTC Timestamp.
+    """
+    return _utc(_CLOSES[_check(np.searchsorted(_CLOSES, _to_ns(ts), side="right"), ts)])
+
+def previous_close(ts=None):
+    """
+    The last session close at or before `ts` (default: now), as a UTC Timestamp.
+    """
+    i = np.searchsorted(_CLOSES, _to_ns(ts), side="right") - 1
+    if i < 0:
+        raise ValueError(f"{ts} is before the trading calendar (first year {CALENDAR_FIRST_YEAR}).")
+    return _utc(_CLOSES[i])
+
+def locate_sessions(ts_ns):
+    """
+    Vectorized session lookup for an array of UTC epoch nanoseconds.
+    :return: Tuple (session_date_ns, open_ns, close_ns, in_session) of arrays shaped like
+             `ts_ns`; each timestamp maps to the latest session opened at or before it,
+             and `in_session` is False outside regular hours.
+    """
+    i = np.searchsorted(_OPENS, ts_ns, side="right") - 1
+    j = np.maximum(i, 0)
+    in_session = (i >= 0) & (ts_ns < _CLOSES[j])
+    return _DAYS.asi8[j], _OPENS[j], _CLOSES[j], in_session
+
+def session(day):
+    """
+    (open, close) UTC Timestamps of the session on calendar date `day`, or None if the
+    exchange is closed that day.
+    """
+    v = pd.Timestamp(day).normalize().as_unit("ns").value
+    i = np.searchsorted(_DAYS.asi8, v)
+    if i < len(_DAYS) and _DAYS.asi8[i] == v:
+        return _utc(_OPENS[i]), _utc(_CLOSES[i])
+    return None
+
+def sessions_between(start, end):
+    """
+    Sessions whose date falls in [start, end].
+    :return: DataFrame indexed by session date with UTC 'open'/'close' and 'early_close'.
+    """
+    lo = np.searchsorted(_DAYS.asi8, pd.Timestamp(start).normalize().as_unit("ns").value)
+    hi = np.searchsorted(_DAYS.asi8, pd.Timestamp(end).normalize().as_unit("ns").value, side="right")
+    return pd.DataFrame({
+        "open": pd.to_datetime(_OPENS[lo:hi], unit="ns", utc=True),
+        "close": pd.to_datetime(_CLOSES[lo:hi], unit="ns", utc=True),
+        "early_close": _EARLY[lo:hi],
+    }, index=pd.DatetimeIndex(_DAYS[lo:hi], name="date"))
+
+def missing_sessions(index, start=None, end=None):
+    """
+    Session dates in [start, end] (default: the span of `index`) that have no bar in
+    `index`, i.e. gaps in a daily bar series.
+    """
+    dates = pd.DatetimeIndex(index)
+    if dates.tz is not None:
+        dates = dates.tz_convert(EXCHANGE_TZ).tz_localize(None)
+    dates = dates.normalize()
+    if dates.empty and (start is None or end is None):
+        return pd.DatetimeIndex([])
+    start = dates.min() if start is None else start
+    end = dates.max() if end is None else end
+    expected = sessions_between(start, end).index
+    return expected[~expected.isin(dates)]
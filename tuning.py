@@ -0,0 +1,208 @@
+# tuning.py
+import os
+import math
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import get_scorer
+
+from config import TUNING_CACHE_PATH
+from ml_model import FEATURE_COLS
+from sweep import expand_grid, cell_id
+
+# Default search space for tune_random_forest
+RF_PARAM_SPACE = {
+    "n_estimators": [50, 100, 200, 400],
+    "max_depth": [3, 5, 8, 12, None],
+    "min_samples_leaf": [1, 5, 20, 50],
+    "max_features": ["sqrt", 0.5, 1.0],
+}
+
+def purged_splits(n, n_splits=5, test_size=None, purge=1, embargo=0, walk_forward=True,
+                  min_train_size=100):
+    """
+    Time-ordered cross-validation folds for rows 0..n-1 (sorted by date).
+
+    The last `n_splits * test_size` rows are cut into consecutive test blocks. Training
+    rows within `purge` bars before a block are dropped, since their labels look into it
+    (Target is the next bar's direction, hence purge=1). With walk_forward=False training
+    also uses the rows after the block, except for the `embargo` bars right after it,
+    whose rolling-window features still overlap the block.
+
+    :param test_size: Rows per test block (defaults to an even share of what is left
+                      after `min_train_size`).
+    :return: List of (train_ranges, (test_start, test_end)) with train_ranges a list of
+             (start, stop) row ranges, oldest fold first.
+    """
+    test_size = test_size or (n - min_train_size - purge) // n_splits
+    first_test = n - n_splits * test_size
+    if test_size <= 0 or first_test - purge < min_train_size:
+        raise ValueError(f"{n} rows are too few for {n_splits} folds after {min_train_size} training rows.")
+    splits = []
+    for k in range(n_splits):
+        test_start = first_test + k * test_size
+        test_end = test_start + test_size
+        train = [(0, test_start - purge)]
+        if not walk_forward and test_end + embargo < n:
+            train.append((test_end + embargo, n))
+        splits.append((train, (test_start, test_end)))
+    return splits
+
+def _rows(a, ranges):
+    # A single range is a view of the memmap; several are concatenated
+    return a[ranges[0][0]:ranges[0][1]] if len(ranges) == 1 else np.concatenate([a[s:e] for s, e in ranges])
+
+def _fit_score(X, y, train, test, params, scoring):
+    """
+    Fit one candidate on one fold and score it on the fold's test block. Runs in a
+    worker process; X and y arrive as references to the shared memmap, not copies.
+    """
+    t0 = time.perf_counter()
+    model = RandomForestClassifier(**{"random_state": 42, **params})
+    model.fit(_rows(X, train), _rows(y, train))
+    fit_s = time.perf_counter() - t0
+    score = get_scorer(scoring)(model, X[test[0]:test[1]], y[test[0]:test[1]])
+    return float(score), fit_s
+
+def _data_hash(X, y):
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(X).data)
+    h.update(np.ascontiguousarray(y).data)
+    return h.hexdigest()[:16]
+
+def _load_cache(path):
+    cache = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    cache[entry["key"]] = entry
+                except (ValueError, KeyError):
+                    pass  # torn last line of an interrupted search
+    return cache
+
+def tune_random_forest(df, param_space=None, n_candidates=24, n_splits=5, test_size=None,
+                       purge=1, embargo=0, walk_forward=True, eta=3, scoring="accuracy",
+                       n_jobs=-1, cache_path=TUNING_CACHE_PATH, random_state=0):
+    """
+    Successive-halving hyperparameter search for the RandomForest with purged
+    time-series cross-validation.
+
+    `n_candidates` configurations are sampled from `param_space`. Every candidate is
+    first scored on the most recent fold only; the best 1/`eta` move on to a rung with
+    `eta` times as many folds, and so on until the survivors are scored on all
+    `n_splits`. (candidate, fold) fits run in parallel across processes, which all read
+    one memory-mapped copy of the feature matrix. Each fold score is cached under a hash
+    of the data, the fold and the parameters in `cache_path`, so later rungs and repeated
+    searches only fit what hasn't been evaluated yet.
+
+    :param df: Output of build_features (FEATURE_COLS + Target), sorted or not.
+    :param param_space: Dict {param: [values]} (default RF_PARAM_SPACE).
+    :param n_candidates: Configurations sampled from the grid (all of them if it is smaller).
+    :param n_splits, test_size, purge, embargo, walk_forward: See purged_splits.
+    :param scoring: sklearn scorer name ("accuracy", "roc_auc", "neg_log_loss", ...).
+    :param n_jobs: Worker processes (joblib; -1 = all cores).
+    :param cache_path: JSON-lines cache of fold scores (None disables it).
+    :return: Tuple (best model refitted on all rows, leaderboard DataFrame with one row per
+             candidate, best first: params, mean/std score, folds scored, rung reached, fit time).
+    """
+    df = df.sort_index()
+    candidates = expand_grid(param_space or RF_PARAM_SPACE)
+    if len(candidates) > n_candidates:
+        rng = np.random.default_rng(random_state)
+        candidates = [candidates[i] for i in sorted(rng.choice(len(candidates), n_candidates, replace=False))]
+    splits = purged_splits(len(df), n_splits, test_size, purge, embargo, walk_forward)
+    # Folds per rung: 1, eta, eta^2, ... up to all of them
+    rungs = [min(eta ** k, n_splits) for k in range(math.ceil(math.log(n_splits, eta)) + 1)]
+    rungs = sorted(set(rungs))
+
+    tmp_dir = tempfile.mkdtemp(prefix="tuning_")
+    try:
+        # One float32 copy on disk that every worker maps
+        X = np.lib.format.open_memmap(os.path.join(tmp_dir, "X.npy"), mode="w+", dtype=np.float32,
+                                      shape=(len(df), len(FEATURE_COLS)))
+        X[:] = df[FEATURE_COLS].to_numpy(dtype=np.float32)
+        X.flush()
+        X = np.load(os.path.join(tmp_dir, "X.npy"), mmap_mode="r")
+        y = df["Target"].to_numpy()
+        data_hash = _data_hash(X, y)
+
+        cache = _load_cache(cache_path)
+        scores = {}  # (candidate index, fold index) -> cache entry
+        alive = list(range(len(candidates)))
+        reached = {}
+        for rung, n_folds in enumerate(rungs):
+            folds = range(n_splits - n_folds, n_splits)
+            todo, hits = [], 0
+            for c in alive:
+                for f in folds:
+                    if (c, f) in scores:
+                        continue  # scored in an earlier rung
+                    key = cell_id({**candidates[c], "_data": data_hash, "_fold": splits[f],
+                                   "_scoring": scoring, "_sklearn": sklearn.__version__})
+                    if key in cache:
+                        scores[c, f] = {**cache[key], "cached": True}
+                        hits += 1
+                    else:
+                        todo.append((c, f, key))
+            print(f"=== Rung {rung}: {len(alive)} candidates x {n_folds} folds, "
+                  f"{len(todo)} fits, {hits} from cache ===")
+            results = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_score)(X, y, splits[f][0], splits[f][1], candidates[c], scoring)
+                for c, f, _ in todo
+            )
+            new = []
+            for (c, f, key), (score, fit_s) in zip(todo, results):
+                entry = {"key": key, "score": score, "fit_s": fit_s}
+                scores[c, f] = {**entry, "cached": False}
+                cache[key] = entry
+                new.append(entry)
+            if cache_path and new:
+                with open(cache_path, "a") as fh:
+                    fh.writelines(json.dumps(e) + "\n" for e in new)
+
+            mean = {c: np.mean([scores[c, f]["score"] for f in folds]) for c in alive}
+            for c in alive:
+                reached[c] = rung
+            if rung < len(rungs) - 1:
+                alive = sorted(alive, key=lambda c: -mean[c])[:max(1, math.ceil(len(alive) / eta))]
+    finally:
+        del X
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    rows = []
+    for c, params in enumerate(candidates):
+        done = [scores[c, f] for f in range(n_splits) if (c, f) in scores]
+        fold_scores = [e["score"] for e in done]
+        rows.append({
+            **{k: params.get(k) for k in sorted(param_space or RF_PARAM_SPACE)},
+            "mean_score": float(np.mean(fold_scores)),
+            "std_score": float(np.std(fold_scores)),
+            "folds": len(done),
+            "rung": reached[c],
+            "fit_s": sum(e["fit_s"] for e in done),
+            "cached": all(e["cached"] for e in done),
+        })
+    # Candidates that got further were scored on more folds, so they rank first
+    order = sorted(range(len(rows)), key=lambda c: (rows[c]["rung"], rows[c]["mean_score"]), reverse=True)
+    leaderboard = pd.DataFrame([rows[c] for c in order])
+
+    model = RandomForestClassifier(**{"random_state": 42, **candidates[order[0]]})
+    model.fit(df[FEATURE_COLS], df["Target"])
+    return model, leaderboard
+
+if __name__ == "__main__":
+    from data_fetch import fetch_daily_data
+    from feature_engineering import build_features
+    from config import TARGET_TICKER
+
+    model, leaderboard = tune_random_forest(build_features(fetch_daily_data(TARGET_TICKER)))
+    print(leaderboard.head(10).to_string(index=False))